@@ -0,0 +1,72 @@
+"""
+Benchmark tìm tỉ lệ thích nghi (`scale_search='adaptive'`) so với quét đều
+10 bước và quét mịn cùng độ chính xác (bước `--tolerance`) của
+`linear_multiscale_template_matching`: số lần gọi cv2.matchTemplate, thời gian
+và độ tương đồng tốt nhất. Kiểm tra (assert) tìm thích nghi gọi matchTemplate
+ít hơn một nửa so với quét mịn mà độ tương đồng trung bình không thấp hơn.
+
+Chạy từ thư mục gốc của repository:
+    python -m benchmarks.adaptive_scale
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from src.evaluation.profiling import CallCounter
+from src.finding.template_matching import get_template, linear_multiscale_template_matching
+
+
+def run(image_path, template_folder, n_templates, coarse_steps, tolerance, early_exit):
+    image = cv2.imread(image_path)
+    templates = get_template(template_folder)[:n_templates]
+
+    fine_name = f"linear {tolerance:g}"
+    configurations = {
+        'linear 10': dict(scale_steps=10),
+        # Lưới đều có bước bằng scale_tolerance trên khoảng tỉ lệ mặc định (0.5, 1.0)
+        fine_name: dict(scale_steps=int(round(0.5 / tolerance)) + 1),
+        'adaptive': dict(scale_search='adaptive', adaptive_coarse_steps=coarse_steps,
+                         scale_tolerance=tolerance, early_exit_correlation=early_exit),
+    }
+    details, calls, correlations = {}, {}, {}
+    for name, kwargs in configurations.items():
+        with CallCounter() as counter:
+            start = time.perf_counter()
+            _, _, details[name] = linear_multiscale_template_matching(image, templates, return_details=True,
+                                                                      **kwargs)
+            elapsed = time.perf_counter() - start
+        calls[name] = counter.calls
+        correlations[name] = float(np.mean([detail['correlation'] for detail in details[name]]))
+        print(f"{name:>12}: {counter.calls:4d} matchTemplate ({counter.calls / len(details[name]):.1f}/template), "
+              f"{elapsed:6.2f} s, corr TB {correlations[name]:.4f}")
+
+    print(f"\n{'template':>8} " + ' '.join(f"{name:>16}" for name in details))
+    for row in zip(*details.values()):
+        cells = [f"{detail['scale']:.3f}/{detail['correlation']:.3f}" for detail in row]
+        print(f"{row[0]['template_idx']:>8} " + ' '.join(f"{cell:>16}" for cell in cells))
+
+    print(f"\nThích nghi: {calls[fine_name] / calls['adaptive']:.1f} lần ít matchTemplate hơn {fine_name}")
+    assert 2 * calls['adaptive'] <= calls[fine_name], \
+        f"Tìm thích nghi gọi {calls['adaptive']} lần, không ít hơn một nửa {fine_name} ({calls[fine_name]})"
+    if early_exit is None:
+        assert correlations['adaptive'] >= correlations[fine_name] - 1e-3, \
+            (f"Độ tương đồng TB của tìm thích nghi ({correlations['adaptive']:.4f}) thấp hơn "
+             f"{fine_name} ({correlations[fine_name]:.4f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', default='data/images/finding_01.jpg')
+    parser.add_argument('--templates', default='data/templates/finding_01')
+    parser.add_argument('--n-templates', type=int, default=15)
+    parser.add_argument('--coarse-steps', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=0.01)
+    parser.add_argument('--early-exit', type=float, default=None)
+    args = parser.parse_args()
+    run(args.image, args.templates, args.n_templates, args.coarse_steps, args.tolerance, args.early_exit)
+
+
+if __name__ == '__main__':
+    main()
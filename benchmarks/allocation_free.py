@@ -0,0 +1,109 @@
+"""
+Microbenchmark chế độ quét tuyến tính không cấp phát của
+`linear_multiscale_template_matching` (`draw=False` + `MatchWorkspace` dùng lại
+giữa các lần gọi) so với chế độ mặc định. Mỗi lần gọi báo cáo: thời gian, số
+bản đồ tương quan được cấp phát mới và tổng số bytes (qua lớp đo đạc
+`src.utils.instrumentation`), đỉnh bộ nhớ (tracemalloc) và số lần GC chạy.
+
+Chạy từ thư mục gốc của repository:
+    python -m benchmarks.allocation_free --calls 5 --image-size 240 320 --reduction 4
+"""
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from src.finding.template_bank import TemplateBank
+from src.finding.template_matching import MatchWorkspace, get_template, linear_multiscale_template_matching
+from src.utils.instrumentation import MemorySink, instrument
+
+
+class _GCCounter:
+    def __init__(self):
+        self.collections = 0
+
+    def __call__(self, phase, info):
+        if phase == 'start':
+            self.collections += 1
+
+    def __enter__(self):
+        gc.callbacks.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        gc.callbacks.remove(self)
+
+
+def _measure(call, n_calls):
+    call()  # khởi động (cấp phát workspace lần đầu nằm ngoài phép đo)
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        call()
+    elapsed = (time.perf_counter() - start) / n_calls
+
+    memory = MemorySink()
+    with instrument(memory):
+        call()
+    counters = memory.summary()['counters']
+    allocated = counters.get('alloc.correlation_map', {'count': 0, 'total': 0})
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    with _GCCounter() as gc_counter:
+        for _ in range(n_calls):
+            call()
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return {
+        'time': elapsed,
+        'map_allocations': allocated['count'],
+        'map_bytes': allocated['total'],
+        'peak': peak,
+        'gc': gc_counter.collections / n_calls,
+    }
+
+
+def run(image_path, template_dir, image_size, reduction, scale_steps, n_calls, use_bank):
+    image = cv2.resize(cv2.imread(image_path), (image_size[1], image_size[0]))
+    templates = get_template(template_dir, reduction=reduction)
+    if use_bank:
+        templates = TemplateBank(templates, scales=np.linspace(0.5, 1.0, scale_steps))
+    workspace = MatchWorkspace()
+    modes = {
+        'mặc định': lambda: linear_multiscale_template_matching(image, templates, scale_steps=scale_steps),
+        'không cấp phát': lambda: linear_multiscale_template_matching(image, templates, scale_steps=scale_steps,
+                                                                      draw=False, workspace=workspace),
+    }
+    reference = linear_multiscale_template_matching(image, templates, scale_steps=scale_steps)[1]
+    assert modes['không cấp phát']()[1] == reference
+
+    print(f"Ảnh {image.shape[1]}x{image.shape[0]}, {len(templates)} template, {scale_steps} tỉ lệ"
+          f"{', TemplateBank' if use_bank else ''}")
+    print(f"{'chế độ':>16} {'ms/lần':>8} {'map mới':>8} {'MiB map':>8} {'đỉnh MiB':>9} {'GC/lần':>7}")
+    for name, call in modes.items():
+        result = _measure(call, n_calls)
+        print(f"{name:>16} {result['time'] * 1000:8.1f} {result['map_allocations']:8d} "
+              f"{result['map_bytes'] / 2 ** 20:8.1f} {result['peak'] / 2 ** 20:9.2f} {result['gc']:7.2f}")
+    print(f"Workspace: {workspace.nbytes / 2 ** 20:.2f} MiB, cấp phát {workspace.allocations} lần cho mọi lần gọi")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', default=os.path.join('data', 'images', 'finding_01.jpg'))
+    parser.add_argument('--templates', default=os.path.join('data', 'templates', 'finding_01'))
+    parser.add_argument('--image-size', type=int, nargs=2, default=(240, 320), metavar=('H', 'W'))
+    parser.add_argument('--reduction', type=int, choices=(1, 2, 4, 8), default=4,
+                        help="Hệ số thu nhỏ template khi giải mã")
+    parser.add_argument('--scale-steps', type=int, default=10)
+    parser.add_argument('--calls', type=int, default=5)
+    parser.add_argument('--bank', action='store_true', help="Dùng TemplateBank (template đã scale sẵn)")
+    args = parser.parse_args()
+    run(args.image, args.templates, tuple(args.image_size), args.reduction, args.scale_steps, args.calls, args.bank)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark đọc ground truth PASCAL VOC số lượng lớn: vòng lặp
+`extract_objects_from_xml` từng file so với `load_voc_annotations` (tuần tự
+và trên process pool), lần đầu có ghi cache, lần sau nạp cache
+memory-map, và sau khi một file bị sửa (cache bị bỏ).
+
+Các file XML được sinh ngẫu nhiên bằng `write_voc_xml`.
+
+Chạy từ thư mục gốc của repository:
+    python -m benchmarks.annotation_loading --files 20000 --objects 8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from src.evaluation.synthetic import write_voc_xml
+from src.utils.label_extraction import extract_image_size_from_xml, extract_objects_from_xml, load_voc_annotations
+
+
+def write_annotations(annotation_dir, n_files, n_objects, n_classes, seed=0):
+    rng = np.random.default_rng(seed)
+    for file_idx in range(n_files):
+        objects = []
+        for class_id in rng.integers(0, n_classes, size=rng.integers(0, 2 * n_objects + 1)):
+            x, y = rng.uniform(0, 900, size=2)
+            width, height = rng.uniform(10, 100, size=2)
+            objects.append({'name': f"class_{class_id}",
+                            'bbox': {'xmin': x, 'ymin': y, 'xmax': x + width, 'ymax': y + height},
+                            'angle': float(rng.choice([0.0, 90.0, 180.0, 270.0]))})
+        write_voc_xml(os.path.join(annotation_dir, f"{file_idx:06d}.xml"), f"{file_idx:06d}.jpg", (1000, 1000),
+                      objects)
+
+
+def _timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def run(n_files, n_objects, n_classes, n_workers):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        annotation_dir = os.path.join(tmp_dir, 'ground_truth')
+        cache_dir = os.path.join(tmp_dir, 'cache')
+        os.makedirs(annotation_dir)
+        write_annotations(annotation_dir, n_files, n_objects, n_classes)
+        files = sorted(os.listdir(annotation_dir))
+
+        def per_file():
+            return [(extract_objects_from_xml(os.path.join(annotation_dir, file)),
+                     extract_image_size_from_xml(os.path.join(annotation_dir, file))) for file in files]
+
+        per_file_result, per_file_time = _timed(per_file)
+        n_instances = sum(len(objects) for (_, objects), _ in per_file_result)
+        print(f"{n_files} file, {n_instances} đối tượng")
+        print(f"{'từng file (ElementTree)':>28}: {per_file_time:8.3f} s")
+
+        _, sequential_time = _timed(lambda: load_voc_annotations(annotation_dir, n_workers=1))
+        print(f"{'bảng cột, tuần tự':>28}: {sequential_time:8.3f} s")
+        table, parallel_time = _timed(lambda: load_voc_annotations(annotation_dir, n_workers=n_workers))
+        print(f"{f'bảng cột, {n_workers or os.cpu_count()} tiến trình':>28}: {parallel_time:8.3f} s")
+        assert len(table['objects']) == n_instances
+
+        _, cold_time = _timed(lambda: load_voc_annotations(annotation_dir, cache_dir=cache_dir, n_workers=n_workers))
+        print(f"{'lần đầu + ghi cache':>28}: {cold_time:8.3f} s")
+        cached, warm_time = _timed(lambda: load_voc_annotations(annotation_dir, cache_dir=cache_dir))
+        print(f"{'nạp cache (memory-map)':>28}: {warm_time:8.3f} s")
+        assert np.array_equal(cached['objects'], table['objects'])
+
+        touched = os.path.join(annotation_dir, files[0])
+        os.utime(touched, ns=(time.time_ns(), time.time_ns()))
+        _, invalidated_time = _timed(lambda: load_voc_annotations(annotation_dir, cache_dir=cache_dir,
+                                                                  n_workers=n_workers))
+        print(f"{'sau khi sửa 1 file':>28}: {invalidated_time:8.3f} s")
+        print(f"Nạp cache nhanh hơn đọc từng file {per_file_time / warm_time:.0f} lần")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=20000)
+    parser.add_argument('--objects', type=int, default=8, help="Số đối tượng trung bình mỗi file")
+    parser.add_argument('--classes', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=None, help="Mặc định os.cpu_count()")
+    args = parser.parse_args()
+    run(args.files, args.objects, args.classes, args.workers)
+
+
+if __name__ == '__main__':
+    main()
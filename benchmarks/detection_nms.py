@@ -0,0 +1,67 @@
+"""
+Benchmark phát hiện nhiều thể hiện: trích đỉnh top-k vector hóa và
+non-maximum suppression trên hàng nghìn ứng viên thô, cùng một cảnh tổng hợp
+chứa nhiều bản sao của cùng một template.
+
+Chạy từ thư mục gốc của repository:
+    python -m benchmarks.detection_nms --candidates 5000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.finding.detection import DETECTION_DTYPE, non_max_suppression
+from src.finding.template_matching import get_template, multiscale_template_detection
+
+
+def random_detections(n_candidates, n_templates, image_size, seed=0):
+    """
+    Sinh ngẫu nhiên `n_candidates` ứng viên thô kiểu `DETECTION_DTYPE`.
+    """
+    rng = np.random.default_rng(seed)
+    detections = np.empty(n_candidates, dtype=DETECTION_DTYPE)
+    detections['template_idx'] = rng.integers(0, n_templates, n_candidates)
+    detections['scale'] = rng.uniform(0.5, 1.0, n_candidates)
+    detections['score'] = rng.random(n_candidates)
+    top_left = rng.integers(0, image_size, (n_candidates, 2))
+    detections['xyxy'] = np.concatenate([top_left, top_left + rng.integers(30, 120, (n_candidates, 2))], axis=1)
+    return detections
+
+
+def run(template_folder, n_candidates, copies):
+    for per_template in (True, False):
+        detections = random_detections(n_candidates, 15, 1000)
+        start = time.perf_counter()
+        kept = non_max_suppression(detections, 0.3, per_template=per_template)
+        elapsed = time.perf_counter() - start
+        print(f"NMS {n_candidates} ứng viên (per_template={per_template}): "
+              f"{elapsed * 1000:.1f} ms, giữ lại {len(kept)}")
+
+    template = get_template(template_folder)[0]
+    height, width = template.shape[:2]
+    scene = np.full((2 * height + 40, copies * (width + 20) + 20, 3), 255, dtype=np.uint8)
+    for copy in range(copies):
+        x = 20 + copy * (width + 20)
+        scene[20:20 + height, x:x + width] = template
+
+    start = time.perf_counter()
+    detections = multiscale_template_detection(scene, [template], scale_range=(0.8, 1.0), scale_steps=3,
+                                               score_threshold=0.8)
+    elapsed = time.perf_counter() - start
+    print(f"Cảnh tổng hợp {copies} bản sao: tìm thấy {len(detections)} trong {elapsed:.2f} s")
+    for template_idx, scale, score, box in detections:
+        print(f"  template={template_idx} scale={scale:.3f} score={score:.3f} xyxy={box.tolist()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--templates', default='data/templates/finding_01')
+    parser.add_argument('--candidates', type=int, default=5000)
+    parser.add_argument('--copies', type=int, default=4)
+    args = parser.parse_args()
+    run(args.templates, args.candidates, args.copies)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""
+Đánh giá độ chính xác và tốc độ của các bộ so khớp trên bộ dữ liệu có ground
+truth PASCAL VOC (cấu trúc giống `data/`, xem `src.pipeline.batch.iter_dataset`).
+
+Với mỗi bộ so khớp ('template', 'detection', 'orb') báo cáo ghi lại mAP,
+precision/recall, IoU trung bình, thời gian và đỉnh bộ nhớ của từng giai đoạn,
+số lần gọi cv2.matchTemplate và số ảnh/giây. Báo cáo là JSON, có thể so sánh
+với báo cáo của lần chạy trước bằng --compare.
+
+`--synthetic N` tạo N ảnh tổng hợp (template dán ở tỉ lệ/vị trí đã biết) để đo
+trên ảnh lớn hơn và nhiều template hơn hai ảnh mẫu.
+
+Chạy từ thư mục gốc của repository:
+    python -m benchmarks.evaluate --matchers template orb --output report.json
+    python -m benchmarks.evaluate --synthetic 5 --scene-size 2048 2048 --compare report.json
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from src.evaluation.metrics import evaluate_detections
+from src.evaluation.profiling import CallCounter, StageProfiler, max_rss_bytes
+from src.evaluation.synthetic import write_synthetic_dataset
+from src.finding.ORB import orb_detect
+from src.finding.orb_index import ORBDescriptorIndex
+from src.finding.template_bank import TemplateBank
+from src.finding.template_matching import linear_multiscale_template_matching, multiscale_template_detection
+from src.pipeline.batch import iter_dataset
+from src.utils.label_extraction import extract_image_size_from_xml, extract_objects_from_xml, load_voc_annotations
+
+MATCHERS = ('template', 'detection', 'orb')
+REPORT_VERSION = 1
+
+
+def load_ground_truth(xml_path, image_shape):
+    """
+    Đọc ground truth và quy đổi hộp về kích thước ảnh thực tế (ảnh đi kèm có
+    thể được lưu ở độ phân giải khác với lúc gán nhãn).
+    """
+    _, objects = extract_objects_from_xml(xml_path)
+    boxes = np.array([[obj['bbox'][key] for key in ('xmin', 'ymin', 'xmax', 'ymax')] for obj in objects],
+                     dtype=np.float64).reshape(-1, 4)
+    return _rescaled_ground_truth([obj['name'] for obj in objects], boxes, extract_image_size_from_xml(xml_path),
+                                  image_shape)
+
+
+def table_ground_truth(annotations, image_id, image_shape):
+    """
+    Như `load_ground_truth` nhưng lấy từ bảng của `load_voc_annotations`.
+    """
+    objects = annotations['objects'][annotations['offsets'][image_id]:annotations['offsets'][image_id + 1]]
+    declared_size = annotations['image_sizes'][image_id]
+    return _rescaled_ground_truth([annotations['class_names'][class_id] for class_id in objects['class_id']],
+                                  np.array(objects['xyxy'], dtype=np.float64),
+                                  None if np.isnan(declared_size).any() else declared_size, image_shape)
+
+
+def _rescaled_ground_truth(labels, boxes, declared_size, image_shape):
+    if declared_size is not None:
+        boxes *= np.array([image_shape[1] / declared_size[0], image_shape[0] / declared_size[1]] * 2)
+    return {'labels': labels, 'boxes': boxes}
+
+
+def run_matcher(matcher, image, bank, orb_index, args):
+    """
+    Chạy một bộ so khớp và trả kết quả dạng dict 'labels', 'scores', 'boxes'.
+    """
+    match_kwargs = dict(scale_range=tuple(args.scale_range), scale_steps=args.scale_steps)
+    if matcher == 'template':
+        _, _, details = linear_multiscale_template_matching(image, bank, return_details=True, **match_kwargs)
+        return {
+            'labels': [bank.names[detail['template_idx']] for detail in details],
+            'scores': [detail['correlation'] for detail in details],
+            'boxes': [[detail['location'][0], detail['location'][1],
+                       detail['location'][0] + detail['dimensions'][0],
+                       detail['location'][1] + detail['dimensions'][1]] for detail in details],
+        }
+    if matcher == 'detection':
+        detections = multiscale_template_detection(image, bank, score_threshold=args.score_threshold,
+                                                   **match_kwargs)
+    else:
+        detections = orb_detect(image, bank.templates, descriptor_index=orb_index)
+        detections = {'template_idx': detections['template_idx'], 'score': detections['num_inliers'],
+                      'xyxy': detections['xyxy']}
+    return {
+        'labels': [bank.names[idx] for idx in detections['template_idx']],
+        'scores': np.asarray(detections['score'], dtype=np.float64),
+        'boxes': np.asarray(detections['xyxy'], dtype=np.float64),
+    }
+
+
+def evaluate(data_dir, matchers, args):
+    """
+    Chạy các bộ so khớp trên mọi ảnh có ground truth và tổng hợp báo cáo.
+    """
+    profilers = {matcher: StageProfiler(trace_memory=not args.no_trace_memory) for matcher in matchers}
+    call_counts = dict.fromkeys(matchers, 0)
+    predictions = {matcher: [] for matcher in matchers}
+    ground_truths = []
+    banks = {}
+    orb_indices = {}
+    shared = StageProfiler(trace_memory=not args.no_trace_memory)
+    image_names = []
+    annotation_ids = {}
+    ground_truth_dir = os.path.join(data_dir, 'ground_truth')
+    if os.path.isdir(ground_truth_dir):
+        with shared.stage('load_ground_truth'):
+            annotations = load_voc_annotations(ground_truth_dir, cache_dir=args.cache_dir)
+        annotation_ids = {file: image_id for image_id, file in enumerate(annotations['files'])}
+
+    for record in iter_dataset(data_dir, args.template_name):
+        if record['ground_truth_path'] is None:
+            continue
+        with shared.stage('decode'):
+            image = cv2.imread(record['image_path'])
+        if image is None:
+            print(f"Bỏ qua ảnh không đọc được: {record['image_path']}")
+            continue
+        with shared.stage('load_templates'):
+            if record['template_dir'] not in banks:
+                banks[record['template_dir']] = TemplateBank.from_folder(
+                    record['template_dir'], cache_dir=args.cache_dir,
+                    scales=np.linspace(args.scale_range[0], args.scale_range[1], args.scale_steps))
+        bank = banks[record['template_dir']]
+        image_id = annotation_ids[os.path.basename(record['ground_truth_path'])]
+        ground_truths.append(table_ground_truth(annotations, image_id, image.shape))
+        image_names.append(record['name'])
+
+        for matcher in matchers:
+            orb_index = None
+            if matcher == 'orb':
+                with profilers[matcher].stage('build_index'):
+                    if record['template_dir'] not in orb_indices:
+                        orb_indices[record['template_dir']] = ORBDescriptorIndex(bank.templates,
+                                                                                 backend='bruteforce')
+                orb_index = orb_indices[record['template_dir']]
+            with CallCounter() as counter, profilers[matcher].stage('match'):
+                predictions[matcher].append(run_matcher(matcher, image, bank, orb_index, args))
+            call_counts[matcher] += counter.calls
+        print(f"{record['name']}: xong")
+
+    report = {
+        'version': REPORT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {'python': platform.python_version(), 'opencv': cv2.__version__, 'numpy': np.__version__,
+                        'machine': platform.machine()},
+        'config': {'data_dir': data_dir, 'scale_range': list(args.scale_range), 'scale_steps': args.scale_steps,
+                   'iou_threshold': args.iou_threshold, 'score_threshold': args.score_threshold,
+                   'synthetic': args.synthetic},
+        'n_images': len(image_names),
+        'images': image_names,
+        'stages': shared.summary(),
+        'matchers': {},
+    }
+    for matcher in matchers:
+        stages = profilers[matcher].summary()
+        match_time = stages.get('match', {}).get('total_time', 0.0)
+        report['matchers'][matcher] = {
+            'metrics': evaluate_detections(predictions[matcher], ground_truths, args.iou_threshold),
+            'stages': stages,
+            'match_template_calls': call_counts[matcher],
+            'images_per_second': len(image_names) / match_time if match_time > 0 else 0.0,
+        }
+    report['max_rss_bytes'] = max_rss_bytes()
+    return report
+
+
+def print_report(report, baseline=None):
+    """
+    In bảng tóm tắt; nếu có báo cáo cũ thì in thêm chênh lệch.
+    """
+    print(f"\n{report['n_images']} ảnh, max RSS {report['max_rss_bytes'] / 2 ** 20:.0f} MiB")
+    print(f"{'matcher':>10} {'mAP':>7} {'prec':>7} {'recall':>7} {'IoU':>7} {'s/ảnh':>8} {'ảnh/s':>7} "
+          f"{'matchTpl':>9} {'peak MiB':>9}")
+    for matcher, entry in report['matchers'].items():
+        metrics = entry['metrics']
+        match_stage = entry['stages'].get('match', {})
+        print(f"{matcher:>10} {metrics['mAP']:7.3f} {metrics['precision']:7.3f} {metrics['recall']:7.3f} "
+              f"{metrics['mean_iou']:7.3f} {match_stage.get('mean_time', 0):8.3f} {entry['images_per_second']:7.3f} "
+              f"{entry['match_template_calls']:9d} {match_stage.get('peak_memory_bytes', 0) / 2 ** 20:9.1f}")
+        if baseline is not None and matcher in baseline['matchers']:
+            old = baseline['matchers'][matcher]
+            old_time = old['stages'].get('match', {}).get('mean_time', 0)
+            print(f"{'Δ':>10} {metrics['mAP'] - old['metrics']['mAP']:+7.3f} "
+                  f"{metrics['precision'] - old['metrics']['precision']:+7.3f} "
+                  f"{metrics['recall'] - old['metrics']['recall']:+7.3f} "
+                  f"{metrics['mean_iou'] - old['metrics']['mean_iou']:+7.3f} "
+                  f"{match_stage.get('mean_time', 0) - old_time:+8.3f} "
+                  f"{entry['images_per_second'] - old['images_per_second']:+7.3f} "
+                  f"{entry['match_template_calls'] - old['match_template_calls']:+9d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='data')
+    parser.add_argument('--templates', dest='template_name', default='finding_01',
+                        help="Thư mục template dùng chung trong <data>/templates/ ('' để dùng theo tên ảnh)")
+    parser.add_argument('--matchers', nargs='+', choices=MATCHERS, default=list(MATCHERS))
+    parser.add_argument('--scale-range', type=float, nargs=2, default=(0.5, 1.0))
+    parser.add_argument('--scale-steps', type=int, default=10)
+    parser.add_argument('--score-threshold', type=float, default=0.5)
+    parser.add_argument('--iou-threshold', type=float, default=0.5)
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--synthetic', type=int, default=0, help="Số ảnh tổng hợp (0 để dùng --data)")
+    parser.add_argument('--scene-size', type=int, nargs=2, default=(1024, 1024), metavar=('H', 'W'))
+    parser.add_argument('--instances', type=int, default=None, help="Số instance mỗi ảnh tổng hợp")
+    parser.add_argument('--synthetic-source', default='data/templates/finding_01')
+    parser.add_argument('--no-trace-memory', action='store_true', help="Tắt tracemalloc (đo nhanh hơn)")
+    parser.add_argument('--output', default=None, help="File JSON báo cáo")
+    parser.add_argument('--compare', default=None, help="Báo cáo JSON của lần chạy trước")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = args.data
+        if args.synthetic:
+            data_dir = tmp_dir
+            args.template_name = write_synthetic_dataset(
+                tmp_dir, args.synthetic_source, args.synthetic, image_size=tuple(args.scene_size),
+                n_instances=args.instances, scale_range=tuple(args.scale_range))
+        report = evaluate(data_dir, args.matchers, args)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
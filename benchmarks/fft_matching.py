@@ -0,0 +1,144 @@
+"""
+Benchmark FFT backend so với cv2.matchTemplate (spatial) trong
+`linear_multiscale_template_matching`, với template kích thước gốc và
+template phóng to (nơi FFT backend có lợi thế).
+
+`--check` kiểm tra nhanh (không đo) rằng `FFTCorrelationEngine` cho cùng bản đồ
+tương quan với cv2.matchTemplate có mặt nạ, trên ảnh màu và ảnh xám, với cả hai
+phương pháp được hỗ trợ, và `linear_multiscale_template_matching` cho cùng kết
+quả với hai backend; AssertionError nếu kết quả FFT lệch khỏi OpenCV.
+
+Chạy từ thư mục gốc của repository:
+    python -m benchmarks.fft_matching --upscale 1 2
+    python -m benchmarks.fft_matching --check
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from src.finding.fft_matching import SUPPORTED_FFT_METHODS, FFTCorrelationEngine
+from src.finding.template_matching import get_template, linear_multiscale_template_matching
+from src.utils.masking import binary_mask
+
+# Sai lệch cho phép so với cv2.matchTemplate. Ở các cửa sổ gần như phẳng (phương
+# sai trong mặt nạ ~0) cả hai cách tính đều kém ổn định, nên chỉ một phần rất
+# nhỏ vị trí được phép lệch tới MAX_ABS_DIFF.
+PEAK_TOLERANCE = 1e-5
+MEAN_ABS_DIFF = 1e-5
+LOOSE_DIFF = 1e-3
+LOOSE_FRACTION = 1e-3
+MAX_ABS_DIFF = 1e-2
+
+
+def _assert_same_map(fft_map, reference, label):
+    assert fft_map is not None and fft_map.shape == reference.shape, \
+        f"{label}: kích thước {None if fft_map is None else fft_map.shape} khác {reference.shape}"
+    # OpenCV trả NaN/inf khi mẫu số bằng 0, FFT backend trả 0: bỏ qua các vị trí đó
+    finite = np.isfinite(reference)
+    diff = np.abs(fft_map - reference)[finite]
+    reference_peak = tuple(int(v) for v in np.unravel_index(np.argmax(np.where(finite, reference, -np.inf)),
+                                                               reference.shape))
+    fft_peak = tuple(int(v) for v in np.unravel_index(np.argmax(fft_map), fft_map.shape))
+    assert reference_peak == fft_peak, f"{label}: cực đại tại {fft_peak}, OpenCV tại {reference_peak}"
+    assert abs(float(fft_map[fft_peak]) - float(reference[reference_peak])) <= PEAK_TOLERANCE, \
+        f"{label}: giá trị cực đại {fft_map[fft_peak]} khác {reference[reference_peak]}"
+    assert diff.mean() <= MEAN_ABS_DIFF, f"{label}: |Δ| trung bình {diff.mean():.2e}"
+    assert (diff > LOOSE_DIFF).mean() <= LOOSE_FRACTION, \
+        f"{label}: {(diff > LOOSE_DIFF).mean():.2%} vị trí lệch quá {LOOSE_DIFF:g}"
+    assert diff.max() <= MAX_ABS_DIFF, f"{label}: |Δ| lớn nhất {diff.max():.2e}"
+    return diff.max()
+
+
+def check(image_path, template_folder, image_scale=0.35, n_templates=4, batch_size=3):
+    """
+    So sánh FFT backend với cv2.matchTemplate có mặt nạ; AssertionError nếu lệch.
+    """
+    image = cv2.resize(cv2.imread(image_path), (0, 0), fx=image_scale, fy=image_scale)
+    templates = [template for template in get_template(template_folder) if template is not None][:n_templates]
+    # Các template khác kích thước để kiểm tra cả phần đệm trong một lô
+    templates = [cv2.resize(template, (0, 0), fx=0.15 + 0.05 * idx, fy=0.15 + 0.05 * idx)
+                 for idx, template in enumerate(templates)]
+    masks = [binary_mask(template) for template in templates]
+    gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    gray_templates = [cv2.cvtColor(template, cv2.COLOR_BGR2GRAY) for template in templates]
+
+    for mode, target, mode_templates in (('màu', image, templates), ('xám', gray_image, gray_templates)):
+        engine = FFTCorrelationEngine(target)
+        for match_method in SUPPORTED_FFT_METHODS:
+            fft_maps = engine.match(list(zip(mode_templates, masks)), match_method, batch_size=batch_size)
+            worst = max(
+                _assert_same_map(fft_map, cv2.matchTemplate(target, template, match_method, mask=mask),
+                                 f"{mode}, phương pháp {match_method}, template {idx}")
+                for idx, (template, mask, fft_map) in enumerate(zip(mode_templates, masks, fft_maps))
+            )
+            print(f"OK: ảnh {mode}, phương pháp {match_method}: {len(fft_maps)} bản đồ, |Δ| lớn nhất {worst:.2e}")
+
+    details = {
+        backend: linear_multiscale_template_matching(image, templates, scale_range=(0.8, 1.2), scale_steps=3,
+                                                     backend=backend, fft_batch_size=batch_size, draw=False,
+                                                     return_details=True)[2]
+        for backend in ('opencv', 'fft')
+    }
+    for spatial, fft in zip(details['opencv'], details['fft']):
+        assert (spatial['location'], spatial['scale']) == (fft['location'], fft['scale']), \
+            f"template {spatial['template_idx']}: {fft['location']}@{fft['scale']} khác " \
+            f"{spatial['location']}@{spatial['scale']}"
+        assert abs(spatial['correlation'] - fft['correlation']) <= PEAK_TOLERANCE
+    print(f"OK: linear_multiscale_template_matching cùng kết quả với hai backend ({len(details['fft'])} template)")
+
+
+def run(image_path, template_folder, upscales, scale_steps, batch_size):
+    image = cv2.imread(image_path)
+    templates = get_template(template_folder)
+
+    for upscale in upscales:
+        scaled_templates = [
+            cv2.resize(template, (0, 0), fx=upscale, fy=upscale) if template is not None else None
+            for template in templates
+        ]
+        sizes = [template.shape[:2] for template in scaled_templates if template is not None]
+        mean_side = sum(height + width for height, width in sizes) / (2 * len(sizes))
+
+        timings = {}
+        details = {}
+        for backend in ('opencv', 'fft'):
+            start = time.perf_counter()
+            _, _, details[backend] = linear_multiscale_template_matching(
+                image, scaled_templates, scale_steps=scale_steps, backend=backend,
+                fft_batch_size=batch_size, return_details=True)
+            timings[backend] = time.perf_counter() - start
+
+        same_location = sum(
+            spatial['location'] == fft['location'] and spatial['scale'] == fft['scale']
+            for spatial, fft in zip(details['opencv'], details['fft'])
+        )
+        max_diff = max(
+            abs(spatial['correlation'] - fft['correlation'])
+            for spatial, fft in zip(details['opencv'], details['fft'])
+        )
+        print(f"upscale {upscale:g} (cạnh template TB {mean_side:.0f}px): "
+              f"opencv {timings['opencv']:.2f} s, fft {timings['fft']:.2f} s, "
+              f"speedup {timings['opencv'] / timings['fft']:.2f}x, "
+              f"cùng vị trí {same_location}/{len(details['opencv'])}, |Δcorr| max {max_diff:.2e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', default='data/images/finding_01.jpg')
+    parser.add_argument('--templates', default='data/templates/finding_01')
+    parser.add_argument('--upscale', type=float, nargs='+', default=[1.0, 2.0])
+    parser.add_argument('--scale-steps', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--check', action='store_true',
+                        help="Chỉ kiểm tra FFT backend cho cùng kết quả với cv2.matchTemplate")
+    args = parser.parse_args()
+    if args.check:
+        check(args.image, args.templates)
+    else:
+        run(args.image, args.templates, args.upscale, args.scale_steps, args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark chi phí của lớp đo đạc (`src.utils.instrumentation`): thời gian
+`linear_multiscale_template_matching` (và `orb_detect`) khi tắt đo đạc, khi
+bật MemorySink và khi bật ChromeTraceSink; chi phí một lời gọi `span` khi tắt;
+in bảng tổng hợp theo giai đoạn và ghi file trace để mở bằng chrome://tracing.
+
+Chạy từ thư mục gốc của repository:
+    python -m benchmarks.instrumentation_overhead --repeat 5 --trace trace.json
+"""
+import argparse
+import os
+import tempfile
+import time
+import timeit
+
+import cv2
+import numpy as np
+
+from src.finding.ORB import orb_detect
+from src.finding.template_matching import get_template, linear_multiscale_template_matching
+from src.utils.instrumentation import ChromeTraceSink, MemorySink, instrument, span
+
+
+def _best_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(image_path, template_dir, scale_steps, repeat, trace_path):
+    image = cv2.imread(image_path)
+    templates = get_template(template_dir)
+    workloads = {
+        'linear': lambda: linear_multiscale_template_matching(image, templates, scale_steps=scale_steps),
+        'orb': lambda: orb_detect(image, templates),
+    }
+
+    null_span_ns = min(timeit.repeat(lambda: span('x').__enter__(), number=100000, repeat=5)) / 100000 * 1e9
+    print(f"span() khi tắt: {null_span_ns:.0f} ns/lần gọi")
+
+    print(f"{'hàm':>8} {'tắt s':>8} {'memory s':>9} {'trace s':>8} {'sự kiện':>8} {'chi phí tắt':>12}")
+    for name, workload in workloads.items():
+        workload()  # khởi động
+        disabled = _best_time(workload, repeat)
+        memory = MemorySink()
+        with instrument(memory):
+            enabled = _best_time(workload, repeat)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with instrument(ChromeTraceSink(os.path.join(tmp_dir, 'trace.json'))):
+                traced = _best_time(workload, repeat)
+        n_events = len(memory.events) // repeat
+        # Ước lượng chi phí khi tắt: mỗi điểm đo tốn một lần kiểm tra như span()
+        disabled_overhead = n_events * null_span_ns * 1e-9 / disabled
+        print(f"{name:>8} {disabled:8.3f} {enabled:9.3f} {traced:8.3f} {n_events:8d} {disabled_overhead:11.4%}")
+
+    memory = MemorySink()
+    with instrument(memory, ChromeTraceSink(trace_path)):
+        linear_multiscale_template_matching(image, templates, scale_steps=scale_steps)
+    summary = memory.summary()
+    print("\nTổng hợp theo giai đoạn (linear_multiscale_template_matching):")
+    for stage, entry in sorted(summary['spans'].items(), key=lambda item: -item[1]['total_time']):
+        print(f"{stage:>40}: {entry['count']:5d} lần, tổng {entry['total_time'] * 1000:9.2f} ms, "
+              f"TB {entry['mean_time'] * 1000:7.3f} ms")
+    for counter, entry in sorted(summary['counters'].items()):
+        print(f"{counter:>40}: {entry['count']:5d} lần, tổng {entry['total']}")
+    per_template = memory.summary(group_by=('template_idx',))['spans']
+    template_times = {key[1]: entry['total_time'] for key, entry in per_template.items() if key[0] == 'template'}
+    if template_times:
+        slowest = max(template_times, key=template_times.get)
+        print(f"Template chậm nhất: {slowest} ({template_times[slowest] * 1000:.1f} ms, "
+              f"TB {np.mean(list(template_times.values())) * 1000:.1f} ms/template)")
+    print(f"Đã ghi trace: {trace_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', default=os.path.join('data', 'images', 'finding_01.jpg'))
+    parser.add_argument('--templates', default=os.path.join('data', 'templates', 'finding_01'))
+    parser.add_argument('--scale-steps', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--trace', default='trace.json', help="File Chrome trace-event đầu ra")
+    args = parser.parse_args()
+    run(args.image, args.templates, args.scale_steps, args.repeat, args.trace)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark ghi báo cáo nhiều ảnh: `plot_image_grid` (một subplot matplotlib mỗi
+ảnh, rồi savefig) so với `write_mosaic` / `encode_mosaic` (một canvas NumPy,
+tiêu đề bằng cv2.putText, bounding box vẽ theo lô). In thời gian và đỉnh bộ
+nhớ cấp phát (tracemalloc) của mỗi cách.
+
+Ảnh đầu vào là các vùng cắt ngẫu nhiên của ảnh mẫu cùng bounding box ngẫu nhiên,
+mô phỏng ảnh trực quan hóa kết quả ORB hoặc mặt nạ template.
+
+Chạy từ thư mục gốc của repository:
+    python -m benchmarks.mosaic_render --images 200 --cell-size 160 160
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from src.utils.visualization import encode_mosaic, plot_image_grid, render_mosaic, write_mosaic
+
+
+def _make_images(image_path, n_images, seed=0):
+    rng = np.random.default_rng(seed)
+    scene = cv2.imread(image_path)
+    height, width = scene.shape[:2]
+    images, boxes = [], []
+    for _ in range(n_images):
+        crop_height, crop_width = rng.integers(100, min(height, width) // 2, size=2)
+        y, x = rng.integers(0, height - crop_height), rng.integers(0, width - crop_width)
+        images.append(scene[y:y + crop_height, x:x + crop_width])
+        box_xy = rng.uniform(0, [crop_width / 2, crop_height / 2], size=(3, 2))
+        boxes.append(np.hstack([box_xy, box_xy + rng.uniform(10, [crop_width / 2, crop_height / 2], size=(3, 2))]))
+    return images, boxes
+
+
+def _measure(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def run(image_path, n_images, cell_size, skip_matplotlib):
+    images, boxes = _make_images(image_path, n_images)
+    titles = [f"Template {idx}: {len(image_boxes)} hộp" for idx, image_boxes in enumerate(boxes)]
+    print(f"{n_images} ảnh, ô {cell_size[0]}x{cell_size[1]}")
+    print(f"{'cách':>22} {'giây':>8} {'đỉnh MiB':>9} {'KiB file':>9}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        def report(name, function, path=None):
+            elapsed, peak = _measure(function)
+            size = f"{os.path.getsize(path) / 1024:9.0f}" if path is not None else f"{'-':>9}"
+            print(f"{name:>22} {elapsed:8.3f} {peak / 2 ** 20:9.1f} {size}")
+
+        report('render_mosaic', lambda: render_mosaic(images, titles=titles, boxes=boxes, cell_size=cell_size))
+        mosaic_path = os.path.join(tmp_dir, 'mosaic.png')
+        report('write_mosaic (png)', lambda: write_mosaic(mosaic_path, images, titles=titles, boxes=boxes,
+                                                          cell_size=cell_size), mosaic_path)
+        jpeg_path = os.path.join(tmp_dir, 'mosaic.jpg')
+        report('write_mosaic (jpg)', lambda: write_mosaic(jpeg_path, images, titles=titles, boxes=boxes,
+                                                          cell_size=cell_size), jpeg_path)
+        report('encode_mosaic (jpg)', lambda: encode_mosaic(images, ext='.jpg', titles=titles, boxes=boxes,
+                                                            cell_size=cell_size))
+
+        if not skip_matplotlib:
+            import matplotlib
+            matplotlib.use('Agg')
+            import matplotlib.pyplot as plt
+
+            def matplotlib_grid():
+                drawn = []
+                for image, image_boxes in zip(images, boxes):
+                    image = image.copy()
+                    for x0, y0, x1, y1 in np.round(image_boxes).astype(int):
+                        cv2.rectangle(image, (x0, y0), (x1, y1), (0, 0, 255), 2)
+                    drawn.append(image)
+                cols = int(np.ceil(np.sqrt(len(drawn))))
+                figure, _ = plot_image_grid(drawn, titles=titles, figsize=(cols * cell_size[0] / 100,
+                                                                           cols * cell_size[1] / 100))
+                figure.savefig(os.path.join(tmp_dir, 'grid.png'))
+                plt.close(figure)
+
+            report('plot_image_grid (png)', matplotlib_grid, os.path.join(tmp_dir, 'grid.png'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', default=os.path.join('data', 'images', 'finding_01.jpg'))
+    parser.add_argument('--images', type=int, default=200)
+    parser.add_argument('--cell-size', type=int, nargs=2, default=(160, 160), metavar=('W', 'H'))
+    parser.add_argument('--skip-matplotlib', action='store_true', help="Không chạy phần so sánh với matplotlib")
+    args = parser.parse_args()
+    run(args.image, args.images, tuple(args.cell_size), args.skip_matplotlib)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark `orb_detect` (headless: ratio test vector hóa, không vẽ, không in)
+so với `orb_detect_and_visualize_matches`. Ảnh thử được ghép từ các vùng cắt
+của ảnh gốc để mọi template đều có kết quả khớp (trường hợp tốn chi phí vẽ nhất).
+
+Chạy từ thư mục gốc của repository:
+    python -m benchmarks.orb_headless --crops 36
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import cv2
+import numpy as np
+
+from src.finding.ORB import orb_detect, orb_detect_and_visualize_matches
+from src.finding.orb_index import ORBDescriptorIndex
+
+
+def make_scene(image, n_crops, crop_size=160, seed=0):
+    """
+    Tạo ảnh thử và danh sách template là các vùng cắt ngẫu nhiên của `image`.
+    """
+    rng = np.random.default_rng(seed)
+    columns = int(np.ceil(np.sqrt(n_crops)))
+    scene = np.full((columns * crop_size * 2, columns * crop_size * 2, 3), 127, np.uint8)
+    templates = []
+    for idx in range(n_crops):
+        y = rng.integers(0, image.shape[0] - crop_size)
+        x = rng.integers(0, image.shape[1] - crop_size)
+        crop = image[y:y + crop_size, x:x + crop_size].copy()
+        row, col = divmod(idx, columns)
+        top, left = row * crop_size * 2 + crop_size // 2, col * crop_size * 2 + crop_size // 2
+        scene[top:top + crop_size, left:left + crop_size] = crop
+        templates.append(crop)
+    return scene, templates
+
+
+def run(image_path, n_crops):
+    scene, templates = make_scene(cv2.imread(image_path), n_crops)
+    index = ORBDescriptorIndex(templates, backend='bruteforce')
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        _, summary = orb_detect_and_visualize_matches(scene, templates)
+        baseline_time = time.perf_counter() - start
+    print(f"{len(templates)} template; visualize: {baseline_time:.3f} s, {len(summary)} template đạt ngưỡng")
+
+    for name, kwargs in (('headless', {}), ('headless + index', {'descriptor_index': index})):
+        start = time.perf_counter()
+        detections = orb_detect(scene, templates, **kwargs)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>16}: {elapsed:.3f} s ({baseline_time / elapsed:.2f}x), {len(detections)} phát hiện, "
+              f"inlier trung vị {np.median(detections['num_inliers']) if len(detections) else 0:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', default='data/images/finding_01.jpg')
+    parser.add_argument('--crops', type=int, default=36)
+    args = parser.parse_args()
+    run(args.image, args.crops)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark chỉ mục descriptor ORB dùng chung (`ORBDescriptorIndex`) so với
+đối sánh riêng từng template (như `orb_detect` không có chỉ mục và
+`orb_detect_and_visualize_matches`).
+
+Ngoài các template mẫu, template tổng hợp là các vùng cắt ngẫu nhiên (xoay, co
+giãn) của ảnh đích, nên mỗi template khác nhau và thật sự có cặp khớp. Benchmark
+kiểm tra (assert):
+    - tập cặp khớp của từng template qua chỉ mục 'bruteforce' giống hệt
+      BFMatcher.knnMatch(des_template, des_image, k=2) + ratio test của template đó;
+    - `orb_detect` dùng chỉ mục cho cùng kết quả và nhanh hơn khi không dùng chỉ
+      mục (lợi ích đến từ việc không trích xuất lại đặc trưng của template);
+    - backend mặc định 'bruteforce' không chậm hơn FLANN LSH.
+
+Chạy từ thư mục gốc của repository:
+    python -m benchmarks.orb_index --n-templates 300
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from src.finding.ORB import orb_detect
+from src.finding.orb_index import ORBDescriptorIndex
+from src.finding.template_matching import get_template
+
+
+def _best_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def make_templates(image, template_folder, n_templates, seed=0):
+    """
+    Template mẫu cộng các vùng cắt ngẫu nhiên (xoay, co giãn) của ảnh đích.
+    """
+    rng = np.random.default_rng(seed)
+    templates = [template for template in get_template(template_folder) if template is not None]
+    height, width = image.shape[:2]
+    while len(templates) < n_templates:
+        crop_height, crop_width = rng.integers(80, 240, size=2)
+        y, x = rng.integers(0, height - crop_height), rng.integers(0, width - crop_width)
+        crop = image[y:y + crop_height, x:x + crop_width]
+        rotation = cv2.getRotationMatrix2D((crop_width / 2, crop_height / 2), rng.uniform(-30, 30),
+                                           rng.uniform(0.8, 1.2))
+        templates.append(cv2.warpAffine(crop, rotation, (int(crop_width), int(crop_height)),
+                                        borderMode=cv2.BORDER_REPLICATE))
+    return templates[:n_templates]
+
+
+def per_template_matches(templates, image_descriptors, n_features, ratio_test_thresh=0.75):
+    """
+    Đường cơ sở: trích xuất ORB và BFMatcher.knnMatch riêng cho từng template.
+    """
+    orb = cv2.ORB_create(nfeatures=n_features)
+    matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
+    matches = {}
+    for template_idx, template in enumerate(templates):
+        _, descriptors = orb.detectAndCompute(cv2.cvtColor(template, cv2.COLOR_BGR2GRAY), None)
+        if descriptors is None:
+            continue
+        good = {(m.queryIdx, m.trainIdx) for pair in matcher.knnMatch(descriptors, image_descriptors, k=2)
+                if len(pair) == 2 for m, n in [pair] if m.distance < ratio_test_thresh * n.distance}
+        if good:
+            matches[template_idx] = good
+    return matches
+
+
+def run(image_path, template_folder, n_templates, repeat):
+    image = cv2.imread(image_path)
+    templates = make_templates(image, template_folder, n_templates)
+
+    start = time.perf_counter()
+    index = ORBDescriptorIndex(templates)
+    build_time = time.perf_counter() - start
+    print(f"{len(templates)} template, {len(index.descriptors)} descriptor; dựng chỉ mục {build_time:.3f} s")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_path = os.path.join(tmp_dir, 'orb_index.npz')
+        index.save(index_path)
+        start = time.perf_counter()
+        flann_index = ORBDescriptorIndex.load(index_path, backend='flann')
+        print(f"Nạp lại chỉ mục đã lưu: {time.perf_counter() - start:.3f} s")
+
+    orb = cv2.ORB_create(nfeatures=index.n_features)
+    _, image_descriptors = orb.detectAndCompute(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), None)
+
+    # Độ chính xác: cặp khớp theo từng template phải trùng với đường cơ sở
+    baseline = per_template_matches(templates, image_descriptors, index.n_features)
+    indexed = {template_idx: {(m.queryIdx, m.trainIdx) for m in matches}
+               for template_idx, matches in index.match(image_descriptors).items()}
+    assert indexed == baseline, \
+        f"{sum(indexed.get(idx) != baseline.get(idx) for idx in set(indexed) | set(baseline))} template khác đường cơ sở"
+    flann = {template_idx: {(m.queryIdx, m.trainIdx) for m in matches}
+             for template_idx, matches in flann_index.match(image_descriptors).items()}
+    n_baseline = sum(len(matches) for matches in baseline.values())
+    flann_recall = sum(len(flann.get(idx, set()) & matches) for idx, matches in baseline.items()) / max(n_baseline, 1)
+    print(f"Cặp khớp: {n_baseline} trên {len(baseline)} template, chỉ mục bruteforce trùng đường cơ sở, "
+          f"FLANN tìm lại {flann_recall:.1%}")
+
+    # Chỉ riêng bước đối sánh, với đặc trưng đã trích xuất sẵn
+    template_descriptors = [index.descriptors[index.template_ids == idx] for idx in range(len(templates))]
+    bf_matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
+    match_times = {
+        f"{len(templates)} lần knnMatch": _best_time(
+            lambda: [bf_matcher.knnMatch(descriptors, image_descriptors, k=2)
+                     for descriptors in template_descriptors if len(descriptors)], repeat),
+        'chỉ mục bruteforce': _best_time(lambda: index.match(image_descriptors), repeat),
+        'chỉ mục flann': _best_time(lambda: flann_index.match(image_descriptors), repeat),
+    }
+    for name, elapsed in match_times.items():
+        print(f"Đối sánh, {name:>20}: {elapsed:.3f} s (tốt nhất {repeat} lần)")
+
+    # Toàn bộ orb_detect: không có chỉ mục thì ORB chạy lại trên mọi template mỗi ảnh
+    detections = {}
+    detect_times = {}
+    for name, kwargs in (('từng template', {}), ('chỉ mục', {'descriptor_index': index})):
+        detections[name] = orb_detect(image, templates, **kwargs)
+        detect_times[name] = _best_time(lambda: orb_detect(image, templates, **kwargs), repeat)
+        print(f"orb_detect, {name:>14}: {detect_times[name]:.3f} s, {len(detections[name])} phát hiện")
+    assert np.array_equal(detections['chỉ mục']['template_idx'], detections['từng template']['template_idx'])
+    print(f"Chỉ mục nhanh hơn {detect_times['từng template'] / detect_times['chỉ mục']:.1f} lần mỗi ảnh")
+
+    assert detect_times['chỉ mục'] < detect_times['từng template'], "orb_detect với chỉ mục không nhanh hơn"
+    assert match_times['chỉ mục bruteforce'] <= match_times['chỉ mục flann'], \
+        (f"FLANN LSH nhanh hơn backend mặc định 'bruteforce' ({match_times['chỉ mục flann']:.3f} s so với "
+         f"{match_times['chỉ mục bruteforce']:.3f} s): cân nhắc đổi mặc định của ORBDescriptorIndex")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', default='data/images/finding_01.jpg')
+    parser.add_argument('--templates', default='data/templates/finding_01')
+    parser.add_argument('--n-templates', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=3, help="Số lần đo mỗi chế độ (lấy thời gian tốt nhất)")
+    args = parser.parse_args()
+    run(args.image, args.templates, args.n_templates, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Benchmark chế độ song song (thread/process) của `linear_multiscale_template_matching`
+so với đường thực thi tuần tự, kiểm tra kết quả giống hệt nhau.
+
+Chạy từ thư mục gốc của repository:
+    python -m benchmarks.parallel_matching --workers 8
+"""
+import argparse
+import os
+import time
+
+import cv2
+
+from src.finding.template_matching import get_template, linear_multiscale_template_matching
+
+
+def run(image_path, template_folder, workers, scale_steps, pyramid_levels):
+    image = cv2.imread(image_path)
+    templates = get_template(template_folder)
+    n_jobs = sum(template is not None for template in templates) * scale_steps
+    print(f"{n_jobs} job (template x tỉ lệ), {os.cpu_count()} CPU, {workers} worker")
+
+    timings = {}
+    details = {}
+    for executor in (None, 'thread', 'process'):
+        start = time.perf_counter()
+        _, _, details[executor] = linear_multiscale_template_matching(
+            image, templates, scale_steps=scale_steps, pyramid_levels=pyramid_levels,
+            executor=executor, n_workers=workers, return_details=True)
+        timings[executor] = time.perf_counter() - start
+
+    serial_time = timings[None]
+    for executor, elapsed in timings.items():
+        identical = details[executor] == details[None]
+        print(f"{executor or 'serial':>8}: {elapsed:7.2f} s  speedup {serial_time / elapsed:5.2f}x  "
+              f"identical={identical}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', default='data/images/finding_01.jpg')
+    parser.add_argument('--templates', default='data/templates/finding_01')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--scale-steps', type=int, default=10)
+    parser.add_argument('--pyramid-levels', type=int, default=0)
+    args = parser.parse_args()
+    run(args.image, args.templates, args.workers, args.scale_steps, args.pyramid_levels)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark bộ lọc sơ bộ (`prefilter=True`) của `linear_multiscale_template_matching`
+trên bộ dữ liệu có ground truth: với mỗi số vùng ứng viên báo cáo recall của
+bộ lọc (ground truth nằm trong một vùng ứng viên cùng lớp), mAP/recall cuối,
+số lần gọi cv2.matchTemplate và thời gian, so với quét toàn ảnh.
+
+Chạy từ thư mục gốc của repository:
+    python -m benchmarks.prefilter --candidates 10 15 20
+    python -m benchmarks.prefilter --synthetic 3 --scene-size 1024 1024
+"""
+import argparse
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.evaluate import load_ground_truth
+from src.evaluation.metrics import evaluate_detections, window_recall
+from src.evaluation.profiling import CallCounter
+from src.evaluation.synthetic import write_synthetic_dataset
+from src.finding.template_bank import TemplateBank
+from src.finding.template_matching import linear_multiscale_template_matching, prefilter_candidate_windows
+from src.pipeline.batch import iter_dataset
+
+
+def _predictions(details, names):
+    return {
+        'labels': [names[detail['template_idx']] for detail in details],
+        'scores': [detail['correlation'] for detail in details],
+        'boxes': [[detail['location'][0], detail['location'][1],
+                   detail['location'][0] + detail['dimensions'][0],
+                   detail['location'][1] + detail['dimensions'][1]] for detail in details],
+    }
+
+
+def run(data_dir, template_name, candidate_counts, bins, margin, scale_range, scale_steps, iou_threshold):
+    scales = np.linspace(scale_range[0], scale_range[1], scale_steps)
+    images, ground_truths, banks = [], [], {}
+    for record in iter_dataset(data_dir, template_name):
+        if record['ground_truth_path'] is None:
+            continue
+        image = cv2.imread(record['image_path'])
+        if image is None:
+            continue
+        if record['template_dir'] not in banks:
+            banks[record['template_dir']] = TemplateBank.from_folder(record['template_dir'], scales=scales)
+        images.append((image, banks[record['template_dir']]))
+        ground_truths.append(load_ground_truth(record['ground_truth_path'], image.shape))
+    print(f"{len(images)} ảnh, {sum(len(gt['labels']) for gt in ground_truths)} đối tượng")
+
+    configurations = {'toàn ảnh': dict()}
+    for n_candidates in candidate_counts:
+        configurations[f"lọc k={n_candidates}"] = dict(prefilter=True, prefilter_candidates=n_candidates,
+                                                       prefilter_bins=bins, prefilter_margin=margin)
+
+    print(f"{'chế độ':>12} {'recall lọc':>11} {'recall':>7} {'mAP':>7} {'matchTpl':>9} {'lọc s':>7} {'tổng s':>8}")
+    for name, kwargs in configurations.items():
+        predictions, windows = [], []
+        prefilter_time = 0.0
+        with CallCounter() as counter:
+            start = time.perf_counter()
+            for image, bank in images:
+                _, _, details = linear_multiscale_template_matching(image, bank, scale_range=scale_range,
+                                                                    scale_steps=scale_steps, return_details=True,
+                                                                    **kwargs)
+                predictions.append(_predictions(details, bank.names))
+            elapsed = time.perf_counter() - start
+
+        window_metrics = None
+        if kwargs:
+            for image, bank in images:
+                prefilter_start = time.perf_counter()
+                candidates = prefilter_candidate_windows(image, bank, scale_range, scale_steps,
+                                                         n_candidates=kwargs['prefilter_candidates'],
+                                                         bins=bins, margin=margin)
+                prefilter_time += time.perf_counter() - prefilter_start
+                windows.append({'labels': [bank.names[idx] for idx in candidates['template_idx']],
+                                'boxes': candidates['xyxy']})
+            window_metrics = window_recall(windows, ground_truths)
+
+        metrics = evaluate_detections(predictions, ground_truths, iou_threshold)
+        window_cell = f"{window_metrics['recall']:.3f}" if window_metrics is not None else '-'
+        print(f"{name:>12} {window_cell:>11} {metrics['recall']:7.3f} {metrics['mAP']:7.3f} {counter.calls:9d} "
+              f"{prefilter_time:7.2f} {elapsed:8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='data')
+    parser.add_argument('--templates', dest='template_name', default='finding_01')
+    parser.add_argument('--candidates', type=int, nargs='+', default=(10, 20, 30))
+    parser.add_argument('--bins', type=int, default=32)
+    parser.add_argument('--margin', type=float, default=0.25)
+    parser.add_argument('--scale-range', type=float, nargs=2, default=(0.5, 1.0))
+    parser.add_argument('--scale-steps', type=int, default=10)
+    parser.add_argument('--iou-threshold', type=float, default=0.5)
+    parser.add_argument('--synthetic', type=int, default=0, help="Số ảnh tổng hợp (0 để dùng --data)")
+    parser.add_argument('--scene-size', type=int, nargs=2, default=(1024, 1024), metavar=('H', 'W'))
+    parser.add_argument('--synthetic-source', default='data/templates/finding_01')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = args.data
+        if args.synthetic:
+            data_dir = tmp_dir
+            args.template_name = write_synthetic_dataset(tmp_dir, args.synthetic_source, args.synthetic,
+                                                         image_size=tuple(args.scene_size))
+        run(data_dir, args.template_name, args.candidates, args.bins, args.margin, tuple(args.scale_range),
+            args.scale_steps, args.iou_threshold)
+
+
+if __name__ == '__main__':
+    main()
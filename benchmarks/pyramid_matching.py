@@ -0,0 +1,66 @@
+"""
+Benchmark so sánh chế độ quét tuyến tính và chế độ kim tự tháp của
+`linear_multiscale_template_matching` trên ảnh finding_01 với 15 template.
+
+Chạy từ thư mục gốc của repository:
+    python -m benchmarks.pyramid_matching --levels 1
+"""
+import argparse
+import time
+
+import cv2
+
+from src.finding.template_matching import get_template, linear_multiscale_template_matching
+
+
+def run(image_path, template_folder, levels, candidates, margin, scale_steps):
+    image = cv2.imread(image_path)
+    templates = get_template(template_folder)
+
+    start = time.perf_counter()
+    _, _, linear_details = linear_multiscale_template_matching(
+        image, templates, scale_steps=scale_steps, return_details=True)
+    linear_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _, _, pyramid_details = linear_multiscale_template_matching(
+        image, templates, scale_steps=scale_steps, pyramid_levels=levels,
+        pyramid_candidates=candidates, pyramid_margin=margin, return_details=True)
+    pyramid_time = time.perf_counter() - start
+
+    pyramid_by_idx = {detail['template_idx']: detail for detail in pyramid_details}
+    agreed = 0
+    print(f"{'template':>8} {'linear loc':>12} {'pyramid loc':>12} {'scale L/P':>11} {'corr L/P':>13}")
+    for linear in linear_details:
+        pyramid = pyramid_by_idx.get(linear['template_idx'])
+        if pyramid is None:
+            print(f"{linear['template_idx']:>8} {str(linear['location']):>12} {'-':>12}")
+            continue
+        dx = abs(linear['location'][0] - pyramid['location'][0])
+        dy = abs(linear['location'][1] - pyramid['location'][1])
+        same = dx <= margin and dy <= margin and abs(linear['scale'] - pyramid['scale']) < 1e-9
+        agreed += same
+        print(f"{linear['template_idx']:>8} {str(linear['location']):>12} {str(pyramid['location']):>12} "
+              f"{linear['scale']:.3f}/{pyramid['scale']:.3f} "
+              f"{linear['correlation']:.3f}/{pyramid['correlation']:.3f}{'' if same else '  *'}")
+
+    print(f"\nLinear : {linear_time:.2f} s")
+    print(f"Pyramid: {pyramid_time:.2f} s (levels={levels}, candidates={candidates})")
+    print(f"Speedup: {linear_time / pyramid_time:.1f}x")
+    print(f"Agreement (|dx|,|dy| <= {margin}px, same scale): {agreed}/{len(linear_details)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', default='data/images/finding_01.jpg')
+    parser.add_argument('--templates', default='data/templates/finding_01')
+    parser.add_argument('--levels', type=int, default=1)
+    parser.add_argument('--candidates', type=int, default=3)
+    parser.add_argument('--margin', type=int, default=4)
+    parser.add_argument('--scale-steps', type=int, default=10)
+    args = parser.parse_args()
+    run(args.image, args.templates, args.levels, args.candidates, args.margin, args.scale_steps)
+
+
+if __name__ == '__main__':
+    main()
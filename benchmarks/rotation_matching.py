@@ -0,0 +1,108 @@
+"""
+Benchmark tìm kiếm có xoay (`angles=...`) của `linear_multiscale_template_matching`
+trên ảnh tổng hợp có template bị xoay ngẫu nhiên: so sánh tìm chỉ theo tỉ lệ,
+tìm thô-đến-tinh trên lưới (góc, tỉ lệ) và (tùy chọn) quét vét cạn mọi góc ở
+độ phân giải gốc. In số lần gọi cv2.matchTemplate, thời gian và recall
+(IoU >= 0.5), và kiểm tra (assert) recall của tìm thô-đến-tinh không thấp hơn
+`--min-recall`; với `--naive`, không thấp hơn recall vét cạn quá
+`--max-recall-gap`.
+
+Chạy từ thư mục gốc của repository:
+    python -m benchmarks.rotation_matching
+    python -m benchmarks.rotation_matching --naive   # thêm quét vét cạn (chậm)
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from src.evaluation.metrics import evaluate_detections
+from src.evaluation.profiling import CallCounter
+from src.evaluation.synthetic import make_synthetic_scene
+from src.finding.template_bank import TemplateBank
+from src.finding.template_matching import linear_multiscale_template_matching
+from src.finding.template_registry import TemplateRegistry
+
+
+def run(template_folder, n_templates, n_scenes, image_size, angle_step, scale_steps, coarse_stride, levels,
+        candidates, naive, seed, min_recall, max_recall_gap):
+    registry = TemplateRegistry(template_folder)
+    names = registry.names[:n_templates]
+    templates = [registry[name] for name in names]
+    scales = np.linspace(0.5, 1.0, scale_steps)
+    angles = np.arange(0, 360, angle_step)
+
+    scenes = [make_synthetic_scene(templates, names, image_size=image_size, scale_range=(0.5, 1.0),
+                                   rotation_range=(0, 360), seed=seed + idx) for idx in range(n_scenes)]
+    ground_truths = [{'labels': [obj['name'] for obj in objects],
+                      'boxes': [[obj['bbox'][key] for key in ('xmin', 'ymin', 'xmax', 'ymax')] for obj in objects]}
+                     for _, objects in scenes]
+
+    start = time.perf_counter()
+    bank = TemplateBank(templates, scales=scales, names=names, angles=angles)
+    print(f"TemplateBank: {len(scales)} tỉ lệ x {len(angles)} góc, tiền xử lý {time.perf_counter() - start:.2f} s")
+
+    configurations = {
+        'chỉ tỉ lệ': dict(),
+        'xoay thô-tinh': dict(angles=angles, angle_coarse_stride=coarse_stride, angle_levels=levels,
+                              angle_candidates=candidates),
+    }
+    if naive:
+        configurations['xoay vét cạn'] = dict(angles=angles, angle_coarse_stride=1, angle_levels=0,
+                                              angle_candidates=1)
+
+    recalls = {}
+    for name, kwargs in configurations.items():
+        predictions = []
+        with CallCounter() as counter:
+            start = time.perf_counter()
+            for scene, _ in scenes:
+                _, _, details = linear_multiscale_template_matching(scene, bank, scale_steps=scale_steps,
+                                                                    return_details=True, **kwargs)
+                predictions.append({
+                    'labels': [names[detail['template_idx']] for detail in details],
+                    'scores': [detail['correlation'] for detail in details],
+                    'boxes': [[detail['location'][0], detail['location'][1],
+                               detail['location'][0] + detail['dimensions'][0],
+                               detail['location'][1] + detail['dimensions'][1]] for detail in details],
+                })
+            elapsed = time.perf_counter() - start
+        metrics = evaluate_detections(predictions, ground_truths)
+        recalls[name] = metrics['recall']
+        print(f"{name:>14}: {counter.calls:6d} matchTemplate, {elapsed:7.2f} s "
+              f"({elapsed / n_scenes:.2f} s/ảnh), recall {metrics['recall']:.3f}, mAP {metrics['mAP']:.3f}")
+
+    assert recalls['xoay thô-tinh'] >= min_recall, \
+        f"Recall thô-tinh {recalls['xoay thô-tinh']:.3f} thấp hơn {min_recall}"
+    if naive:
+        assert recalls['xoay thô-tinh'] >= recalls['xoay vét cạn'] - max_recall_gap, \
+            (f"Recall thô-tinh {recalls['xoay thô-tinh']:.3f} kém vét cạn {recalls['xoay vét cạn']:.3f} "
+             f"quá {max_recall_gap}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--templates', default=os.path.join('data', 'templates', 'finding_01'))
+    parser.add_argument('--n-templates', type=int, default=5)
+    parser.add_argument('--n-scenes', type=int, default=3)
+    parser.add_argument('--image-size', type=int, nargs=2, default=(768, 768))
+    parser.add_argument('--angle-step', type=float, default=10)
+    parser.add_argument('--scale-steps', type=int, default=6)
+    parser.add_argument('--coarse-stride', type=int, default=2)
+    parser.add_argument('--levels', type=int, default=1)
+    parser.add_argument('--candidates', type=int, default=40)
+    parser.add_argument('--naive', action='store_true', help="Thêm quét vét cạn mọi góc ở độ phân giải gốc")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--min-recall', type=float, default=0.75,
+                        help="Recall tối thiểu của tìm thô-đến-tinh (vét cạn đạt 0.80 với tham số mặc định)")
+    parser.add_argument('--max-recall-gap', type=float, default=0.07,
+                        help="Mức recall được phép kém vét cạn khi chạy --naive (0.07: một đối tượng trên 15)")
+    args = parser.parse_args()
+    run(args.templates, args.n_templates, args.n_scenes, tuple(args.image_size), args.angle_step, args.scale_steps,
+        args.coarse_stride, args.levels, args.candidates, args.naive, args.seed, args.min_recall,
+        args.max_recall_gap)
+
+
+if __name__ == '__main__':
+    main()
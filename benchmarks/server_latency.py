@@ -0,0 +1,138 @@
+"""
+Benchmark detection daemon (`src.pipeline.server`): so sánh chạy "nguội" (mỗi
+lần một tiến trình Python mới: import, nạp template, trích xuất ORB rồi mới
+phát hiện) với gửi yêu cầu tới daemon đã nạp sẵn, tuần tự và đồng thời từ
+nhiều luồng client. In độ trễ p50/p95, thông lượng và bộ đếm của server.
+
+Chạy từ thư mục gốc của repository:
+    python -m benchmarks.server_latency --matcher orb --requests 20 --concurrency 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from src.pipeline.client import DetectionClient
+
+# Một lần chạy script độc lập: cùng đường xử lý với daemon nhưng không có gì được nạp sẵn
+_COLD_SCRIPT = """
+import sys
+from src.pipeline.server import DetectionServer
+server = DetectionServer(sys.argv[1], scale_steps=int(sys.argv[4]))
+server._detect_one({'template': sys.argv[2], 'matcher': sys.argv[3], 'path': sys.argv[5]}, b'')
+"""
+
+
+def _summary(latencies, elapsed):
+    latencies = np.asarray(latencies)
+    return (f"p50 {np.percentile(latencies, 50) * 1000:8.1f} ms, p95 {np.percentile(latencies, 95) * 1000:8.1f} ms, "
+            f"{len(latencies) / elapsed:6.2f} yêu cầu/s")
+
+
+def _wait_for_server(socket_path, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Server đã thoát khi khởi động.")
+        if os.path.exists(socket_path):
+            try:
+                with DetectionClient(path=socket_path) as client:
+                    if client.ping():
+                        return
+            except OSError:
+                pass
+        time.sleep(0.1)
+    raise TimeoutError("Server không khởi động kịp.")
+
+
+def run(template_root, template, image_path, matcher, scale_steps, n_requests, n_cold, concurrency, send_bytes):
+    cold_latencies = []
+    start = time.perf_counter()
+    for _ in range(n_cold):
+        request_start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', _COLD_SCRIPT, template_root, template, matcher, str(scale_steps),
+                        image_path], check=True)
+        cold_latencies.append(time.perf_counter() - request_start)
+    if cold_latencies:
+        print(f"{'nguội':>16}: {_summary(cold_latencies, time.perf_counter() - start)}")
+
+    with open(image_path, 'rb') as file:
+        image_bytes = file.read()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        socket_path = os.path.join(tmp_dir, 'detect.sock')
+        startup = time.perf_counter()
+        process = subprocess.Popen([sys.executable, '-m', 'src.pipeline.server', '--templates', template_root,
+                                    '--socket', socket_path, '--preload', template,
+                                    '--scale-steps', str(scale_steps)], stderr=subprocess.DEVNULL)
+        try:
+            _wait_for_server(socket_path, process)
+            print(f"Khởi động daemon (một lần): {time.perf_counter() - startup:.2f} s")
+
+            def send(client):
+                if send_bytes:
+                    return client.detect(image_bytes, template=template, matcher=matcher)
+                return client.detect(path=image_path, template=template, matcher=matcher)
+
+            with DetectionClient(path=socket_path) as client:
+                send(client)  # khởi động các đường xử lý của worker
+                latencies = []
+                start = time.perf_counter()
+                for _ in range(n_requests):
+                    request_start = time.perf_counter()
+                    assert send(client)['ok']
+                    latencies.append(time.perf_counter() - request_start)
+                print(f"{'daemon tuần tự':>16}: {_summary(latencies, time.perf_counter() - start)}")
+
+            latencies = []
+            lock = threading.Lock()
+
+            def worker(count):
+                with DetectionClient(path=socket_path) as thread_client:
+                    for _ in range(count):
+                        request_start = time.perf_counter()
+                        assert send(thread_client)['ok']
+                        with lock:
+                            latencies.append(time.perf_counter() - request_start)
+
+            counts = [n_requests // concurrency + (idx < n_requests % concurrency) for idx in range(concurrency)]
+            threads = [threading.Thread(target=worker, args=(count,)) for count in counts]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            print(f"{f'daemon x{concurrency}':>16}: {_summary(latencies, time.perf_counter() - start)}")
+
+            with DetectionClient(path=socket_path) as client:
+                stats = client.stats()
+            print(f"Server: {stats['detect_requests']} yêu cầu, {stats['batches']} lô "
+                  f"(TB {stats['mean_batch_size']:.2f} yêu cầu/lô), p50 {stats['latency']['p50'] * 1000:.1f} ms")
+        finally:
+            process.terminate()
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--templates', default=os.path.join('data', 'templates'))
+    parser.add_argument('--template', default='finding_01')
+    parser.add_argument('--image', default=os.path.join('data', 'images', 'finding_01.jpg'))
+    parser.add_argument('--matcher', choices=('best', 'detection', 'orb'), default='orb')
+    parser.add_argument('--scale-steps', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--cold', type=int, default=3, help="Số lần chạy nguội")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--send-bytes', action='store_true', help="Gửi dữ liệu ảnh thay vì đường dẫn")
+    args = parser.parse_args()
+    run(os.path.abspath(args.templates), args.template, os.path.abspath(args.image), args.matcher, args.scale_steps,
+        args.requests, args.cold, args.concurrency, args.send_bytes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark thời gian nạp một thư mục template lớn: đọc tuần tự kiểu cũ
+(os.listdir + cv2.imread ảnh màu gốc) so với `TemplateRegistry` (thread pool,
+nạp lười, cờ giải mã ảnh xám / giảm độ phân giải). Thư mục thử được tạo bằng
+cách nhân bản các template mẫu và thêm vài file không phải ảnh.
+
+Chạy từ thư mục gốc của repository:
+    python -m benchmarks.template_loading --copies 40
+    python -m benchmarks.template_loading --copies 20 --upscale 4
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import cv2
+
+from src.finding.template_registry import TemplateRegistry
+
+
+def serial_load(folder_path):
+    return [cv2.imread(os.path.join(folder_path, file)) for file in os.listdir(folder_path)]
+
+
+def run(template_folder, copies, workers, upscale):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for file in os.listdir(template_folder):
+            stem, extension = os.path.splitext(file)
+            source = os.path.join(template_folder, file)
+            if upscale > 1:
+                # Template lớn dạng JPEG: trường hợp cờ giảm độ phân giải có lợi nhất
+                extension = '.jpg'
+                source = os.path.join(tmp_dir, f"{stem}{extension}.src")
+                image = cv2.imread(os.path.join(template_folder, file))
+                cv2.imwrite(source + extension, cv2.resize(image, (0, 0), fx=upscale, fy=upscale))
+                os.replace(source + extension, source)
+            for copy_idx in range(copies):
+                shutil.copyfile(source, os.path.join(tmp_dir, f"{stem}_{copy_idx:03d}{extension}"))
+            if upscale > 1:
+                os.remove(source)
+        for extra in ('README.txt', 'labels.json', '.DS_Store'):
+            with open(os.path.join(tmp_dir, extra), 'w') as f:
+                f.write('không phải ảnh')
+        print(f"{len(os.listdir(tmp_dir))} file trong thư mục thử")
+
+        start = time.perf_counter()
+        templates = serial_load(tmp_dir)
+        baseline = time.perf_counter() - start
+        print(f"{'tuần tự (cũ)':>24}: {baseline:.3f} s, {sum(t is None for t in templates)} None")
+
+        start = time.perf_counter()
+        registry = TemplateRegistry(tmp_dir, max_workers=workers)
+        print(f"{'registry, chưa nạp':>24}: {time.perf_counter() - start:.3f} s, {len(registry)} template")
+
+        for label, kwargs in (('màu gốc', {}), ('xám', {'grayscale': True}),
+                              ('xám, giảm 2 lần', {'grayscale': True, 'reduction': 2})):
+            start = time.perf_counter()
+            loaded = TemplateRegistry(tmp_dir, max_workers=workers, **kwargs).templates()
+            elapsed = time.perf_counter() - start
+            print(f"{'registry ' + label:>24}: {elapsed:.3f} s ({baseline / elapsed:.2f}x), {len(loaded)} template")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--templates', default='data/templates/finding_01')
+    parser.add_argument('--copies', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--upscale', type=int, default=1, help="Phóng to template và lưu JPEG")
+    args = parser.parse_args()
+    run(args.templates, args.copies, args.workers, args.upscale)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark `tiled_template_detection` trên ảnh lớn memory-map so với
+`multiscale_template_detection` trên ảnh nạp toàn bộ vào RAM: thời gian, bộ nhớ
+thường trú cực đại (mỗi chế độ chạy trong một tiến trình riêng) và số phát hiện.
+Ảnh lớn được ghép từ nhiều bản sao (thêm nhiễu nhẹ) của ảnh mẫu.
+
+`--check` kiểm tra nhanh (không đo) rằng kết quả theo tile trùng với kết quả
+trên toàn ảnh khi tile nhỏ và `top_k` nhỏ, tức là nhiều đỉnh nằm ở vùng chồng
+lấn và bản trùng giữa hai tile sẽ chiếm chỗ trong `top_k` nếu không được gộp.
+
+Chạy từ thư mục gốc của repository:
+    python -m benchmarks.tiled_matching --size 6000 --budget-mib 64
+    python -m benchmarks.tiled_matching --check
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from src.evaluation.profiling import max_rss_bytes
+from src.finding.template_matching import (get_template, multiscale_template_detection,
+                                           tiled_template_detection)
+from src.utils.scene_io import open_scene
+
+
+def measure(mode, scene_path, template_folder, n_templates, budget_mib):
+    """
+    Chạy một chế độ trong tiến trình hiện tại và in kết quả dạng JSON.
+    """
+    templates = get_template(template_folder)[:n_templates]
+    kwargs = dict(scale_range=(0.5, 0.5), scale_steps=1)
+    start = time.perf_counter()
+    if mode == 'full':
+        detections = multiscale_template_detection(np.load(scene_path), templates, **kwargs)
+    else:
+        detections = tiled_template_detection(open_scene(scene_path), templates,
+                                               memory_budget=budget_mib * 2 ** 20, **kwargs)
+    print(json.dumps({'time': time.perf_counter() - start, 'max_rss': max_rss_bytes(),
+                      'detections': sorted([int(template_idx), float(scale), float(score), xyxy.tolist()]
+                                           for template_idx, scale, score, xyxy in detections)}))
+
+
+def make_scene(image_path, size, copies=None):
+    image = cv2.imread(image_path)
+    repeats = copies or (size // image.shape[0] + 1, size // image.shape[1] + 1)
+    scene = np.ascontiguousarray(np.tile(image, repeats + (1,))[:size, :size])
+    # Nhiễu nhẹ để các bản sao không có điểm bằng nhau (tránh hòa khi chọn top_k)
+    return cv2.add(scene, np.random.default_rng(0).integers(0, 4, scene.shape, dtype=np.uint8))
+
+
+def check(image_path, template_folder, n_templates, tile_sizes=(400, 500), top_ks=(3, 5)):
+    """
+    Kiểm tra kết quả theo tile trùng với kết quả trên toàn ảnh (ghép 2x2 bản sao
+    của ảnh mẫu) với nhiều cặp (tile_size, top_k); AssertionError nếu khác.
+    """
+    scene = make_scene(image_path, 1400, copies=(2, 2))
+    templates = get_template(template_folder)[:n_templates]
+
+    def boxes(detections):
+        return sorted((int(template_idx), float(scale), tuple(xyxy.tolist()))
+                      for template_idx, scale, _, xyxy in detections)
+
+    for top_k in top_ks:
+        kwargs = dict(scale_range=(0.5, 0.5), scale_steps=1, top_k=top_k)
+        full = multiscale_template_detection(scene, templates, **kwargs)
+        for tile_size in tile_sizes:
+            tiled = tiled_template_detection(scene, templates, tile_size=tile_size, **kwargs)
+            assert boxes(tiled) == boxes(full), \
+                f"tile {tile_size}, top_k {top_k}: khác kết quả toàn ảnh\n{boxes(full)}\n{boxes(tiled)}"
+            np.testing.assert_allclose(np.sort(tiled, order=['template_idx', 'score'])['score'],
+                                       np.sort(full, order=['template_idx', 'score'])['score'], atol=1e-4)
+            print(f"OK: tile {tile_size}, top_k {top_k}: {len(tiled)} phát hiện trùng với toàn ảnh")
+
+
+def run(image_path, template_folder, n_templates, size, budget_mib):
+    scene = make_scene(image_path, size)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        scene_path = os.path.join(tmp_dir, 'scene.npy')
+        np.save(scene_path, scene)
+        print(f"Ảnh {size}x{size} ({scene.nbytes / 2 ** 20:.0f} MiB), {n_templates} template, "
+              f"ngân sách tile {budget_mib} MiB")
+        del scene
+
+        results = {}
+        for mode in ('full', 'tiled'):
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.tiled_matching', '--measure', mode, '--scene', scene_path,
+                 '--templates', template_folder, '--n-templates', str(n_templates), '--budget-mib', str(budget_mib)],
+                check=True, capture_output=True, text=True).stdout
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:>6}: {results[mode]['time']:.2f} s, max RSS {results[mode]['max_rss'] / 2 ** 20:.0f} MiB, "
+                  f"{len(results[mode]['detections'])} phát hiện")
+        boxes = {mode: [(entry[0], entry[1], tuple(entry[3])) for entry in results[mode]['detections']]
+                 for mode in results}
+        same = sorted(boxes['full']) == sorted(boxes['tiled'])
+        score_delta = max((abs(full[2] - tiled[2]) for full, tiled in
+                           zip(sorted(results['full']['detections'], key=lambda e: e[3]),
+                               sorted(results['tiled']['detections'], key=lambda e: e[3]))), default=0.0)
+        print(f"Cùng hộp: {same}, |Δscore| max {score_delta:.2e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', default='data/images/finding_01.jpg')
+    parser.add_argument('--templates', default='data/templates/finding_01')
+    parser.add_argument('--n-templates', type=int, default=2)
+    parser.add_argument('--size', type=int, default=6000)
+    parser.add_argument('--budget-mib', type=int, default=64)
+    parser.add_argument('--check', action='store_true',
+                        help="Chỉ kiểm tra kết quả theo tile trùng với toàn ảnh (tile nhỏ, top_k nhỏ)")
+    parser.add_argument('--measure', choices=('full', 'tiled'), help=argparse.SUPPRESS)
+    parser.add_argument('--scene', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.check:
+        check(args.image, args.templates, args.n_templates)
+    elif args.measure:
+        measure(args.measure, args.scene, args.templates, args.n_templates, args.budget_mib)
+    else:
+        run(args.image, args.templates, args.n_templates, args.size, args.budget_mib)
+
+
+if __name__ == '__main__':
+    main()
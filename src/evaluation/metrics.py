@@ -0,0 +1,196 @@
+import numpy as np
+
+from src.finding.detection import pairwise_box_iou
+
+
+def match_detections(pred_boxes, pred_scores, gt_boxes, iou_threshold=0.5):
+    """
+    Ghép các dự đoán (cùng một lớp, cùng một ảnh) với ground truth theo kiểu
+    PASCAL VOC: duyệt dự đoán theo điểm giảm dần, mỗi ground truth chỉ được
+    ghép một lần với dự đoán có IoU cao nhất vượt ngưỡng.
+
+    Ma trận IoU được tính một lần bằng broadcasting; vòng lặp chỉ còn thao tác
+    trên mảng bool.
+
+    Args:
+        pred_boxes (numpy.ndarray): Mảng (N, 4) hộp dự đoán (x1, y1, x2, y2).
+        pred_scores (numpy.ndarray): Mảng (N,) điểm của dự đoán.
+        gt_boxes (numpy.ndarray): Mảng (M, 4) hộp ground truth.
+        iou_threshold (float, optional): Ngưỡng IoU để tính là đúng. Mặc định 0.5.
+
+    Returns:
+        tuple: (true_positive, matched_iou) là các mảng (N,) theo thứ tự đầu vào;
+               matched_iou bằng 0 với dự đoán sai.
+    """
+    pred_boxes = np.asarray(pred_boxes, dtype=np.float64).reshape(-1, 4)
+    gt_boxes = np.asarray(gt_boxes, dtype=np.float64).reshape(-1, 4)
+    true_positive = np.zeros(len(pred_boxes), dtype=bool)
+    matched_iou = np.zeros(len(pred_boxes), dtype=np.float64)
+    if len(pred_boxes) == 0 or len(gt_boxes) == 0:
+        return true_positive, matched_iou
+
+    ious = pairwise_box_iou(pred_boxes, gt_boxes)
+    taken = np.zeros(len(gt_boxes), dtype=bool)
+    for pred_idx in np.argsort(-np.asarray(pred_scores), kind='stable'):
+        candidate_ious = np.where(taken, -1.0, ious[pred_idx])
+        gt_idx = int(np.argmax(candidate_ious))
+        if candidate_ious[gt_idx] >= iou_threshold:
+            taken[gt_idx] = True
+            true_positive[pred_idx] = True
+            matched_iou[pred_idx] = candidate_ious[gt_idx]
+    return true_positive, matched_iou
+
+
+def average_precision(true_positive, scores, n_ground_truth):
+    """
+    Average precision theo nội suy mọi điểm (PASCAL VOC 2010+).
+
+    Args:
+        true_positive (numpy.ndarray): Mảng bool (N,) của mọi dự đoán thuộc một lớp.
+        scores (numpy.ndarray): Mảng (N,) điểm tương ứng.
+        n_ground_truth (int): Số ground truth của lớp.
+
+    Returns:
+        float: AP trong [0, 1]; 0 nếu lớp không có ground truth.
+    """
+    if n_ground_truth == 0:
+        return 0.0
+    order = np.argsort(-np.asarray(scores), kind='stable')
+    hits = np.asarray(true_positive, dtype=np.float64)[order]
+    cumulative_tp = np.cumsum(hits)
+    recall = cumulative_tp / n_ground_truth
+    precision = cumulative_tp / np.arange(1, len(hits) + 1)
+
+    # Đường bao precision không tăng, rồi tích phân theo các bước nhảy của recall
+    recall = np.concatenate([[0.0], recall, [1.0]])
+    precision = np.concatenate([[0.0], precision, [0.0]])
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    steps = np.nonzero(recall[1:] != recall[:-1])[0]
+    return float(np.sum((recall[steps + 1] - recall[steps]) * precision[steps + 1]))
+
+
+def evaluate_detections(predictions, ground_truths, iou_threshold=0.5):
+    """
+    Đánh giá kết quả phát hiện trên nhiều ảnh.
+
+    Args:
+        predictions (list): Mỗi phần tử ứng với một ảnh, là dict gồm 'labels'
+                            (list tên lớp), 'scores' (N,) và 'boxes' (N, 4).
+        ground_truths (list): Mỗi phần tử ứng với một ảnh, là dict gồm 'labels'
+                              và 'boxes' (M, 4).
+        iou_threshold (float, optional): Ngưỡng IoU. Mặc định 0.5.
+
+    Returns:
+        dict: Gồm 'mAP' (trung bình AP trên các lớp có ground truth), 'precision',
+              'recall', 'mean_iou' (của các dự đoán đúng), 'true_positives',
+              'n_predictions', 'n_ground_truth' và 'per_class' (dict tên lớp ->
+              'ap', 'precision', 'recall', 'n_predictions', 'n_ground_truth').
+    """
+    per_class_hits = {}
+    per_class_scores = {}
+    per_class_gt = {}
+    matched_ious = []
+
+    for prediction, ground_truth in zip(predictions, ground_truths):
+        pred_labels = np.asarray(prediction['labels'], dtype=object)
+        pred_scores = np.asarray(prediction['scores'], dtype=np.float64)
+        pred_boxes = np.asarray(prediction['boxes'], dtype=np.float64).reshape(-1, 4)
+        gt_labels = np.asarray(ground_truth['labels'], dtype=object)
+        gt_boxes = np.asarray(ground_truth['boxes'], dtype=np.float64).reshape(-1, 4)
+
+        for label in set(pred_labels.tolist()) | set(gt_labels.tolist()):
+            pred_mask = pred_labels == label
+            gt_mask = gt_labels == label
+            true_positive, iou = match_detections(pred_boxes[pred_mask], pred_scores[pred_mask],
+                                                  gt_boxes[gt_mask], iou_threshold)
+            per_class_hits.setdefault(label, []).append(true_positive)
+            per_class_scores.setdefault(label, []).append(pred_scores[pred_mask])
+            per_class_gt[label] = per_class_gt.get(label, 0) + int(gt_mask.sum())
+            matched_ious.append(iou[true_positive])
+
+    per_class = {}
+    for label in sorted(per_class_hits):
+        hits = np.concatenate(per_class_hits[label])
+        scores = np.concatenate(per_class_scores[label])
+        n_ground_truth = per_class_gt[label]
+        n_true = int(hits.sum())
+        per_class[label] = {
+            'ap': average_precision(hits, scores, n_ground_truth),
+            'precision': n_true / len(hits) if len(hits) else 0.0,
+            'recall': n_true / n_ground_truth if n_ground_truth else 0.0,
+            'n_predictions': int(len(hits)),
+            'n_ground_truth': n_ground_truth,
+        }
+
+    true_positives = sum(int(np.concatenate(per_class_hits[label]).sum()) for label in per_class)
+    n_predictions = sum(entry['n_predictions'] for entry in per_class.values())
+    n_ground_truth = sum(entry['n_ground_truth'] for entry in per_class.values())
+    class_aps = [entry['ap'] for entry in per_class.values() if entry['n_ground_truth'] > 0]
+    matched_ious = np.concatenate(matched_ious) if matched_ious else np.empty(0)
+    return {
+        'mAP': float(np.mean(class_aps)) if class_aps else 0.0,
+        'precision': true_positives / n_predictions if n_predictions else 0.0,
+        'recall': true_positives / n_ground_truth if n_ground_truth else 0.0,
+        'mean_iou': float(matched_ious.mean()) if len(matched_ious) else 0.0,
+        'true_positives': true_positives,
+        'n_predictions': n_predictions,
+        'n_ground_truth': n_ground_truth,
+        'per_class': per_class,
+    }
+
+
+def window_recall(windows, ground_truths, min_coverage=0.9):
+    """
+    Recall của một bộ lọc sơ bộ: tỉ lệ ground truth nằm (gần như) trọn trong ít
+    nhất một vùng ứng viên cùng lớp. Khác với IoU, vùng ứng viên thường lớn hơn
+    đối tượng nên độ phủ được tính theo diện tích của ground truth.
+
+    Args:
+        windows (list): Mỗi phần tử ứng với một ảnh, là dict gồm 'labels' và
+                        'boxes' (N, 4) của các vùng ứng viên.
+        ground_truths (list): Cùng định dạng với `evaluate_detections`.
+        min_coverage (float, optional): Tỉ lệ diện tích ground truth tối thiểu nằm
+                                        trong vùng ứng viên. Mặc định 0.9.
+
+    Returns:
+        dict: Gồm 'recall', 'n_covered', 'n_ground_truth' và 'per_class' (dict tên
+              lớp -> 'recall', 'n_covered', 'n_ground_truth').
+    """
+    per_class_covered = {}
+    per_class_gt = {}
+    for window, ground_truth in zip(windows, ground_truths):
+        window_labels = np.asarray(window['labels'], dtype=object)
+        window_boxes = np.asarray(window['boxes'], dtype=np.float64).reshape(-1, 4)
+        gt_labels = np.asarray(ground_truth['labels'], dtype=object)
+        gt_boxes = np.asarray(ground_truth['boxes'], dtype=np.float64).reshape(-1, 4)
+
+        for label in set(gt_labels.tolist()):
+            boxes = gt_boxes[gt_labels == label]
+            candidates = window_boxes[window_labels == label]
+            covered = np.zeros(len(boxes), dtype=bool)
+            if len(candidates):
+                width = (np.minimum(boxes[:, None, 2], candidates[None, :, 2])
+                         - np.maximum(boxes[:, None, 0], candidates[None, :, 0])).clip(min=0)
+                height = (np.minimum(boxes[:, None, 3], candidates[None, :, 3])
+                          - np.maximum(boxes[:, None, 1], candidates[None, :, 1])).clip(min=0)
+                areas = ((boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])).clip(min=1e-12)
+                covered = ((width * height) / areas[:, None] >= min_coverage).any(axis=1)
+            per_class_covered[label] = per_class_covered.get(label, 0) + int(covered.sum())
+            per_class_gt[label] = per_class_gt.get(label, 0) + len(boxes)
+
+    per_class = {
+        label: {
+            'recall': per_class_covered[label] / per_class_gt[label],
+            'n_covered': per_class_covered[label],
+            'n_ground_truth': per_class_gt[label],
+        }
+        for label in sorted(per_class_gt)
+    }
+    n_covered = sum(per_class_covered.values())
+    n_ground_truth = sum(per_class_gt.values())
+    return {
+        'recall': n_covered / n_ground_truth if n_ground_truth else 0.0,
+        'n_covered': n_covered,
+        'n_ground_truth': n_ground_truth,
+        'per_class': per_class,
+    }
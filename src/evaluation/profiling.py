@@ -0,0 +1,92 @@
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import cv2
+
+
+class CallCounter:
+    """
+    Thay tạm thời một hàm của module (mặc định cv2.matchTemplate) bằng bản bọc
+    để đếm số lần gọi. Chỉ đếm được lời gọi trong cùng tiến trình.
+
+    Example:
+        with CallCounter() as counter:
+            linear_multiscale_template_matching(image, templates)
+        print(counter.calls)
+    """
+
+    def __init__(self, module=cv2, name='matchTemplate'):
+        self.module = module
+        self.name = name
+        self.calls = 0
+        self._original = getattr(module, name)
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self._original(*args, **kwargs)
+
+    def __enter__(self):
+        setattr(self.module, self.name, self)
+        return self
+
+    def __exit__(self, *exc_info):
+        setattr(self.module, self.name, self._original)
+
+
+def max_rss_bytes():
+    """
+    Bộ nhớ thường trú cực đại của tiến trình từ lúc khởi động (bytes).
+    """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KiB, macOS trả về bytes
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+class StageProfiler:
+    """
+    Ghi thời gian thực và đỉnh bộ nhớ cấp phát (tracemalloc, gồm cả mảng NumPy)
+    của từng giai đoạn, cộng dồn qua nhiều lần chạy.
+
+    Example:
+        profiler = StageProfiler()
+        with profiler.stage('decode'):
+            image = cv2.imread(path)
+        report = profiler.summary()
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] - baseline if self.trace_memory else 0
+            if started_tracing:
+                tracemalloc.stop()
+            entry = self.stages.setdefault(name, {'calls': 0, 'total_time': 0.0, 'peak_memory_bytes': 0})
+            entry['calls'] += 1
+            entry['total_time'] += elapsed
+            entry['peak_memory_bytes'] = max(entry['peak_memory_bytes'], peak)
+
+    def summary(self):
+        """
+        Trả về dict tên giai đoạn -> 'calls', 'total_time', 'mean_time', 'peak_memory_bytes'.
+        """
+        return {
+            name: dict(entry, mean_time=entry['total_time'] / entry['calls'])
+            for name, entry in self.stages.items()
+        }
@@ -1,13 +1,225 @@
+import logging
+
 import cv2
 import numpy as np
+from src.finding.orb_index import ORBDescriptorIndex
+from src.utils.instrumentation import count, span, traced
 
-def orb_detect_and_visualize_matches(
+logger = logging.getLogger(__name__)
+
+ORB_DETECTION_DTYPE = np.dtype([
+    ('template_idx', np.int32),
+    ('num_keypoints_template', np.int32),
+    ('num_good_matches', np.int32),
+    ('num_inliers', np.int32),
+    ('xyxy', np.int32, (4,)),
+    ('homography', np.float32, (3, 3)),
+])
+
+
+def _ratio_test(distances, neighbour_ids, ratio_test_thresh):
+    """
+    Lowe ratio test vector hóa trên mảng khoảng cách (N, 2) của 2 láng giềng gần nhất.
+
+    Returns:
+        tuple: (query_ids, best_neighbour_ids, best_distances) của các cặp được chấp nhận.
+    """
+    accepted = (neighbour_ids[:, 1] >= 0) & (distances[:, 0] < ratio_test_thresh * distances[:, 1])
+    query_ids = np.nonzero(accepted)[0]
+    return query_ids, neighbour_ids[query_ids, 0], distances[query_ids, 0]
+
+
+def _estimate_box(template_points, image_points, template_shape, ransac_reproj_thresh):
+    """
+    Ước lượng homography bằng RANSAC và chiếu 4 góc template vào ảnh đích.
+
+    Returns:
+        tuple: (homography, inlier_mask, xyxy) hoặc None nếu không ước lượng được.
+    """
+    if len(template_points) < 4:
+        return None
+    homography, inlier_mask = cv2.findHomography(template_points, image_points, cv2.RANSAC, ransac_reproj_thresh)
+    if homography is None:
+        return None
+    height, width = template_shape[:2]
+    corners = np.float32([[0, 0], [width, 0], [width, height], [0, height]]).reshape(-1, 1, 2)
+    projected = cv2.perspectiveTransform(corners, homography).reshape(-1, 2)
+    if not np.isfinite(projected).all():
+        return None
+    xyxy = np.concatenate([projected.min(axis=0), projected.max(axis=0)])
+    return homography, inlier_mask.ravel().astype(bool), np.round(xyxy).astype(np.int32)
+
+
+@traced()
+def orb_detect(
     image,
     templates,
     n_features=1000,
     min_good_match_count=10,
     ratio_test_thresh=0.75,
+    ransac_reproj_thresh=5.0,
+    min_inlier_count=4,
+    descriptor_index=None,
+    return_matches=False
+):
+    """
+    Phát hiện template bằng ORB ở chế độ headless: không vẽ, không sao chép
+    ảnh và không in ra stdout.
+
+    Khoảng cách Hamming tới 2 láng giềng gần nhất được lấy trực tiếp dưới dạng
+    mảng NumPy (cv2.batchDistance hoặc `descriptor_index.query`), ratio test
+    được vector hóa. Với mỗi template đủ `min_good_match_count` cặp khớp tốt,
+    homography được ước lượng bằng RANSAC để suy ra bounding box trên ảnh đích.
+
+    Args:
+        image (np.ndarray): Ảnh đích BGR hoặc ảnh xám.
+        templates (list): Danh sách các ảnh template (BGR hoặc xám).
+        n_features (int, optional): Số đặc trưng ORB tối đa. Mặc định 1000.
+        min_good_match_count (int, optional): Số cặp khớp tốt tối thiểu để ước
+                                              lượng homography. Mặc định 10.
+        ratio_test_thresh (float, optional): Ngưỡng ratio test. Mặc định 0.75.
+        ransac_reproj_thresh (float, optional): Sai số chiếu lại tối đa (pixel)
+                                                của RANSAC. Mặc định 5.0.
+        min_inlier_count (int, optional): Số inlier tối thiểu để giữ kết quả. Mặc định 4.
+        descriptor_index (ORBDescriptorIndex, optional): Chỉ mục descriptor dựng sẵn
+                                                         từ chính `templates`. Mặc định None.
+        return_matches (bool, optional): Trả thêm các cặp điểm khớp để trực quan
+                                         hóa bằng `draw_orb_detections`. Mặc định False.
+
+    Returns:
+        numpy.ndarray: Mảng kiểu `ORB_DETECTION_DTYPE`, sắp xếp giảm dần theo số inlier.
+        Nếu `return_matches` là True, trả về tuple (detections, matches) với
+        matches là dict template_idx -> (template_points, image_points, inlier_mask).
+    """
+    detections = []
+    matches = {}
+    image_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+
+    orb = cv2.ORB_create(nfeatures=n_features)
+    with span('orb.detectAndCompute', target='image'):
+        kp_image, des_image = orb.detectAndCompute(image_gray, None)
+    count('orb.keypoints_image', len(kp_image))
+    if des_image is not None and len(des_image) >= 2:
+        image_points = cv2.KeyPoint_convert(kp_image)
+
+        if descriptor_index is not None:
+            # Một lần đối sánh cho descriptor của mọi template (template -> ảnh, như
+            # nhánh từng template); ratio test theo từng descriptor template
+            with span('orb.index_query'):
+                distances, image_ids = descriptor_index.query(des_image, k=2)
+            rows, best_image_ids, _ = _ratio_test(distances, image_ids, ratio_test_thresh)
+            # descriptor_index.template_ids đã sắp xếp tăng dần nên các hàng được chấp nhận cũng vậy
+            group_ids, group_starts = np.unique(descriptor_index.template_ids[rows], return_index=True)
+            groups = dict(zip(group_ids.tolist(), np.split(np.arange(len(rows)), group_starts[1:])))
+
+        for template_idx, template in enumerate(templates):
+            if template is None:
+                continue
+            if descriptor_index is not None:
+                num_kp_template = descriptor_index.num_keypoints(template_idx)
+                group = groups.get(template_idx)
+                if group is None:
+                    continue
+                template_points = descriptor_index.keypoint_array[rows[group], :2]
+                matched_image_points = image_points[best_image_ids[group]]
+            else:
+                template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY) if len(template.shape) == 3 else template
+                with span('orb.detectAndCompute', target='template', template_idx=template_idx):
+                    kp_template, des_template = orb.detectAndCompute(template_gray, None)
+                if des_template is None:
+                    continue
+                num_kp_template = len(kp_template)
+                # K=2 láng giềng gần nhất trả thẳng về mảng int32, không tạo đối tượng DMatch
+                with span('orb.batchDistance', template_idx=template_idx):
+                    distances, neighbour_ids = cv2.batchDistance(
+                        des_template, des_image, -1, normType=cv2.NORM_HAMMING, K=2, update=0, crosscheck=False)
+                template_ids, image_ids, _ = _ratio_test(distances, neighbour_ids, ratio_test_thresh)
+                template_points = cv2.KeyPoint_convert(kp_template)[template_ids]
+                matched_image_points = image_points[image_ids]
+
+            num_good = len(template_points)
+            count('orb.good_matches', num_good, template_idx=template_idx)
+            if num_kp_template < min_good_match_count or num_good < min_good_match_count:
+                continue
+            with span('orb.homography', template_idx=template_idx):
+                estimate = _estimate_box(template_points, matched_image_points, template.shape,
+                                         ransac_reproj_thresh)
+            if estimate is None:
+                continue
+            homography, inlier_mask, xyxy = estimate
+            num_inliers = int(inlier_mask.sum())
+            if num_inliers < min_inlier_count:
+                continue
+
+            detections.append((template_idx, num_kp_template, num_good, num_inliers, xyxy, homography))
+            if return_matches:
+                matches[template_idx] = (template_points, matched_image_points, inlier_mask)
+
+    detections = np.array(detections, dtype=ORB_DETECTION_DTYPE)
+    detections = detections[np.argsort(-detections['num_inliers'], kind='stable')]
+    if return_matches:
+        return detections, matches
+    return detections
+
+
+def draw_orb_detections(
+    image,
+    templates,
+    detections,
+    matches=None,
     draw_match_flags=cv2.DrawMatchesFlags_NOT_DRAW_SINGLE_POINTS
+):
+    """
+    Bước trực quan hóa tùy chọn cho kết quả của `orb_detect`.
+
+    Với mỗi phát hiện, vẽ bounding box (đa giác homography) lên ảnh đích; nếu có
+    `matches`, ghép thêm template và các đường nối giữa các cặp inlier bằng
+    cv2.drawMatches.
+
+    Args:
+        image (np.ndarray): Ảnh đích BGR hoặc ảnh xám.
+        templates (list): Danh sách template đã dùng khi gọi `orb_detect`.
+        detections (numpy.ndarray): Mảng kiểu `ORB_DETECTION_DTYPE`.
+        matches (dict, optional): Giá trị thứ hai trả về khi `return_matches=True`.
+        draw_match_flags (int, optional): Cờ cho cv2.drawMatches.
+
+    Returns:
+        list: Danh sách ảnh trực quan hóa, theo thứ tự của `detections`.
+    """
+    image_color = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR) if len(image.shape) != 3 else image
+    visualization_images = []
+    for detection in detections:
+        template_idx = int(detection['template_idx'])
+        template = templates[template_idx]
+        height, width = template.shape[:2]
+        corners = np.float32([[0, 0], [width, 0], [width, height], [0, height]]).reshape(-1, 1, 2)
+        polygon = cv2.perspectiveTransform(corners, detection['homography'].astype(np.float64))
+        canvas = cv2.polylines(image_color.copy(), [np.int32(np.round(polygon))], True, (0, 0, 255), 3)
+
+        if matches is not None and template_idx in matches:
+            template_points, image_points, inlier_mask = matches[template_idx]
+            template_color = cv2.cvtColor(template, cv2.COLOR_GRAY2BGR) if len(template.shape) != 3 else template
+            pairs = [cv2.DMatch(idx, idx, 0) for idx in range(len(template_points))]
+            canvas = cv2.drawMatches(
+                template_color, cv2.KeyPoint_convert(template_points),
+                canvas, cv2.KeyPoint_convert(image_points),
+                pairs, None,
+                matchesMask=inlier_mask.astype(np.uint8).tolist(),
+                flags=draw_match_flags
+            )
+        visualization_images.append(canvas)
+    return visualization_images
+
+
+@traced()
+def orb_detect_and_visualize_matches(
+    image,
+    templates,
+    n_features=1000,
+    min_good_match_count=10,
+    ratio_test_thresh=0.75,
+    draw_match_flags=cv2.DrawMatchesFlags_NOT_DRAW_SINGLE_POINTS,
+    descriptor_index=None
 ):
     """
     Phát hiện đặc trưng ORB, đối sánh và trực quan hóa các cặp khớp.
@@ -26,6 +238,11 @@ def orb_detect_and_visualize_matches(
         ratio_test_thresh (float, optional): Ngưỡng ratio test. Mặc định 0.75.
         draw_match_flags (int, optional): Cờ cho cv2.drawMatches. Mặc định là
                                           không vẽ các keypoint đơn lẻ không khớp.
+        descriptor_index (ORBDescriptorIndex, optional): Chỉ mục descriptor dựng sẵn
+                                          từ chính `templates`. Khi có, đặc trưng
+                                          template không bị trích xuất lại và
+                                          descriptor ảnh chỉ được truy vấn một lần
+                                          cho mọi template. Mặc định None.
 
     Returns:
         tuple: Gồm hai phần tử:
@@ -39,7 +256,7 @@ def orb_detect_and_visualize_matches(
     match_summary = []
 
     if len(image.shape) != 3:
-        print("Cảnh báo: Ảnh đầu vào không phải BGR. Vẽ có thể không như ý.")
+        logger.warning("Ảnh đầu vào không phải BGR. Vẽ có thể không như ý.")
         image_color_for_drawing = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
         image_gray = image
     else:
@@ -51,45 +268,81 @@ def orb_detect_and_visualize_matches(
     except Exception as e:
          raise ImportError(f"Không thể tạo ORB: {e}")
 
-    kp_image, des_image = orb.detectAndCompute(image_gray, None)
+    with span('orb.detectAndCompute', target='image'):
+        kp_image, des_image = orb.detectAndCompute(image_gray, None)
     if des_image is None:
-        print("Không tìm thấy đặc trưng ORB nào trong ảnh đích.")
+        logger.info("Không tìm thấy đặc trưng ORB nào trong ảnh đích.")
         return match_visualization_images, match_summary
     num_kp_image = len(kp_image)
-    print(f"Tìm thấy {num_kp_image} keypoints trong ảnh đích.")
+    count('orb.keypoints_image', num_kp_image)
+    logger.debug("Tìm thấy %d keypoints trong ảnh đích.", num_kp_image)
     if num_kp_image < min_good_match_count:
-         print("Số keypoints ảnh đích quá ít.")
+        logger.warning("Số keypoints ảnh đích quá ít.")
+
+    if descriptor_index is not None:
+        with span('orb.index_match'):
+            good_matches_by_template = descriptor_index.match(des_image, ratio_test_thresh)
 
-    print(f"Bắt đầu xử lý {len(templates)} templates...")
+    logger.debug("Bắt đầu xử lý %d templates...", len(templates))
     for template_idx, template in enumerate(templates):
         if template is None: continue
         if len(template.shape) != 3:
-            print(f"Cảnh báo: Template {template_idx} không phải BGR. Chuyển đổi tạm.")
+            logger.warning("Template %d không phải BGR. Chuyển đổi tạm.", template_idx)
             template_color_for_drawing = cv2.cvtColor(template, cv2.COLOR_GRAY2BGR)
             template_gray = template
         else:
             template_color_for_drawing = template.copy()
             template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
 
-        kp_template, des_template = orb.detectAndCompute(template_gray, None)
+        if descriptor_index is not None:
+            kp_template = descriptor_index.keypoints(template_idx)
+            num_kp_template = len(kp_template)
+            if num_kp_template < min_good_match_count:
+                logger.debug("Template %d: Số keypoints (%d) quá ít.", template_idx, num_kp_template)
+                continue
+            good_matches = good_matches_by_template.get(template_idx, [])
+            num_good = len(good_matches)
+            count('orb.good_matches', num_good, template_idx=template_idx)
+            logger.debug("Template %d: Keypoints=%d, Good Matches=%d", template_idx, num_kp_template, num_good)
+            if num_good >= min_good_match_count:
+                logger.debug(" -> Đạt ngưỡng, tạo ảnh trực quan hóa cho template %d...", template_idx)
+                with span('orb.drawMatches', template_idx=template_idx):
+                    match_visualization_images.append(cv2.drawMatches(
+                        template_color_for_drawing, kp_template,
+                        image_color_for_drawing, kp_image,
+                        good_matches,
+                        None,
+                        flags=draw_match_flags
+                    ))
+                match_summary.append({
+                    'template_idx': template_idx,
+                    'num_keypoints_template': num_kp_template,
+                    'num_keypoints_image': num_kp_image,
+                    'num_good_matches': num_good
+                })
+            continue
+
+        with span('orb.detectAndCompute', target='template', template_idx=template_idx):
+            kp_template, des_template = orb.detectAndCompute(template_gray, None)
 
         if des_template is None:
-            print(f"Template {template_idx}: Không tìm thấy đặc trưng ORB.")
+            logger.debug("Template %d: Không tìm thấy đặc trưng ORB.", template_idx)
             continue
         num_kp_template = len(kp_template)
         if num_kp_template < min_good_match_count:
-             print(f"Template {template_idx}: Số keypoints ({num_kp_template}) quá ít.")
-             continue
+            logger.debug("Template %d: Số keypoints (%d) quá ít.", template_idx, num_kp_template)
+            continue
 
         matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
         if des_image is None:
-            print("Không có descriptors trong ảnh đích để khớp.")
+            logger.warning("Không có descriptors trong ảnh đích để khớp.")
             continue
 
         if des_template.dtype != np.uint8: des_template = des_template.astype(np.uint8)
         if des_image.dtype != np.uint8: des_image = des_image.astype(np.uint8)
 
-        raw_matches = matcher.knnMatch(des_template, des_image, k=2)
+        with span('orb.knnMatch', template_idx=template_idx):
+            raw_matches = matcher.knnMatch(des_template, des_image, k=2)
 
         good_matches = []
         if raw_matches:
@@ -100,17 +353,19 @@ def orb_detect_and_visualize_matches(
                         good_matches.append(m)
 
         num_good = len(good_matches)
-        print(f"Template {template_idx}: Keypoints={num_kp_template}, Good Matches={num_good}")
+        count('orb.good_matches', num_good, template_idx=template_idx)
+        logger.debug("Template %d: Keypoints=%d, Good Matches=%d", template_idx, num_kp_template, num_good)
 
         if num_good >= min_good_match_count:
-            print(f" -> Đạt ngưỡng, tạo ảnh trực quan hóa cho template {template_idx}...")
-            img_matches = cv2.drawMatches(
-                template_color_for_drawing, kp_template,
-                image_color_for_drawing, kp_image,
-                good_matches,
-                None,
-                flags=draw_match_flags
-            )
+            logger.debug(" -> Đạt ngưỡng, tạo ảnh trực quan hóa cho template %d...", template_idx)
+            with span('orb.drawMatches', template_idx=template_idx):
+                img_matches = cv2.drawMatches(
+                    template_color_for_drawing, kp_template,
+                    image_color_for_drawing, kp_image,
+                    good_matches,
+                    None,
+                    flags=draw_match_flags
+                )
             match_visualization_images.append(img_matches)
             match_summary.append({
                 'template_idx': template_idx,
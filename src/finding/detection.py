@@ -0,0 +1,167 @@
+import cv2
+import numpy as np
+
+DETECTION_DTYPE = np.dtype([
+    ('template_idx', np.int32),
+    ('scale', np.float32),
+    ('score', np.float32),
+    ('xyxy', np.int32, (4,)),
+])
+
+
+def empty_detections():
+    """
+    Trả về mảng kết quả phát hiện rỗng với kiểu `DETECTION_DTYPE`.
+    """
+    return np.empty(0, dtype=DETECTION_DTYPE)
+
+
+def find_peaks(correlation_map, top_k=10, threshold=-np.inf, neighborhood=3):
+    """
+    Lấy tối đa `top_k` cực đại địa phương có giá trị không nhỏ hơn `threshold`
+    từ một bản đồ tương quan, hoàn toàn bằng phép toán vector.
+
+    Một pixel là cực đại địa phương nếu nó lớn nhất trong cửa sổ
+    `neighborhood` x `neighborhood` (dùng phép giãn nở cv2.dilate). Các giá trị
+    NaN/inf bị bỏ qua.
+
+    Args:
+        correlation_map (numpy.ndarray): Bản đồ tương quan (float32) từ matchTemplate.
+        top_k (int, optional): Số đỉnh tối đa. Mặc định 10.
+        threshold (float, optional): Ngưỡng điểm tối thiểu. Mặc định -inf.
+        neighborhood (int, optional): Kích thước cửa sổ cực đại địa phương. Mặc định 3.
+
+    Returns:
+        tuple: (xs, ys, scores) là các mảng NumPy sắp xếp giảm dần theo điểm.
+    """
+    scores_map = np.where(np.isfinite(correlation_map), correlation_map, -np.inf).astype(np.float32, copy=False)
+    dilated = cv2.dilate(scores_map, np.ones((neighborhood, neighborhood), np.uint8))
+    ys, xs = np.nonzero((scores_map >= dilated) & (scores_map >= threshold) & np.isfinite(scores_map))
+    scores = scores_map[ys, xs]
+
+    if top_k is not None and len(scores) > top_k:
+        keep = np.argpartition(-scores, top_k - 1)[:top_k]
+        xs, ys, scores = xs[keep], ys[keep], scores[keep]
+    order = np.argsort(-scores, kind='stable')
+    return xs[order], ys[order], scores[order]
+
+
+def box_iou(box, boxes):
+    """
+    Tính IoU giữa một hộp và một mảng hộp, định dạng (x1, y1, x2, y2).
+
+    Args:
+        box (numpy.ndarray): Mảng (4,).
+        boxes (numpy.ndarray): Mảng (N, 4).
+
+    Returns:
+        numpy.ndarray: Mảng (N,) giá trị IoU.
+    """
+    return pairwise_box_iou(np.asarray(box)[None], boxes)[0]
+
+
+def pairwise_box_iou(boxes_a, boxes_b):
+    """
+    Tính ma trận IoU giữa hai mảng hộp (x1, y1, x2, y2) bằng broadcasting.
+
+    Args:
+        boxes_a (numpy.ndarray): Mảng (N, 4).
+        boxes_b (numpy.ndarray): Mảng (M, 4).
+
+    Returns:
+        numpy.ndarray: Ma trận (N, M) giá trị IoU.
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float64)
+    boxes_b = np.asarray(boxes_b, dtype=np.float64)
+    inter_w = np.clip(np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+                      - np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0]), 0, None)
+    inter_h = np.clip(np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+                      - np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1]), 0, None)
+    intersection = inter_w * inter_h
+    areas_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    areas_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = areas_a[:, None] + areas_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-12), 0.0)
+
+
+def _greedy_suppression(boxes, iou_threshold, block_size=2048):
+    """
+    NMS tham lam trên các hộp đã sắp xếp giảm dần theo điểm.
+
+    Nhóm nhỏ dùng ma trận IoU tính sẵn một lần (mỗi bước chỉ còn phép OR trên
+    mảng bool); nhóm lớn hơn `block_size` tính IoU theo từng hộp được giữ để
+    giới hạn bộ nhớ.
+
+    Returns:
+        numpy.ndarray: Chỉ số (trong `boxes`) của các hộp được giữ lại.
+    """
+    if len(boxes) <= block_size:
+        overlaps = pairwise_box_iou(boxes, boxes) > iou_threshold
+        suppressed = np.zeros(len(boxes), dtype=bool)
+        keep = []
+        for idx in range(len(boxes)):
+            if suppressed[idx]:
+                continue
+            keep.append(idx)
+            suppressed |= overlaps[idx]
+        return np.asarray(keep, dtype=np.intp)
+
+    keep = []
+    remaining = np.arange(len(boxes))
+    while remaining.size:
+        current = remaining[0]
+        keep.append(current)
+        rest = remaining[1:]
+        remaining = rest[box_iou(boxes[current], boxes[rest]) <= iou_threshold]
+    return np.asarray(keep, dtype=np.intp)
+
+
+def non_max_suppression(detections, iou_threshold=0.3, per_template=True):
+    """
+    Non-maximum suppression tham lam, vector hóa bằng NumPy.
+
+    Args:
+        detections (numpy.ndarray): Mảng kiểu `DETECTION_DTYPE`.
+        iou_threshold (float, optional): Hộp có IoU lớn hơn ngưỡng với một hộp
+                                         điểm cao hơn sẽ bị loại. Mặc định 0.3.
+        per_template (bool, optional): Chỉ loại trừ giữa các hộp cùng template.
+                                       Mặc định True.
+
+    Returns:
+        numpy.ndarray: Các phát hiện được giữ lại, sắp xếp giảm dần theo điểm.
+    """
+    if len(detections) == 0:
+        return detections
+
+    detections = detections[np.argsort(-detections['score'], kind='stable')]
+    boxes = detections['xyxy'].astype(np.float64)
+    if not per_template:
+        return detections[_greedy_suppression(boxes, iou_threshold)]
+
+    # Mỗi template xử lý riêng: các nhóm nhỏ hơn nên ma trận IoU nhỏ hơn nhiều
+    keep = []
+    for template_idx in np.unique(detections['template_idx']):
+        group = np.nonzero(detections['template_idx'] == template_idx)[0]
+        keep.append(group[_greedy_suppression(boxes[group], iou_threshold)])
+    return detections[np.sort(np.concatenate(keep))]
+
+
+def detections_from_peaks(template_idx, scale, template_size, xs, ys, scores):
+    """
+    Tạo mảng `DETECTION_DTYPE` từ các đỉnh của một bản đồ tương quan.
+
+    Args:
+        template_idx (int): Chỉ số template.
+        scale (float): Tỉ lệ của template.
+        template_size (tuple): (width, height) của template đã scale.
+        xs, ys, scores (numpy.ndarray): Kết quả của `find_peaks`.
+
+    Returns:
+        numpy.ndarray: Mảng kiểu `DETECTION_DTYPE`.
+    """
+    detections = np.empty(len(scores), dtype=DETECTION_DTYPE)
+    detections['template_idx'] = template_idx
+    detections['scale'] = scale
+    detections['score'] = scores
+    detections['xyxy'] = np.stack([xs, ys, xs + template_size[0], ys + template_size[1]], axis=1)
+    return detections
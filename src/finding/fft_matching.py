@@ -0,0 +1,151 @@
+import cv2
+import numpy as np
+
+SUPPORTED_FFT_METHODS = (cv2.TM_CCOEFF_NORMED, cv2.TM_CCORR_NORMED)
+
+
+def _fast_fft_size(size):
+    """
+    Kích thước FFT nhanh nhỏ nhất không nhỏ hơn `size` (tích của 2, 3, 5).
+    """
+    return cv2.getOptimalDFTSize(size)
+
+
+class FFTCorrelationEngine:
+    """
+    Bộ tính masked normalized cross-correlation trong miền tần số, dùng lại phổ
+    của ảnh đích cho mọi template và mọi tỉ lệ.
+
+    Phổ của ảnh (từng kênh) và của ảnh bình phương (cộng dồn các kênh) được
+    tính một lần khi khởi tạo. Mỗi template chỉ cần biến đổi FFT cho mặt nạ và
+    template đã trừ trung bình, sau đó nhân với phổ có sẵn. Các template được
+    xử lý theo lô (batch) bằng các phép FFT vector hóa của NumPy.
+
+    Công thức trùng với `cv2.matchTemplate` có mặt nạ uint8 (mặt nạ được coi là
+    nhị phân: pixel khác 0 là 1):
+        - TM_CCORR_NORMED:  R = Σ(T·M·I) / sqrt(Σ(T·M)² · Σ(I·M)²)
+        - TM_CCOEFF_NORMED: R = Σ(T'·I') / sqrt(ΣT'² · ΣI'²), với T', I' là
+          template và cửa sổ ảnh đã trừ trung bình trong vùng mặt nạ.
+    Vì tương quan chỉ lấy ở các vị trí hợp lệ (template nằm trọn trong ảnh),
+    FFT vòng kích thước bằng ảnh không bị hiện tượng quấn biên.
+
+    Example:
+        engine = FFTCorrelationEngine(image)
+        correlation_maps = engine.match([(template, mask)], cv2.TM_CCOEFF_NORMED)
+    """
+
+    def __init__(self, image):
+        """
+        Args:
+            image (numpy.ndarray): Ảnh đích (xám hoặc nhiều kênh).
+        """
+        image = np.asarray(image, dtype=np.float64)
+        if image.ndim == 2:
+            image = image[:, :, None]
+        self.image_shape = image.shape
+        self.fft_shape = (_fast_fft_size(image.shape[0]), _fast_fft_size(image.shape[1]))
+
+        channels_first = np.moveaxis(image, -1, 0)
+        # Phổ từng kênh của ảnh và tổng phổ của ảnh bình phương trên mọi kênh
+        self.image_spectrum = np.fft.rfft2(channels_first, s=self.fft_shape)
+        self.image_sq_spectrum = np.fft.rfft2((channels_first ** 2).sum(axis=0), s=self.fft_shape)
+
+    def _correlate(self, product_spectrum):
+        """
+        Biến đổi ngược tích phổ (phổ ảnh × liên hợp phổ kernel) về miền không gian.
+        """
+        return np.fft.irfft2(product_spectrum, s=self.fft_shape)
+
+    def _match_batch(self, templates, masks, template_shapes, match_method):
+        """
+        So khớp một lô template. Các template nhỏ hơn được đệm 0 tới kích thước
+        lớn nhất của lô; phần đệm nằm ngoài mặt nạ nên không ảnh hưởng kết quả.
+
+        Args:
+            templates (numpy.ndarray): Mảng (B, h, w, C) float64.
+            masks (numpy.ndarray): Mảng (B, h, w) nhị phân float64.
+            template_shapes (list): Kích thước (h, w) thật của từng template.
+
+        Returns:
+            list: Bản đồ tương quan float32 (H - h + 1, W - w + 1) của từng template.
+        """
+        image_height, image_width, _ = self.image_shape
+        mask_counts = np.maximum(masks.sum(axis=(1, 2)), 1)
+        weighted_masks = masks[..., None]
+
+        if match_method == cv2.TM_CCOEFF_NORMED:
+            template_means = (templates * weighted_masks).sum(axis=(1, 2)) / mask_counts[:, None]
+            kernels = weighted_masks * (templates - template_means[:, None, None, :])
+        else:
+            kernels = weighted_masks * templates
+        template_energy = (kernels ** 2).sum(axis=(1, 2, 3))
+
+        # (B, C, h, w) -> phổ kernel của từng kênh; Σ_c F(I_c)·conj(F(K_c)) gộp trong miền tần số
+        kernel_spectrum = np.fft.rfft2(np.moveaxis(kernels, -1, 1), s=self.fft_shape)
+        numerator = self._correlate((self.image_spectrum[None] * np.conj(kernel_spectrum)).sum(axis=1))
+
+        mask_spectrum = np.fft.rfft2(masks, s=self.fft_shape)
+        window_energy = self._correlate(self.image_sq_spectrum[None] * np.conj(mask_spectrum))
+        if match_method == cv2.TM_CCOEFF_NORMED:
+            # Σ M·(I - mean)² = Σ M·I² - (Σ M·I)² / ΣM, cộng dồn trên các kênh
+            window_sums = self._correlate(self.image_spectrum[None] * np.conj(mask_spectrum[:, None]))
+            window_energy -= (window_sums ** 2).sum(axis=1) / mask_counts[:, None, None]
+
+        denominator = np.sqrt(np.maximum(window_energy, 0) * template_energy[:, None, None])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = np.where(denominator > 1e-6, numerator / denominator, 0.0)
+
+        return [
+            correlation[slot, :image_height - height + 1, :image_width - width + 1].astype(np.float32)
+            for slot, (height, width) in enumerate(template_shapes)
+        ]
+
+    def match(self, templates_and_masks, match_method=cv2.TM_CCOEFF_NORMED, batch_size=4):
+        """
+        Tính bản đồ tương quan cho nhiều cặp (template, mặt nạ).
+
+        Các template (kể cả khác kích thước) được gom thành lô tối đa `batch_size`
+        phần tử và biến đổi FFT cùng lúc.
+
+        Args:
+            templates_and_masks (list): Danh sách (template, mask). Mask có thể là None.
+            match_method (int, optional): cv2.TM_CCOEFF_NORMED hoặc cv2.TM_CCORR_NORMED.
+            batch_size (int, optional): Số template tối đa trong một lô. Mặc định 4.
+
+        Returns:
+            list: Bản đồ tương quan float32 tương ứng với từng template (None nếu
+                  template lớn hơn ảnh), cùng định dạng với cv2.matchTemplate.
+
+        Raises:
+            ValueError: Nếu `match_method` không được hỗ trợ.
+        """
+        if match_method not in SUPPORTED_FFT_METHODS:
+            raise ValueError("FFT backend chỉ hỗ trợ cv2.TM_CCOEFF_NORMED và cv2.TM_CCORR_NORMED.")
+
+        image_height, image_width, channels = self.image_shape
+        results = [None] * len(templates_and_masks)
+        valid = [
+            idx for idx, (template, _) in enumerate(templates_and_masks)
+            if template.shape[0] <= image_height and template.shape[1] <= image_width
+        ]
+
+        for start in range(0, len(valid), batch_size):
+            batch = valid[start:start + batch_size]
+            template_shapes = [templates_and_masks[idx][0].shape[:2] for idx in batch]
+            max_height = max(height for height, _ in template_shapes)
+            max_width = max(width for _, width in template_shapes)
+
+            templates = np.zeros((len(batch), max_height, max_width, channels), dtype=np.float64)
+            masks = np.zeros((len(batch), max_height, max_width), dtype=np.float64)
+            for slot, idx in enumerate(batch):
+                template, mask = templates_and_masks[idx]
+                height, width = template.shape[:2]
+                templates[slot, :height, :width] = template.reshape(height, width, -1)
+                if mask is None:
+                    masks[slot, :height, :width] = 1
+                else:
+                    masks[slot, :height, :width] = np.asarray(mask).reshape(height, width, -1)[..., 0] != 0
+
+            for idx, correlation in zip(batch, self._match_batch(templates, masks, template_shapes, match_method)):
+                results[idx] = correlation
+        return results
@@ -0,0 +1,228 @@
+import cv2
+import numpy as np
+
+FLANN_INDEX_LSH = 6
+INDEX_BACKENDS = ('flann', 'bruteforce')
+
+
+def _to_gray(image):
+    """
+    Chuyển ảnh BGR sang ảnh xám; ảnh xám được giữ nguyên.
+    """
+    if len(image.shape) == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+def _keypoints_to_array(keypoints):
+    """
+    Chuyển danh sách cv2.KeyPoint thành mảng (N, 7) float32 để lưu trữ:
+    x, y, size, angle, response, octave, class_id.
+    """
+    return np.array(
+        [(kp.pt[0], kp.pt[1], kp.size, kp.angle, kp.response, kp.octave, kp.class_id) for kp in keypoints],
+        dtype=np.float32,
+    ).reshape(-1, 7)
+
+
+def _array_to_keypoints(array):
+    """
+    Dựng lại danh sách cv2.KeyPoint từ mảng tạo bởi `_keypoints_to_array`.
+    """
+    return [
+        cv2.KeyPoint(float(x), float(y), float(size), float(angle), float(response), int(octave), int(class_id))
+        for x, y, size, angle, response, octave, class_id in array
+    ]
+
+
+class ORBDescriptorIndex:
+    """
+    Chỉ mục descriptor ORB dùng chung cho nhiều template.
+
+    Keypoint và descriptor của mọi template được trích xuất một lần (và có thể
+    lưu/nạp lại), ghép thành một mảng gắn với chỉ số template tương ứng. Lợi ích
+    chính là không phải chạy lại ORB trên từng template cho mỗi ảnh; việc đối
+    sánh chỉ gộp N lần knnMatch riêng lẻ thành một lần gọi, tổng khối lượng tính
+    toán không đổi.
+
+    Chiều đối sánh giống BFMatcher từng template trong
+    `orb_detect_and_visualize_matches` (template -> ảnh): mỗi descriptor template
+    tìm 2 descriptor ảnh gần nhất và ratio test áp dụng trong từng template, nên
+    các template giống nhau (hoặc trùng lặp) không loại trừ nhau.
+
+    Example:
+        index = ORBDescriptorIndex(templates)
+        index.save("orb_index.npz")
+        index = ORBDescriptorIndex.load("orb_index.npz")
+        good_matches = index.match(image_descriptors)
+    """
+
+    def __init__(self, templates, n_features=1000, backend='bruteforce', names=None):
+        """
+        Args:
+            templates (list): Danh sách ảnh template (BGR hoặc xám). Phần tử None bị bỏ qua.
+            n_features (int, optional): Số đặc trưng ORB tối đa. Mặc định 1000.
+            backend (str, optional): 'bruteforce' (Hamming, chính xác, cv2.batchDistance)
+                                     hoặc 'flann' (LSH dựng trên descriptor ảnh, xấp xỉ).
+                                     Mặc định 'bruteforce'.
+            names (list, optional): Tên của từng template.
+
+        Raises:
+            ValueError: Nếu `backend` không hợp lệ.
+        """
+        if backend not in INDEX_BACKENDS:
+            raise ValueError(f"backend không hợp lệ: {backend!r}. Chỉ hỗ trợ 'flann' hoặc 'bruteforce'.")
+        self.n_features = n_features
+        self.backend = backend
+        self.n_templates = len(templates)
+        self.names = list(names) if names is not None else [str(idx) for idx in range(len(templates))]
+
+        orb = cv2.ORB_create(nfeatures=n_features)
+        keypoint_arrays = []
+        descriptor_arrays = []
+        template_ids = []
+        for template_idx, template in enumerate(templates):
+            if template is None:
+                continue
+            keypoints, descriptors = orb.detectAndCompute(_to_gray(template), None)
+            if descriptors is None:
+                continue
+            keypoint_arrays.append(_keypoints_to_array(keypoints))
+            descriptor_arrays.append(descriptors.astype(np.uint8, copy=False))
+            template_ids.append(np.full(len(descriptors), template_idx, dtype=np.int32))
+
+        self._set_arrays(
+            np.concatenate(keypoint_arrays) if keypoint_arrays else np.empty((0, 7), np.float32),
+            np.concatenate(descriptor_arrays) if descriptor_arrays else np.empty((0, 32), np.uint8),
+            np.concatenate(template_ids) if template_ids else np.empty(0, np.int32),
+        )
+
+    def _set_arrays(self, keypoint_array, descriptors, template_ids):
+        """
+        Gán các mảng dữ liệu (keypoint, descriptor, nhãn template).
+        """
+        self.keypoint_array = keypoint_array
+        self.descriptors = descriptors
+        self.template_ids = template_ids
+        # Vị trí của mỗi descriptor trong danh sách keypoint của template chứa nó
+        starts = np.searchsorted(template_ids, np.arange(self.n_templates))
+        self.local_ids = np.arange(len(template_ids)) - starts[template_ids] if len(template_ids) else template_ids
+        self._keypoints_cache = {}
+
+    def num_keypoints(self, template_idx):
+        """
+        Số keypoint ORB của một template.
+        """
+        return int(np.count_nonzero(self.template_ids == template_idx))
+
+    def keypoints(self, template_idx):
+        """
+        Danh sách cv2.KeyPoint của một template (dùng cho cv2.drawMatches).
+        """
+        if template_idx not in self._keypoints_cache:
+            self._keypoints_cache[template_idx] = _array_to_keypoints(
+                self.keypoint_array[self.template_ids == template_idx])
+        return self._keypoints_cache[template_idx]
+
+    def query(self, image_descriptors, k=2):
+        """
+        Tìm k descriptor ảnh gần nhất cho *mỗi descriptor template* của mọi
+        template trong một lần gọi — cùng chiều với knnMatch(des_template, des_image)
+        của từng template, nên láng giềng của một descriptor template chỉ là
+        descriptor ảnh và không phụ thuộc các template khác.
+
+        Returns:
+            tuple: (distances, image_ids) là các mảng (M, k) với M = len(self.descriptors);
+                   vị trí không có láng giềng có distance = inf và image_id = -1.
+        """
+        n_images = 0 if image_descriptors is None else len(image_descriptors)
+        distances = np.full((len(self.descriptors), k), np.inf, dtype=np.float32)
+        image_ids = np.full((len(self.descriptors), k), -1, dtype=np.int64)
+        if len(self.descriptors) == 0 or n_images == 0:
+            return distances, image_ids
+        image_descriptors = image_descriptors.astype(np.uint8, copy=False)
+        k_found = min(k, n_images)
+
+        if self.backend == 'bruteforce':
+            # batchDistance trả thẳng mảng khoảng cách/chỉ số, không tạo đối tượng DMatch
+            neighbour_distances, neighbour_ids = cv2.batchDistance(
+                self.descriptors, image_descriptors, -1, normType=cv2.NORM_HAMMING, K=k_found, update=0,
+                crosscheck=False)
+            distances[:, :k_found] = neighbour_distances
+            image_ids[:, :k_found] = neighbour_ids
+            return distances, image_ids
+
+        # FLANN LSH (xấp xỉ): chỉ mục dựng trên descriptor của ảnh, truy vấn bằng mọi descriptor template
+        matcher = cv2.FlannBasedMatcher(
+            dict(algorithm=FLANN_INDEX_LSH, table_number=12, key_size=12, multi_probe_level=2),
+            dict(checks=50),
+        )
+        knn_matches = matcher.knnMatch(self.descriptors, image_descriptors, k=k_found)
+        for row, neighbours in enumerate(knn_matches):
+            for rank, match in enumerate(neighbours):
+                distances[row, rank] = match.distance
+                image_ids[row, rank] = match.trainIdx
+        return distances, image_ids
+
+    def match(self, image_descriptors, ratio_test_thresh=0.75):
+        """
+        Đối sánh mọi template với descriptor ảnh bằng một lần `query` (k=2), rồi
+        áp dụng ratio test vector hóa trên từng descriptor template. Kết quả của
+        mỗi template giống hệt BFMatcher.knnMatch(des_template, des_image, k=2)
+        kèm ratio test riêng cho template đó (với backend 'bruteforce').
+
+        Args:
+            image_descriptors (numpy.ndarray): Descriptor ORB của ảnh đích.
+            ratio_test_thresh (float, optional): Ngưỡng ratio test. Mặc định 0.75.
+
+        Returns:
+            dict: template_idx -> danh sách cv2.DMatch (queryIdx là chỉ số keypoint
+                  trong template, trainIdx là chỉ số keypoint trong ảnh), cùng quy
+                  ước với `orb_detect_and_visualize_matches`.
+        """
+        distances, image_ids = self.query(image_descriptors, k=2)
+        accepted = (image_ids[:, 1] >= 0) & (distances[:, 0] < ratio_test_thresh * distances[:, 1])
+        rows = np.nonzero(accepted)[0]
+
+        good_matches = {}
+        for template_idx, local_idx, image_idx, distance in zip(
+                self.template_ids[rows].tolist(), self.local_ids[rows].tolist(), image_ids[rows, 0].tolist(),
+                distances[rows, 0].tolist()):
+            good_matches.setdefault(template_idx, []).append(cv2.DMatch(local_idx, image_idx, distance))
+        return good_matches
+
+    def save(self, path):
+        """
+        Lưu chỉ mục (keypoint, descriptor, nhãn template, tham số) vào file `.npz`.
+        Khi nạp không cần trích xuất lại đặc trưng.
+        """
+        np.savez(
+            path,
+            keypoint_array=self.keypoint_array,
+            descriptors=self.descriptors,
+            template_ids=self.template_ids,
+            n_features=self.n_features,
+            n_templates=self.n_templates,
+            backend=self.backend,
+            names=np.array(self.names),
+        )
+
+    @classmethod
+    def load(cls, path, backend=None):
+        """
+        Nạp chỉ mục đã lưu bằng `save`.
+
+        Args:
+            path (str): Đường dẫn file `.npz`.
+            backend (str, optional): Ghi đè backend đã lưu.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            index = cls.__new__(cls)
+            index.n_features = int(data['n_features'])
+            index.n_templates = int(data['n_templates'])
+            index.backend = backend or str(data['backend'])
+            index.names = [str(name) for name in data['names']]
+            index._set_arrays(data['keypoint_array'], data['descriptors'], data['template_ids'])
+        if index.backend not in INDEX_BACKENDS:
+            raise ValueError(f"backend không hợp lệ: {index.backend!r}. Chỉ hỗ trợ 'flann' hoặc 'bruteforce'.")
+        return index
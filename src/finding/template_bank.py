@@ -0,0 +1,354 @@
+import hashlib
+import json
+import os
+
+import cv2
+import numpy as np
+from src.finding.template_registry import TemplateRegistry
+from src.utils.masking import binary_mask
+
+# 2: mặt nạ của template xám được tạo bằng ngưỡng như template màu
+BANK_FORMAT_VERSION = 2
+
+
+def _hash_update_array(digest, array):
+    """
+    Cập nhật hash với hình dạng, kiểu dữ liệu và nội dung của một mảng.
+    """
+    digest.update(str(array.shape).encode())
+    digest.update(str(array.dtype).encode())
+    digest.update(np.ascontiguousarray(array).tobytes())
+
+
+def _hash_parameters(digest, scales, threshold_value, angles=()):
+    """
+    Cập nhật hash với các tham số ảnh hưởng tới nội dung của bank.
+    """
+    digest.update(f"v{BANK_FORMAT_VERSION}".encode())
+    digest.update(repr([round(float(scale), 9) for scale in scales]).encode())
+    digest.update(repr(int(threshold_value)).encode())
+    if len(angles):
+        # Chỉ thêm khi có góc xoay để bank cũ (không xoay) giữ nguyên key
+        digest.update(repr([round(float(angle), 9) for angle in angles]).encode())
+
+
+def rotate_template(template, mask, angle):
+    """
+    Xoay template và mặt nạ quanh tâm một góc `angle` độ (ngược chiều kim đồng
+    hồ), mở rộng khung để không cắt mất góc. Phần nền mới thêm vào nằm ngoài mặt
+    nạ nên không ảnh hưởng tới matching. Góc 0 trả về nguyên đầu vào.
+
+    Returns:
+        tuple: (rotated_template, rotated_mask).
+    """
+    if float(angle) % 360 == 0:
+        return template, mask
+    height, width = template.shape[:2]
+    rotation = cv2.getRotationMatrix2D((width / 2, height / 2), float(angle), 1.0)
+    cos, sin = abs(rotation[0, 0]), abs(rotation[0, 1])
+    rotated_width = int(np.ceil(height * sin + width * cos))
+    rotated_height = int(np.ceil(height * cos + width * sin))
+    rotation[0, 2] += (rotated_width - width) / 2
+    rotation[1, 2] += (rotated_height - height) / 2
+    rotated_template = cv2.warpAffine(template, rotation, (rotated_width, rotated_height), flags=cv2.INTER_LINEAR,
+                                      borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+    rotated_mask = cv2.warpAffine(mask, rotation, (rotated_width, rotated_height), flags=cv2.INTER_NEAREST,
+                                  borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+    return rotated_template, rotated_mask
+
+
+class TemplateBank:
+    """
+    Bộ template đã được tiền xử lý: ảnh xám/ảnh màu, mặt nạ nhị phân và các
+    phiên bản đã thay đổi kích thước theo từng tỉ lệ (và xoay theo từng góc nếu
+    có `angles`).
+
+    Việc chuẩn bị template (cvtColor, tạo mặt nạ, resize ở mọi tỉ lệ) chỉ thực
+    hiện một lần. Bank có thể lưu xuống đĩa thành một mảng phẳng `.npy` cùng một
+    file chỉ mục JSON trong thư mục đặt tên theo content hash, và được nạp lại ở
+    chế độ memory-map để dùng chung giữa các tiến trình và các lần chạy.
+
+    Các template và mặt nạ được tạo đúng như trong
+    `linear_multiscale_template_matching`, nên kết quả matching với bank trùng
+    khớp với kết quả khi truyền danh sách template thông thường.
+
+    Example:
+        bank = TemplateBank.from_folder("data/templates/finding_01", cache_dir=".template_cache")
+        result_image, locations = linear_multiscale_template_matching(input_image, bank)
+    """
+
+    def __init__(self, templates, scales=None, threshold_value=200, names=None, key=None, angles=None):
+        """
+        Args:
+            templates (list): Danh sách ảnh template (ví dụ `TemplateRegistry.templates()`).
+                              Các phần tử None bị giữ nguyên vị trí nhưng bỏ qua.
+            scales (iterable, optional): Các tỉ lệ cần tiền xử lý. Mặc định là
+                                         np.linspace(0.5, 1.0, 10), giống giá trị mặc
+                                         định của `linear_multiscale_template_matching`.
+            threshold_value (int, optional): Ngưỡng tạo mặt nạ. Mặc định là 200.
+            names (list, optional): Tên của từng template. Mặc định là chỉ số.
+            key (str, optional): Content hash của bank. Mặc định được tính từ nội
+                                 dung các template và tham số.
+            angles (iterable, optional): Các góc xoay (độ) cần tiền xử lý cho mọi tỉ
+                                         lệ, dùng cho tìm kiếm có xoay. Mặc định không xoay.
+        """
+        if scales is None:
+            scales = np.linspace(0.5, 1.0, 10)
+        self.scales = [float(scale) for scale in scales]
+        self.angles = [float(angle) for angle in angles] if angles is not None else []
+        self.threshold_value = threshold_value
+        self.templates = list(templates)
+        self.names = list(names) if names is not None else [str(idx) for idx in range(len(self.templates))]
+        self._arrays = {}
+
+        for idx, template in enumerate(self.templates):
+            if template is None:
+                continue
+            self._add_template(idx, template)
+
+        self.key = key if key is not None else self._content_hash()
+
+    def _add_template(self, idx, template):
+        """
+        Tiền xử lý một template: ảnh xám, ảnh màu, mặt nạ và các phiên bản theo tỉ lệ.
+        """
+        if len(template.shape) == 3:
+            variants = {
+                'gray': cv2.cvtColor(template, cv2.COLOR_BGR2GRAY),
+                'color': template,
+            }
+        else:
+            variants = {'gray': template}
+        mask = binary_mask(template, threshold_value=self.threshold_value)
+
+        self._arrays[f"{idx}/mask"] = mask
+        for variant, array in variants.items():
+            self._arrays[f"{idx}/{variant}"] = array
+
+        for scale_idx, scale in enumerate(self.scales):
+            for variant, array in variants.items():
+                scaled_template = cv2.resize(array, (0, 0), fx=scale, fy=scale)
+                self._arrays[f"{idx}/{scale_idx}/{variant}"] = scaled_template
+            size = (scaled_template.shape[1], scaled_template.shape[0])
+            self._arrays[f"{idx}/{scale_idx}/mask"] = cv2.resize(mask, size)
+
+            for angle_idx, angle in enumerate(self.angles):
+                scaled_mask = self._arrays[f"{idx}/{scale_idx}/mask"]
+                for variant in variants:
+                    rotated_template, rotated_mask = rotate_template(
+                        self._arrays[f"{idx}/{scale_idx}/{variant}"], scaled_mask, angle)
+                    self._arrays[f"{idx}/r{angle_idx}/{scale_idx}/{variant}"] = rotated_template
+                self._arrays[f"{idx}/r{angle_idx}/{scale_idx}/mask"] = rotated_mask
+
+    def _content_hash(self):
+        """
+        Tính content hash từ nội dung template và các tham số tiền xử lý.
+        """
+        digest = hashlib.sha256()
+        _hash_parameters(digest, self.scales, self.threshold_value, self.angles)
+        for name, template in zip(self.names, self.templates):
+            digest.update(name.encode())
+            if template is not None:
+                _hash_update_array(digest, template)
+        return digest.hexdigest()
+
+    def __len__(self):
+        return len(self.templates)
+
+    def has_scales(self, scales):
+        """
+        Kiểm tra bank đã tiền xử lý đúng dãy tỉ lệ `scales` hay chưa.
+        """
+        scales = [float(scale) for scale in scales]
+        return len(scales) == len(self.scales) and np.allclose(scales, self.scales, rtol=0, atol=1e-9)
+
+    def has_angles(self, angles):
+        """
+        Kiểm tra bank đã tiền xử lý đúng dãy góc xoay `angles` hay chưa.
+        """
+        angles = [float(angle) for angle in angles]
+        return len(angles) == len(self.angles) and np.allclose(angles, self.angles, rtol=0, atol=1e-9)
+
+    def mask(self, template_idx):
+        """
+        Trả về mặt nạ nhị phân (kích thước gốc) của template.
+        """
+        return self._arrays[f"{template_idx}/mask"]
+
+    def template(self, template_idx, grayscale=False):
+        """
+        Trả về template (kích thước gốc) dạng xám hoặc màu. Template xám luôn
+        trả về ảnh xám.
+        """
+        variant = 'gray' if grayscale else 'color'
+        return self._arrays.get(f"{template_idx}/{variant}", self._arrays[f"{template_idx}/gray"])
+
+    def scaled_templates(self, template_idx, grayscale=False):
+        """
+        Trả về danh sách (scale, scaled_template, scaled_mask) đã tiền xử lý cho
+        mọi tỉ lệ của một template.
+
+        Args:
+            template_idx (int): Chỉ số template trong bank.
+            grayscale (bool, optional): Lấy phiên bản ảnh xám thay vì ảnh màu.
+
+        Returns:
+            list: Danh sách bộ ba (float, numpy.ndarray, numpy.ndarray).
+        """
+        variant = 'gray' if grayscale or f"{template_idx}/color" not in self._arrays else 'color'
+        return [
+            (scale,
+             self._arrays[f"{template_idx}/{scale_idx}/{variant}"],
+             self._arrays[f"{template_idx}/{scale_idx}/mask"])
+            for scale_idx, scale in enumerate(self.scales)
+        ]
+
+    def rotated_templates(self, template_idx, grayscale=False):
+        """
+        Trả về dict (angle_idx, scale_idx) -> (rotated_template, rotated_mask) đã
+        tiền xử lý cho mọi góc xoay và mọi tỉ lệ của một template.
+        """
+        variant = 'gray' if grayscale or f"{template_idx}/color" not in self._arrays else 'color'
+        return {
+            (angle_idx, scale_idx): (self._arrays[f"{template_idx}/r{angle_idx}/{scale_idx}/{variant}"],
+                                     self._arrays[f"{template_idx}/r{angle_idx}/{scale_idx}/mask"])
+            for angle_idx in range(len(self.angles))
+            for scale_idx in range(len(self.scales))
+        }
+
+    def save(self, cache_dir):
+        """
+        Lưu bank vào `cache_dir/<key>/` gồm `arrays.npy` (mọi mảng ghép thành một
+        mảng uint8 phẳng) và `index.json` (vị trí, hình dạng của từng mảng).
+
+        Returns:
+            str: Đường dẫn thư mục đã lưu.
+        """
+        bank_dir = os.path.join(cache_dir, self.key)
+        os.makedirs(bank_dir, exist_ok=True)
+
+        index = {}
+        offset = 0
+        for name, array in self._arrays.items():
+            index[name] = {'offset': offset, 'shape': list(array.shape), 'dtype': str(array.dtype)}
+            offset += array.nbytes
+
+        buffer = np.empty(offset, dtype=np.uint8)
+        for name, array in self._arrays.items():
+            entry = index[name]
+            buffer[entry['offset']:entry['offset'] + array.nbytes] = np.ascontiguousarray(array).view(np.uint8).ravel()
+
+        # Ghi file tạm rồi đổi tên để tiến trình khác không đọc phải file dở dang
+        arrays_tmp = os.path.join(bank_dir, f"arrays.{os.getpid()}.tmp.npy")
+        np.save(arrays_tmp, buffer)
+        os.replace(arrays_tmp, os.path.join(bank_dir, 'arrays.npy'))
+
+        metadata = {
+            'version': BANK_FORMAT_VERSION,
+            'key': self.key,
+            'scales': self.scales,
+            'angles': self.angles,
+            'threshold_value': self.threshold_value,
+            'names': self.names,
+            'present': [template is not None for template in self.templates],
+            'arrays': index,
+        }
+        index_tmp = os.path.join(bank_dir, f"index.{os.getpid()}.tmp.json")
+        with open(index_tmp, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f)
+        os.replace(index_tmp, os.path.join(bank_dir, 'index.json'))
+        return bank_dir
+
+    @classmethod
+    def load(cls, bank_dir, mmap_mode='r'):
+        """
+        Nạp bank đã lưu bằng `save`. Các mảng là view (chỉ đọc) trên cùng một
+        file memory-map nên việc nạp gần như tức thời và bộ nhớ được chia sẻ
+        giữa các tiến trình.
+
+        Raises:
+            FileNotFoundError: Nếu thư mục không chứa bank hợp lệ.
+            ValueError: Nếu bank được lưu bởi phiên bản định dạng khác.
+        """
+        with open(os.path.join(bank_dir, 'index.json'), encoding='utf-8') as f:
+            metadata = json.load(f)
+        if metadata.get('version') != BANK_FORMAT_VERSION:
+            raise ValueError(f"Phiên bản TemplateBank không tương thích: {metadata.get('version')}")
+
+        buffer = np.load(os.path.join(bank_dir, 'arrays.npy'), mmap_mode=mmap_mode)
+
+        bank = cls.__new__(cls)
+        bank.scales = metadata['scales']
+        bank.angles = metadata.get('angles', [])
+        bank.threshold_value = metadata['threshold_value']
+        bank.names = metadata['names']
+        bank.key = metadata['key']
+        bank._arrays = {}
+        for name, entry in metadata['arrays'].items():
+            nbytes = int(np.prod(entry['shape'])) * np.dtype(entry['dtype']).itemsize
+            raw = buffer[entry['offset']:entry['offset'] + nbytes]
+            bank._arrays[name] = raw.view(entry['dtype']).reshape(entry['shape'])
+        bank.templates = [
+            bank.template(idx) if present else None
+            for idx, present in enumerate(metadata['present'])
+        ]
+        return bank
+
+    @classmethod
+    def load_or_build(cls, templates, cache_dir, scales=None, threshold_value=200, names=None, angles=None):
+        """
+        Nạp bank từ `cache_dir` nếu đã có bản cùng content hash, ngược lại tiền
+        xử lý từ `templates` và lưu lại.
+        """
+        bank = cls(templates, scales=scales, threshold_value=threshold_value, names=names, angles=angles)
+        bank_dir = os.path.join(cache_dir, bank.key)
+        if os.path.exists(os.path.join(bank_dir, 'index.json')):
+            return cls.load(bank_dir)
+        bank.save(cache_dir)
+        return bank
+
+    @classmethod
+    def from_folder(cls, folder_path, cache_dir=None, scales=None, threshold_value=200, angles=None):
+        """
+        Tạo bank từ một thư mục template (ví dụ `data/templates/finding_01/`).
+
+        Các file ảnh được sắp xếp theo tên, đặt tên theo phần tên file bỏ đuôi và
+        giải mã song song bằng `TemplateRegistry`.
+        Khi có `cache_dir`, content hash được tính trực tiếp từ nội dung file (không
+        cần giải mã ảnh), nên lần chạy sau chỉ cần nạp bank đã lưu.
+
+        Args:
+            folder_path (str): Thư mục chứa các file ảnh template.
+            cache_dir (str, optional): Thư mục cache. None để không lưu.
+            scales (iterable, optional): Các tỉ lệ cần tiền xử lý.
+            threshold_value (int, optional): Ngưỡng tạo mặt nạ. Mặc định là 200.
+            angles (iterable, optional): Các góc xoay (độ) cần tiền xử lý.
+
+        Returns:
+            TemplateBank: Bank đã tiền xử lý.
+
+        Raises:
+            FileNotFoundError: Nếu thư mục không tồn tại.
+        """
+        if scales is None:
+            scales = np.linspace(0.5, 1.0, 10)
+        registry = TemplateRegistry(folder_path)
+        file_names = [os.path.basename(registry.path(name)) for name in registry.names]
+
+        digest = hashlib.sha256()
+        _hash_parameters(digest, scales, threshold_value, angles if angles is not None else ())
+        for file in file_names:
+            digest.update(file.encode())
+            with open(os.path.join(folder_path, file), 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        key = digest.hexdigest()
+
+        if cache_dir is not None and os.path.exists(os.path.join(cache_dir, key, 'index.json')):
+            return cls.load(os.path.join(cache_dir, key))
+
+        templates = registry.templates()
+        bank = cls(templates, scales=scales, threshold_value=threshold_value, names=registry.names, key=key,
+                   angles=angles)
+        if cache_dir is not None:
+            bank.save(cache_dir)
+        return bank
@@ -1,61 +1,1072 @@
+import logging
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+
 import cv2
 import numpy as np
+from src.finding.detection import (DETECTION_DTYPE, detections_from_peaks, empty_detections, find_peaks,
+                                  non_max_suppression)
+from src.finding.fft_matching import SUPPORTED_FFT_METHODS, FFTCorrelationEngine
+from src.finding.template_bank import TemplateBank, rotate_template
+from src.finding.template_registry import TemplateRegistry
+from src.utils.instrumentation import count, record_allocation, span, traced
 from src.utils.visualization import draw_bounding_box
 
-def get_template(folder_path: str):
+logger = logging.getLogger(__name__)
+
+def get_template(folder_path: str, grayscale=False, reduction=1):
     """
-    Đọc tất cả các tệp ảnh từ một thư mục và trả về chúng dưới dạng danh sách.
+    Đọc tất cả các ảnh template trong một thư mục và trả về chúng dưới dạng danh sách.
     
-    Hàm này duyệt qua tất cả các tệp trong thư mục đã chỉ định, đọc mỗi tệp
-    như một ảnh bằng OpenCV, và thêm vào danh sách templates để trả về.
+    Các file được sắp xếp theo tên và giải mã song song bằng `TemplateRegistry`;
+    file không phải ảnh hoặc không giải mã được bị bỏ qua. Dùng `TemplateRegistry`
+    trực tiếp để truy cập template theo tên (ví dụ 'balloon') hoặc nạp khi cần.
     
     Args:
         folder_path (str): Đường dẫn đến thư mục chứa các tệp ảnh template cần đọc.
+        grayscale (bool, optional): Giải mã thẳng thành ảnh xám. Mặc định False.
+        reduction (int, optional): Hệ số giảm độ phân giải khi giải mã (1, 2, 4, 8).
+                                   Mặc định 1.
         
     Returns:
-        list: Danh sách các đối tượng ảnh (numpy.ndarray) đọc được từ các tệp trong 
-              thư mục. Nếu một tệp không đọc được sẽ có giá trị None trong danh sách.
+        list: Danh sách các ảnh (numpy.ndarray), theo thứ tự tên file.
               
     Raises:
         FileNotFoundError: Nếu thư mục không tồn tại.
-        
-    Note:
-        Hàm giả định mọi tệp trong thư mục đều là ảnh. Nếu có tệp không phải ảnh
-        hoặc không được hỗ trợ bởi OpenCV, kết quả có thể chứa các giá trị None.
     """
-    templates = []
-    for file in os.listdir(folder_path):
-        template = cv2.imread(os.path.join(folder_path, file))
-        templates.append(template)
-    return templates
+    return TemplateRegistry(folder_path, grayscale=grayscale, reduction=reduction).templates()
+
+
+class MatchWorkspace:
+    """
+    Bộ đệm dùng lại giữa các tỉ lệ, các template và các lần gọi cho chế độ quét
+    tuyến tính không cấp phát (`linear_multiscale_template_matching(...,
+    workspace=...)`). Mỗi bộ đệm là một mảng phẳng liên tục; các mảng kết quả
+    là view đầu mảng được truyền cho OpenCV qua tham số `dst`/`result`, nên chỉ
+    được cấp phát lại khi cần lớn hơn lần trước.
+
+    Một workspace chỉ dùng cho một luồng tại một thời điểm.
+
+    Example:
+        workspace = MatchWorkspace()
+        for frame in frames:
+            _, locations = linear_multiscale_template_matching(frame, bank, draw=False, workspace=workspace)
+    """
+
+    def __init__(self):
+        self._buffers = {}
+        self.allocations = 0
+
+    def reserve(self, name, size, dtype):
+        """
+        Đảm bảo bộ đệm `name` chứa được ít nhất `size` phần tử kiểu `dtype`.
+        """
+        dtype = np.dtype(dtype)
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.dtype != dtype or buffer.size < size:
+            buffer = np.empty(int(size), dtype=dtype)
+            self._buffers[name] = buffer
+            self.allocations += 1
+        return buffer
+
+    def array(self, name, shape, dtype):
+        """
+        View liên tục hình dạng `shape` trên bộ đệm `name`. Nội dung bị ghi đè ở
+        lần gọi sau với cùng tên.
+        """
+        size = int(np.prod(shape))
+        return self.reserve(name, size, dtype)[:size].reshape(shape)
+
+    @property
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+
+def prepare_image_for_matching(image, templates, workspace=None):
+    """
+    Chọn ảnh đích dùng cho matching: chuyển sang ảnh xám nếu template là ảnh xám.
+    """
+    if len(image.shape) == 3 and templates and len(templates[0].shape) == 2:
+        if workspace is not None:
+            return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY,
+                                dst=workspace.array('image', image.shape[:2], image.dtype))
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+def _prepare_template_for_matching(template, image_for_matching, threshold_value):
+    """
+    Chuẩn bị template và mặt nạ nhị phân tương ứng cho matching.
+
+    Returns:
+        tuple: (template_for_matching, template_mask).
+    """
+    # Nếu template là ảnh màu (3 kênh), cần tạo mặt nạ từ ảnh xám
+    if len(template.shape) == 3:
+        # Tạo mặt nạ nhị phân từ template
+        gray_template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+        _, template_mask = cv2.threshold(gray_template, threshold_value, 255, cv2.THRESH_BINARY_INV)
+
+        if len(image_for_matching.shape) == 2:
+            template_for_matching = gray_template
+        else:
+            template_for_matching = template
+    else:
+        # Template xám (ví dụ get_template(..., grayscale=True)): cùng ngưỡng như ảnh màu
+        _, template_mask = cv2.threshold(template, threshold_value, 255, cv2.THRESH_BINARY_INV)
+        template_for_matching = template.copy()
+    return template_for_matching, template_mask
+
+
+def _scale_template(template_for_matching, template_mask, scale):
+    """
+    Thay đổi kích thước template và mặt nạ theo một tỉ lệ.
+    """
+    with span('resize', scale=float(scale)):
+        scaled_template = cv2.resize(template_for_matching, (0, 0), fx=scale, fy=scale)
+        scaled_mask = cv2.resize(template_mask, (scaled_template.shape[1], scaled_template.shape[0]))
+    return scaled_template, scaled_mask
+
+
+def _iter_scaled_templates(template_for_matching, template_mask, scales):
+    """
+    Sinh lần lượt các bộ (scale, scaled_template, scaled_mask) cho mọi tỉ lệ.
+    """
+    for scale in scales:
+        scaled_template, scaled_mask = _scale_template(template_for_matching, template_mask, scale)
+        yield float(scale), scaled_template, scaled_mask
+
+
+def _scaled_shape(shape, scale):
+    """
+    Hình dạng cv2.resize trả về với fx = fy = scale (làm tròn như OpenCV).
+    """
+    return (int(np.rint(shape[0] * scale)), int(np.rint(shape[1] * scale))) + tuple(shape[2:])
+
+
+def _iter_scaled_templates_into(template_for_matching, template_mask, scales, workspace):
+    """
+    Như `_iter_scaled_templates` nhưng ghi template và mặt nạ đã scale vào bộ
+    đệm của `workspace`; mỗi bộ chỉ hợp lệ tới lần lặp kế tiếp.
+    """
+    for scale in scales:
+        with span('resize', scale=float(scale)):
+            scaled_template = cv2.resize(
+                template_for_matching, (0, 0), fx=scale, fy=scale,
+                dst=workspace.array('template', _scaled_shape(template_for_matching.shape, scale),
+                                    template_for_matching.dtype))
+            scaled_mask = cv2.resize(template_mask, (scaled_template.shape[1], scaled_template.shape[0]),
+                                     dst=workspace.array('mask', scaled_template.shape[:2], template_mask.dtype))
+        yield float(scale), scaled_template, scaled_mask
+
+
+def _match_single_scale(image_for_matching, scaled_template, scaled_mask, scale, match_method, result=None):
+    """
+    So khớp một template đã scale trên toàn ảnh. `result` là mảng float32 đúng
+    kích thước bản đồ tương quan để OpenCV ghi vào thay vì cấp phát mới.
+
+    Returns:
+        dict hoặc None: Gồm 'location', 'dimensions', 'scale', 'correlation';
+                        None nếu OpenCV báo lỗi (ví dụ template lớn hơn ảnh).
+    """
+    template_width, template_height = scaled_template.shape[1], scaled_template.shape[0]
+
+    try:
+        with span('matchTemplate', scale=float(scale), template_size=(template_width, template_height)):
+            correlation_map = cv2.matchTemplate(
+                image_for_matching,
+                scaled_template,
+                match_method,
+                result=result,
+                mask=scaled_mask
+            )
+    except cv2.error as e:
+        logger.warning("Lỗi khi thực hiện template matching với scale %s: %s", scale, e)
+        return None
+    if correlation_map is not result:
+        record_allocation('correlation_map', correlation_map, scale=float(scale))
+    # Vùng ảnh phẳng dưới mặt nạ cho giá trị chuẩn hóa vô hạn (hay gặp trên ảnh xám)
+    correlation_map[~np.isfinite(correlation_map)] = -np.inf
+
+    _, max_correlation, _, max_location = cv2.minMaxLoc(correlation_map)
+    return {
+        'location': max_location,
+        'dimensions': (template_width, template_height),
+        'scale': float(scale),
+        'correlation': float(max_correlation),
+    }
+
+
+def _select_best_match(scale_matches):
+    """
+    Chọn kết quả có độ tương đồng cao nhất theo đúng thứ tự tỉ lệ (giữ kết quả
+    đầu tiên khi bằng nhau), để kết quả không phụ thuộc cách thực thi.
+    """
+    best_match = None
+    best_correlation = -1
+    for match in scale_matches:
+        if match is not None and match['correlation'] > best_correlation:
+            best_match = match
+            best_correlation = match['correlation']
+    return best_match
+
+
+def _linear_scale_search(image_for_matching, scaled_templates, match_method, workspace=None):
+    """
+    Quét toàn bộ ảnh ở từng tỉ lệ và giữ lại vị trí có độ tương đồng cao nhất.
+
+    Args:
+        scaled_templates (iterable): Các bộ (scale, scaled_template, scaled_mask).
+        workspace (MatchWorkspace, optional): Nếu có, bản đồ tương quan được ghi
+                                              vào bộ đệm dùng lại.
+
+    Returns:
+        dict hoặc None: Kết quả tốt nhất gồm các khóa 'location', 'dimensions',
+                        'scale', 'correlation'; None nếu không tỉ lệ nào khớp được.
+    """
+    if workspace is None:
+        return _select_best_match(
+            _match_single_scale(image_for_matching, scaled_template, scaled_mask, scale, match_method)
+            for scale, scaled_template, scaled_mask in scaled_templates
+        )
+    image_height, image_width = image_for_matching.shape[:2]
+    return _select_best_match(
+        _match_single_scale(image_for_matching, scaled_template, scaled_mask, scale, match_method,
+                            result=workspace.array('correlation',
+                                                   (max(0, image_height - scaled_template.shape[0] + 1),
+                                                    max(0, image_width - scaled_template.shape[1] + 1)),
+                                                   np.float32))
+        for scale, scaled_template, scaled_mask in scaled_templates
+    )
+
 
+def _build_scaled_template_sets(templates, bank, template_indices, image_for_matching, scales, threshold_value,
+                                workspace=None):
+    """
+    Tạo, cho từng template, nguồn các bộ (scale, scaled_template, scaled_mask):
+    lấy từ TemplateBank nếu bank đã tiền xử lý đúng dãy tỉ lệ và ngưỡng, ngược lại
+    thay đổi kích thước lần lượt khi cần (vào bộ đệm của `workspace` nếu có).
+    """
+    use_bank = bank is not None and bank.threshold_value == threshold_value and bank.has_scales(scales)
+    grayscale = len(image_for_matching.shape) == 2
+    scaled_template_sets = []
+    for idx in template_indices:
+        if use_bank:
+            scaled_template_sets.append(bank.scaled_templates(idx, grayscale=grayscale))
+        else:
+            template_for_matching, template_mask = _prepare_template_for_matching(
+                templates[idx], image_for_matching, threshold_value)
+            if workspace is not None:
+                scaled_template_sets.append(_iter_scaled_templates_into(template_for_matching, template_mask,
+                                                                        scales, workspace))
+            else:
+                scaled_template_sets.append(_iter_scaled_templates(template_for_matching, template_mask, scales))
+    return scaled_template_sets
+
+
+def search_template_window(image_for_matching, bank, template_idx, window=None, scales=None,
+                           match_method=cv2.TM_CCOEFF_NORMED):
+    """
+    Tìm vị trí có độ tương đồng cao nhất của một template trong một cửa sổ của
+    ảnh (ví dụ vùng quanh vị trí ở khung hình trước khi theo dõi đối tượng).
+
+    Args:
+        image_for_matching (numpy.ndarray): Ảnh đích đã qua `prepare_image_for_matching`.
+        bank (TemplateBank): Bank chứa template.
+        template_idx (int): Chỉ số template trong bank.
+        window (tuple, optional): Cửa sổ (x0, y0, x1, y1) trên ảnh. Mặc định toàn ảnh.
+        scales (iterable, optional): Các tỉ lệ cần thử. Mặc định các tỉ lệ đã tiền
+                                     xử lý của bank (dùng template đã scale sẵn).
+                                     Tỉ lệ làm template lớn hơn cửa sổ bị bỏ qua.
+        match_method (int, optional): Phương pháp so khớp. Mặc định cv2.TM_CCOEFF_NORMED.
+
+    Returns:
+        dict hoặc None: Gồm 'location' (tọa độ trên toàn ảnh), 'dimensions', 'scale',
+                        'correlation'; None nếu không tỉ lệ nào khớp được.
+    """
+    grayscale = len(image_for_matching.shape) == 2
+    x0, y0 = 0, 0
+    if window is not None:
+        x0, y0, x1, y1 = window
+        image_for_matching = image_for_matching[y0:y1, x0:x1]
+    window_height, window_width = image_for_matching.shape[:2]
+
+    if scales is None:
+        scaled_templates = (entry for entry in bank.scaled_templates(template_idx, grayscale)
+                            if entry[1].shape[0] <= window_height and entry[1].shape[1] <= window_width)
+    else:
+        template = bank.template(template_idx, grayscale)
+        scales = [scale for scale in scales
+                  if round(template.shape[0] * scale) <= window_height
+                  and round(template.shape[1] * scale) <= window_width]
+        scaled_templates = _iter_scaled_templates(template, bank.mask(template_idx), scales)
+
+    best_match = _linear_scale_search(image_for_matching, scaled_templates, match_method)
+    if best_match is not None and (x0 or y0):
+        best_match['location'] = (x0 + best_match['location'][0], y0 + best_match['location'][1])
+    return best_match
+
+
+def _fft_search(image_for_matching, scaled_template_sets, match_method, batch_size):
+    """
+    Quét tuyến tính bằng FFT backend: phổ của ảnh được tính một lần, mọi
+    (template, tỉ lệ) được so khớp theo lô với phổ đó. Mỗi lô được rút gọn ngay
+    về vị trí cực đại để không phải giữ toàn bộ bản đồ tương quan.
+
+    Returns:
+        list: Kết quả tốt nhất (dict hoặc None) cho từng template.
+    """
+    engine = FFTCorrelationEngine(image_for_matching)
+    jobs = [
+        (set_idx, scale, scaled_template, scaled_mask)
+        for set_idx, scaled_templates in enumerate(scaled_template_sets)
+        for scale, scaled_template, scaled_mask in scaled_templates
+    ]
+    scale_matches = [[] for _ in scaled_template_sets]
 
+    for start in range(0, len(jobs), batch_size):
+        batch = jobs[start:start + batch_size]
+        correlation_maps = engine.match([(scaled_template, scaled_mask) for _, _, scaled_template, scaled_mask in batch],
+                                        match_method, batch_size=batch_size)
+        for (set_idx, scale, scaled_template, _), correlation_map in zip(batch, correlation_maps):
+            if correlation_map is None:
+                scale_matches[set_idx].append(None)
+                continue
+            _, max_correlation, _, max_location = cv2.minMaxLoc(correlation_map)
+            scale_matches[set_idx].append({
+                'location': max_location,
+                'dimensions': (scaled_template.shape[1], scaled_template.shape[0]),
+                'scale': scale,
+                'correlation': float(max_correlation),
+            })
+
+    return [_select_best_match(matches) for matches in scale_matches]
+
+
+def _build_image_pyramid(image_for_matching, levels):
+    """
+    Tạo kim tự tháp ảnh: phần tử thứ l là ảnh thu nhỏ 2^l lần.
+    """
+    pyramid = [image_for_matching]
+    for _ in range(levels):
+        previous = pyramid[-1]
+        pyramid.append(cv2.resize(previous, ((previous.shape[1] + 1) // 2, (previous.shape[0] + 1) // 2),
+                                  interpolation=cv2.INTER_LINEAR))
+    return pyramid
+
+
+def _downscale_template(scaled_template, scaled_mask, level):
+    """
+    Thu nhỏ template (và mặt nạ) đã scale xuống tầng `level` của kim tự tháp.
+    """
+    if level == 0:
+        return scaled_template, scaled_mask
+    factor = 2 ** level
+    size = (max(1, round(scaled_template.shape[1] / factor)), max(1, round(scaled_template.shape[0] / factor)))
+    return (cv2.resize(scaled_template, size, interpolation=cv2.INTER_LINEAR),
+            cv2.resize(scaled_mask, size, interpolation=cv2.INTER_LINEAR))
+
+
+def _pyramid_scale_search(image_pyramid, scaled_templates, match_method, pyramid_candidates=3,
+                          pyramid_margin=4, min_template_size=8):
+    """
+    Tìm kiếm thô-đến-tinh: quét toàn ảnh ở tầng thô nhất của kim tự tháp, giữ lại
+    `pyramid_candidates` cực đại địa phương tốt nhất ở mỗi tỉ lệ, sau đó chỉ so khớp
+    lại trong các vùng ROI nhỏ quanh ứng viên ở các tầng phân giải cao hơn.
+
+    Số tầng thực tế được giảm cho từng template sao cho template nhỏ nhất ở tầng
+    thô vẫn có cạnh không nhỏ hơn `min_template_size` pixel.
+
+    Args:
+        scaled_templates (iterable): Các bộ (scale, scaled_template, scaled_mask).
+
+    Returns:
+        dict hoặc None: Cùng định dạng với `_linear_scale_search`.
+    """
+    image_height, image_width = image_pyramid[0].shape[:2]
+    scaled = [
+        (scale, scaled_template, scaled_mask)
+        for scale, scaled_template, scaled_mask in scaled_templates
+        if scaled_template.shape[0] <= image_height and scaled_template.shape[1] <= image_width
+    ]
+    if not scaled:
+        return None
+
+    smallest_side = min(min(t.shape[:2]) for _, t, _ in scaled)
+    levels = len(image_pyramid) - 1
+    while levels > 0 and smallest_side / (2 ** levels) < min_template_size:
+        levels -= 1
+
+    # Tầng thô nhất: quét toàn ảnh cho mọi tỉ lệ
+    candidates = []
+    coarse_image = image_pyramid[levels]
+    for scale_idx, (scale, scaled_template, scaled_mask) in enumerate(scaled):
+        coarse_template, coarse_mask = _downscale_template(scaled_template, scaled_mask, levels)
+        if coarse_template.shape[0] > coarse_image.shape[0] or coarse_template.shape[1] > coarse_image.shape[1]:
+            continue
+        try:
+            with span('matchTemplate', scale=scale, level=levels):
+                correlation_map = cv2.matchTemplate(coarse_image, coarse_template, match_method, mask=coarse_mask)
+        except cv2.error as e:
+            logger.warning("Lỗi khi thực hiện template matching với scale %s: %s", scale, e)
+            continue
+        xs, ys, scores = find_peaks(correlation_map, pyramid_candidates)
+        for x, y, correlation in zip(xs, ys, scores):
+            candidates.append((float(correlation), scale_idx, (int(x), int(y))))
+
+    # Các tầng mịn hơn: chỉ so khớp trong ROI quanh ứng viên
+    for level in range(levels - 1, -1, -1):
+        level_image = image_pyramid[level]
+        refined = []
+        for _, scale_idx, (x, y) in candidates:
+            _, scaled_template, scaled_mask = scaled[scale_idx]
+            level_template, level_mask = _downscale_template(scaled_template, scaled_mask, level)
+            template_height, template_width = level_template.shape[:2]
+
+            x0 = max(0, 2 * x - pyramid_margin)
+            y0 = max(0, 2 * y - pyramid_margin)
+            x1 = min(level_image.shape[1], 2 * x + pyramid_margin + template_width)
+            y1 = min(level_image.shape[0], 2 * y + pyramid_margin + template_height)
+            if x1 - x0 < template_width or y1 - y0 < template_height:
+                continue
+            try:
+                with span('matchTemplate', scale=scaled[scale_idx][0], level=level):
+                    correlation_map = cv2.matchTemplate(level_image[y0:y1, x0:x1], level_template,
+                                                        match_method, mask=level_mask)
+            except cv2.error as e:
+                logger.warning("Lỗi khi thực hiện template matching với scale %s: %s", scaled[scale_idx][0], e)
+                continue
+            _, max_correlation, _, max_location = cv2.minMaxLoc(correlation_map)
+            refined.append((max_correlation, scale_idx, (x0 + max_location[0], y0 + max_location[1])))
+        candidates = refined
+
+    if not candidates:
+        return None
+
+    best_correlation, best_scale_idx, best_location = max(candidates, key=lambda candidate: candidate[0])
+    scale, scaled_template, _ = scaled[best_scale_idx]
+    return {
+        'location': best_location,
+        'dimensions': (scaled_template.shape[1], scaled_template.shape[0]),
+        'scale': scale,
+        'correlation': float(best_correlation),
+    }
+
+
+def _adaptive_scale_search(image_for_matching, template_for_matching, template_mask, scale_range, match_method,
+                           coarse_steps=5, scale_tolerance=0.01, early_exit_correlation=None):
+    """
+    Tìm tỉ lệ thích nghi: quét thô `coarse_steps` tỉ lệ, sau đó tinh chỉnh cục bộ
+    quanh đỉnh tương quan bằng nội suy parabol (lùi về bước golden-section khi
+    parabol không hợp lệ) cho tới khi độ rộng khoảng kẹp không vượt quá
+    `scale_tolerance`, tức cùng độ chính xác với lưới đều bước `scale_tolerance`.
+
+    Các tỉ lệ làm template lớn hơn ảnh bị bỏ qua mà không gọi matchTemplate.
+    Khi `early_exit_correlation` được đặt, tìm kiếm dừng ngay khi độ tương đồng
+    tốt nhất đạt ngưỡng này.
+
+    Returns:
+        dict hoặc None: Cùng định dạng với `_linear_scale_search`.
+    """
+    image_height, image_width = image_for_matching.shape[:2]
+    evaluated = {}
+
+    def evaluate(scale):
+        scale = float(scale)
+        if scale not in evaluated:
+            scaled_template, scaled_mask = _scale_template(template_for_matching, template_mask, scale)
+            if scaled_template.shape[0] > image_height or scaled_template.shape[1] > image_width:
+                evaluated[scale] = None
+            else:
+                evaluated[scale] = _match_single_scale(image_for_matching, scaled_template, scaled_mask,
+                                                       scale, match_method)
+        match = evaluated[scale]
+        return match['correlation'] if match is not None else -np.inf
+
+    def confident():
+        best_match = _select_best_match(evaluated.values())
+        return (early_exit_correlation is not None and best_match is not None
+                and best_match['correlation'] >= early_exit_correlation)
+
+    coarse_scales = np.linspace(scale_range[0], scale_range[1], coarse_steps)
+    coarse_scores = []
+    for scale in coarse_scales:
+        coarse_scores.append(evaluate(scale))
+        if confident():
+            return _select_best_match(evaluated.values())
+
+    best_idx = int(np.argmax(coarse_scores))
+    if not np.isfinite(coarse_scores[best_idx]):
+        return None
+
+    # Khoảng kẹp (a, c, b) quanh đỉnh: f(c) >= f(a), f(b)
+    a = float(coarse_scales[max(best_idx - 1, 0)])
+    b = float(coarse_scales[min(best_idx + 1, len(coarse_scales) - 1)])
+    c = float(coarse_scales[best_idx])
+    golden = 0.381966
+
+    while b - a > scale_tolerance:
+        fa, fb, fc = evaluate(a), evaluate(b), evaluate(c)
+        x = None
+        if a < c < b and np.isfinite(fa) and np.isfinite(fb):
+            # Đỉnh của parabol đi qua ba điểm (a, fa), (c, fc), (b, fb)
+            numerator = (c - a) ** 2 * (fc - fb) - (c - b) ** 2 * (fc - fa)
+            denominator = (c - a) * (fc - fb) - (c - b) * (fc - fa)
+            if denominator != 0:
+                x = c - 0.5 * numerator / denominator
+                if not (a < x < b) or abs(x - c) < scale_tolerance / 2:
+                    x = None
+        if x is None:
+            x = c - golden * (c - a) if c - a > b - c else c + golden * (b - c)
+
+        fx = evaluate(x)
+        if fx > fc:
+            if x < c:
+                b = c
+            else:
+                a = c
+            c = x
+        elif x < c:
+            a = x
+        else:
+            b = x
+        if confident():
+            break
+
+    return _select_best_match(evaluated[scale] for scale in sorted(evaluated))
+
+
+class _RotatedCells(dict):
+    """
+    Bảng (angle_idx, scale_idx) -> (rotated_template, rotated_mask) tạo khi cần,
+    dùng khi không có TemplateBank đã tiền xử lý sẵn các góc xoay. Tìm kiếm
+    thô-đến-tinh chỉ chạm tới một phần nhỏ các ô nên không xoay trước mọi ô.
+    """
+
+    def __init__(self, template_for_matching, template_mask, scales, angles):
+        super().__init__()
+        self._scaled = [_scale_template(template_for_matching, template_mask, scale) for scale in scales]
+        self._angles = angles
+
+    def __missing__(self, cell):
+        angle_idx, scale_idx = cell
+        value = rotate_template(*self._scaled[scale_idx], self._angles[angle_idx])
+        self[cell] = value
+        return value
+
+
+def _match_around(level_image, center, level_template, level_mask, margin, match_method):
+    """
+    So khớp trong ROI quanh tâm dự kiến `center` của đối tượng.
+
+    Returns:
+        tuple hoặc None: (correlation, location) tốt nhất trong ROI; None nếu ROI
+                         nhỏ hơn template hoặc OpenCV báo lỗi.
+    """
+    template_height, template_width = level_template.shape[:2]
+    x0 = max(0, int(round(center[0] - template_width / 2)) - margin)
+    y0 = max(0, int(round(center[1] - template_height / 2)) - margin)
+    x1 = min(level_image.shape[1], x0 + template_width + 2 * margin)
+    y1 = min(level_image.shape[0], y0 + template_height + 2 * margin)
+    if x1 - x0 < template_width or y1 - y0 < template_height:
+        return None
+    try:
+        with span('matchTemplate', roi=True):
+            correlation_map = cv2.matchTemplate(level_image[y0:y1, x0:x1], level_template, match_method,
+                                                mask=level_mask)
+    except cv2.error as e:
+        logger.warning("Lỗi khi thực hiện template matching trong ROI: %s", e)
+        return None
+    correlation_map[~np.isfinite(correlation_map)] = -np.inf
+    _, max_correlation, _, max_location = cv2.minMaxLoc(correlation_map)
+    if not np.isfinite(max_correlation):
+        return None
+    return float(max_correlation), (x0 + max_location[0], y0 + max_location[1])
+
+
+def _rotation_scale_search(image_pyramid, rotated_cells, angles, scales, match_method, coarse_stride=2,
+                           candidates=40, margin=4, min_template_size=8):
+    """
+    Tìm kiếm thô-đến-tinh trên lưới (góc xoay, tỉ lệ).
+
+    1. Ở tầng thô của kim tự tháp, quét toàn ảnh với mỗi `coarse_stride` góc một
+       (mọi tỉ lệ), giữ `candidates` vị trí tốt nhất cách nhau hơn `margin` pixel.
+    2. Ở độ phân giải gốc, thử mọi góc với tỉ lệ lân cận của từng ứng viên, chỉ
+       trong ROI quanh ứng viên.
+
+    Phần quét toàn ảnh chỉ chạy trên ảnh thu nhỏ 4^levels lần diện tích với
+    1/coarse_stride số góc, nên chi phí chỉ bằng vài lần quét tỉ lệ không xoay
+    thay vì tăng tuyến tính theo số góc. Tầng thô chỉ dùng để chọn vị trí: góc
+    tốt nhất ở đó thường lệch xa góc thật.
+
+    Args:
+        image_pyramid (list): Kim tự tháp ảnh từ `_build_image_pyramid`.
+        rotated_cells (Mapping): (angle_idx, scale_idx) -> (rotated_template, rotated_mask).
+        angles (list): Các góc xoay (độ), tăng dần.
+        scales (list): Các tỉ lệ.
+
+    Returns:
+        dict hoặc None: Cùng định dạng với `_linear_scale_search`, thêm 'angle';
+                        'dimensions' là kích thước hộp bao của template đã xoay.
+    """
+    image_height, image_width = image_pyramid[0].shape[:2]
+    n_angles = len(angles)
+
+    def fits(cell):
+        template = rotated_cells[cell][0]
+        return template.shape[0] <= image_height and template.shape[1] <= image_width
+
+    coarse_angle_indices = list(range(0, n_angles, max(1, coarse_stride)))
+    coarse_cells = [(angle_idx, scale_idx) for angle_idx in coarse_angle_indices for scale_idx in range(len(scales))]
+    coarse_cells = [cell for cell in coarse_cells if fits(cell)]
+    if not coarse_cells:
+        return None
+
+    smallest_side = min(min(rotated_cells[cell][0].shape[:2]) for cell in coarse_cells)
+    levels = len(image_pyramid) - 1
+    while levels > 0 and smallest_side / (2 ** levels) < min_template_size:
+        levels -= 1
+    coarse_image = image_pyramid[levels]
+
+    # Bước 1: quét toàn ảnh ở tầng thô với các góc thô
+    found = []
+    for cell in coarse_cells:
+        coarse_template, coarse_mask = _downscale_template(*rotated_cells[cell], levels)
+        if coarse_template.shape[0] > coarse_image.shape[0] or coarse_template.shape[1] > coarse_image.shape[1]:
+            continue
+        try:
+            with span('matchTemplate', angle=angles[cell[0]], level=levels):
+                correlation_map = cv2.matchTemplate(coarse_image, coarse_template, match_method, mask=coarse_mask)
+        except cv2.error as e:
+            logger.warning("Lỗi khi thực hiện template matching với góc %s: %s", angles[cell[0]], e)
+            continue
+        xs, ys, scores = find_peaks(correlation_map, candidates)
+        for x, y, correlation in zip(xs, ys, scores):
+            center = (x + coarse_template.shape[1] / 2, y + coarse_template.shape[0] / 2)
+            found.append((float(correlation), cell, center))
+    # Giữ `candidates` vị trí khác nhau: nhiều ô (góc, tỉ lệ) cùng khớp một đỉnh sai
+    # mạnh sẽ chiếm hết chỗ của đối tượng thật nếu chỉ lấy theo điểm
+    distinct = []
+    for item in sorted(found, key=lambda item: item[0], reverse=True):
+        center = item[2]
+        if all(max(abs(center[0] - other[2][0]), abs(center[1] - other[2][1])) > margin for other in distinct):
+            distinct.append(item)
+            if len(distinct) == candidates:
+                break
+
+    # Bước 2: ở độ phân giải gốc, thử mọi góc với tỉ lệ lân cận trong ROI quanh
+    # từng ứng viên; so khớp trong ROI rẻ hơn quét toàn ảnh hàng trăm lần
+    best_match = None
+    factor = 2 ** levels
+    full_image = image_pyramid[0]
+    for _, (_, scale_idx), center in distinct:
+        for angle_idx in range(n_angles):
+            for neighbour_scale in range(max(0, scale_idx - 1), min(len(scales), scale_idx + 2)):
+                cell = (angle_idx, neighbour_scale)
+                if not fits(cell):
+                    continue
+                rotated_template, rotated_mask = rotated_cells[cell]
+                match = _match_around(full_image, (center[0] * factor, center[1] * factor), rotated_template,
+                                      rotated_mask, margin * factor, match_method)
+                if match is not None and (best_match is None or match[0] > best_match['correlation']):
+                    best_match = {
+                        'location': match[1],
+                        'dimensions': (rotated_template.shape[1], rotated_template.shape[0]),
+                        'scale': float(scales[cell[1]]),
+                        'angle': float(angles[cell[0]]),
+                        'correlation': match[0],
+                    }
+    return best_match
+
+
+def _color_histogram(image, mask, bins):
+    """
+    Histogram màu (hoặc mức xám) `bins` ngăn mỗi kênh, chuẩn hóa tổng bằng 1.
+    """
+    channels = list(range(1 if len(image.shape) == 2 else image.shape[2]))
+    histogram = cv2.calcHist([image], channels, mask, [bins] * len(channels), [0, 256] * len(channels))
+    return histogram / max(float(histogram.sum()), 1.0)
+
+
+def _backprojection_map(image_for_matching, image_histogram, template_for_matching, template_mask, bins):
+    """
+    Chiếu ngược tỉ lệ histogram (Swain & Ballard): mỗi pixel nhận
+    min(H_template / H_image, 1) của ngăn màu chứa nó, nên màu phổ biến trên nền
+    bị hạ điểm còn màu đặc trưng của template được giữ. Histogram template chỉ
+    tính trên các pixel thuộc mặt nạ.
+
+    Returns:
+        numpy.ndarray: Bản đồ float32 trong [0, 1], cùng kích thước với ảnh.
+    """
+    binary_template_mask = (template_mask > 0).astype(np.uint8)
+    template_histogram = _color_histogram(template_for_matching, binary_template_mask, bins)
+    ratio = np.minimum(template_histogram / np.maximum(image_histogram, 1e-12), 1.0).astype(np.float32)
+    # Tra bảng bằng NumPy: cv2.calcBackProject đọc sai histogram nhiều chiều
+    # truyền từ Python (mảng (b, b, b) được chuyển thành Mat 2 chiều nhiều kênh)
+    bin_indices = (image_for_matching.astype(np.uint16) * bins) >> 8
+    if len(image_for_matching.shape) == 3:
+        flat_indices = np.zeros(image_for_matching.shape[:2], dtype=np.intp)
+        for channel in range(image_for_matching.shape[2]):
+            flat_indices = flat_indices * bins + bin_indices[:, :, channel]
+    else:
+        flat_indices = bin_indices
+    return ratio.ravel()[flat_indices]
+
+
+def _prefilter_windows(image_for_matching, image_histogram, template_for_matching, template_mask, scales,
+                       template_idx=0, n_candidates=20, bins=32, margin=0.25):
+    """
+    Chọn các cửa sổ ứng viên cho một template bằng chiếu ngược histogram.
+
+    Điểm của mỗi vị trí là giá trị trung bình của bản đồ chiếu ngược trong cửa
+    sổ cỡ template ở tỉ lệ giữa, tính cho mọi vị trí bằng ảnh tích phân (bốn
+    phép cộng trừ mỗi vị trí, không phụ thuộc kích thước cửa sổ). `n_candidates`
+    cực đại địa phương tốt nhất được mở rộng thành vùng tìm kiếm đủ chứa template
+    ở tỉ lệ lớn nhất cộng lề `margin` (tương đối với cạnh lớn nhất của nó).
+
+    Returns:
+        numpy.ndarray: Mảng `DETECTION_DTYPE`; 'xyxy' là vùng tìm kiếm, 'score'
+                       là điểm chiếu ngược, 'scale' là tỉ lệ giữa.
+    """
+    image_height, image_width = image_for_matching.shape[:2]
+    template_height, template_width = template_for_matching.shape[:2]
+    window_scale = float(np.sqrt(min(scales) * max(scales)))
+    window_width = min(image_width, max(1, round(template_width * window_scale)))
+    window_height = min(image_height, max(1, round(template_height * window_scale)))
+
+    backprojection = _backprojection_map(image_for_matching, image_histogram, template_for_matching,
+                                         template_mask, bins)
+    integral = cv2.integral(backprojection, sdepth=cv2.CV_64F)
+    window_sums = (integral[window_height:, window_width:] - integral[:-window_height, window_width:]
+                   - integral[window_height:, :-window_width] + integral[:-window_height, :-window_width])
+    window_scores = (window_sums / (window_width * window_height)).astype(np.float32)
+
+    neighborhood = max(3, min(window_width, window_height) // 2 * 2 + 1)
+    xs, ys, scores = find_peaks(window_scores, n_candidates, neighborhood=neighborhood)
+
+    largest_width = round(template_width * max(scales))
+    largest_height = round(template_height * max(scales))
+    pad = int(np.ceil(margin * max(largest_width, largest_height)))
+    centers_x = xs + window_width / 2
+    centers_y = ys + window_height / 2
+    x0 = np.clip(np.floor(centers_x - largest_width / 2) - pad, 0, image_width).astype(np.int32)
+    y0 = np.clip(np.floor(centers_y - largest_height / 2) - pad, 0, image_height).astype(np.int32)
+    x1 = np.clip(np.ceil(centers_x + largest_width / 2) + pad, 0, image_width).astype(np.int32)
+    y1 = np.clip(np.ceil(centers_y + largest_height / 2) + pad, 0, image_height).astype(np.int32)
+
+    windows = np.empty(len(scores), dtype=DETECTION_DTYPE)
+    windows['template_idx'] = template_idx
+    windows['scale'] = window_scale
+    windows['score'] = scores
+    windows['xyxy'] = np.stack([x0, y0, x1, y1], axis=1)
+    return windows
+
+
+def _windowed_scale_search(image_for_matching, scaled_templates, windows, match_method):
+    """
+    Quét tuyến tính mọi tỉ lệ nhưng chỉ trong các vùng ứng viên của bộ lọc sơ bộ.
+
+    Returns:
+        dict hoặc None: Cùng định dạng với `_linear_scale_search`.
+    """
+    scaled_templates = list(scaled_templates)
+    scale_matches = []
+    for x0, y0, x1, y1 in windows['xyxy'].tolist():
+        roi = image_for_matching[y0:y1, x0:x1]
+        for scale, scaled_template, scaled_mask in scaled_templates:
+            if scaled_template.shape[0] > roi.shape[0] or scaled_template.shape[1] > roi.shape[1]:
+                continue
+            match = _match_single_scale(roi, scaled_template, scaled_mask, scale, match_method)
+            if match is not None:
+                match['location'] = (x0 + match['location'][0], y0 + match['location'][1])
+            scale_matches.append(match)
+    return _select_best_match(scale_matches)
+
+
+_WORKER_STATE = {}
+
+
+def _init_match_worker(image_for_matching, image_pyramid, opencv_threads):
+    """
+    Khởi tạo tiến trình con: giữ ảnh đích trong bộ nhớ của tiến trình (gửi một lần
+    thay vì theo từng job) và giới hạn số luồng nội bộ của OpenCV.
+    """
+    cv2.setNumThreads(opencv_threads)
+    _WORKER_STATE['image'] = image_for_matching
+    _WORKER_STATE['pyramid'] = image_pyramid
+
+
+def _worker_images(images):
+    """
+    Trả về (image_for_matching, image_pyramid) của job. Trong tiến trình con,
+    ảnh đích lấy từ trạng thái đã khởi tạo bởi `_init_match_worker`.
+    """
+    if images is None:
+        return _WORKER_STATE['image'], _WORKER_STATE['pyramid']
+    return images
+
+
+def _scale_job(scaled_template, scaled_mask, scale, match_method, images=None):
+    """
+    Job (template, tỉ lệ) cho executor.
+    """
+    image_for_matching, _ = _worker_images(images)
+    return _match_single_scale(image_for_matching, scaled_template, scaled_mask, scale, match_method)
+
+
+def _pyramid_job(scaled_templates, match_method, pyramid_candidates, pyramid_margin, images=None):
+    """
+    Job tìm kiếm kim tự tháp cho một template (mọi tỉ lệ) cho executor.
+    """
+    _, image_pyramid = _worker_images(images)
+    return _pyramid_scale_search(image_pyramid, scaled_templates, match_method, pyramid_candidates,
+                                 pyramid_margin)
+
+
+def _adaptive_job(template_for_matching, template_mask, scale_range, match_method, coarse_steps,
+                  scale_tolerance, early_exit_correlation, images=None):
+    """
+    Job tìm tỉ lệ thích nghi cho một template cho executor.
+    """
+    image_for_matching, _ = _worker_images(images)
+    return _adaptive_scale_search(image_for_matching, template_for_matching, template_mask, scale_range,
+                                  match_method, coarse_steps, scale_tolerance, early_exit_correlation)
+
+
+@contextmanager
+def _limit_opencv_threads(n_threads):
+    """
+    Tạm thời đặt số luồng nội bộ của OpenCV, khôi phục giá trị cũ khi kết thúc.
+    """
+    previous_threads = cv2.getNumThreads()
+    cv2.setNumThreads(n_threads)
+    try:
+        yield
+    finally:
+        cv2.setNumThreads(previous_threads)
+
+
+def _create_executor(executor, n_workers, opencv_threads, image_for_matching, image_pyramid):
+    """
+    Tạo thread pool hoặc process pool cho các job matching.
+    """
+    if executor == 'thread':
+        return ThreadPoolExecutor(max_workers=n_workers)
+    if executor == 'process':
+        return ProcessPoolExecutor(max_workers=n_workers, initializer=_init_match_worker,
+                                   initargs=(image_for_matching, image_pyramid, opencv_threads))
+    raise ValueError(f"executor không hợp lệ: {executor!r}. Chỉ hỗ trợ 'thread' hoặc 'process'.")
+
+
+def _parallel_search(template_jobs, image_for_matching, image_pyramid, executor, n_workers):
+    """
+    Phân phối các job lên executor. `template_jobs` chứa, cho mỗi template, danh
+    sách các (job_function, args): một job cho mỗi tỉ lệ khi quét tuyến tính,
+    hoặc một job cho cả template ở chế độ kim tự tháp/thích nghi. Kết quả được
+    gom theo đúng thứ tự nộp job nên trùng khớp với đường thực thi tuần tự.
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    opencv_threads = max(1, (os.cpu_count() or 1) // n_workers)
+    # Tiến trình con đã có sẵn ảnh đích; thread dùng chung bộ nhớ nên truyền trực tiếp
+    shared_images = (image_for_matching, image_pyramid) if executor == 'thread' else None
+
+    with _limit_opencv_threads(opencv_threads), \
+            _create_executor(executor, n_workers, opencv_threads, image_for_matching, image_pyramid) as pool:
+        futures = [
+            [pool.submit(job_function, *args, shared_images) for job_function, args in jobs]
+            for jobs in template_jobs
+        ]
+        return [_select_best_match(future.result() for future in template_futures)
+                for template_futures in futures]
+
+
+def _prepared_templates(templates, bank, template_indices, image_for_matching, threshold_value):
+    """
+    (template_for_matching, template_mask) ở kích thước gốc cho từng template:
+    lấy từ TemplateBank nếu cùng ngưỡng mặt nạ, ngược lại tính lại.
+    """
+    grayscale = len(image_for_matching.shape) == 2
+    if bank is not None and bank.threshold_value == threshold_value:
+        return [(bank.template(idx, grayscale), bank.mask(idx)) for idx in template_indices]
+    return [_prepare_template_for_matching(templates[idx], image_for_matching, threshold_value)
+            for idx in template_indices]
+
+
+def prefilter_candidate_windows(image, templates, scale_range=(0.5, 1.0), scale_steps=10, threshold_value=200,
+                                n_candidates=20, bins=32, margin=0.25):
+    """
+    Bộ lọc sơ bộ rẻ tiền trước matchTemplate có mặt nạ: chọn các vùng ứng viên
+    của từng template bằng chiếu ngược histogram màu (chỉ lấy pixel thuộc mặt
+    nạ) và điểm trung bình theo cửa sổ tính bằng ảnh tích phân.
+
+    `linear_multiscale_template_matching(prefilter=True)` chỉ chạy matchTemplate
+    trong các vùng này. Hàm được tách riêng để đo recall của bộ lọc so với ground
+    truth (xem `src.evaluation.metrics.window_recall`) khi chỉnh tham số.
+
+    Args:
+        image (numpy.ndarray): Ảnh đích.
+        templates (list hoặc TemplateBank): Danh sách template hoặc TemplateBank.
+        scale_range (tuple, optional): Khoảng tỉ lệ. Mặc định (0.5, 1.0).
+        scale_steps (int, optional): Số tỉ lệ. Mặc định 10.
+        threshold_value (int, optional): Ngưỡng tạo mặt nạ. Mặc định 200.
+        n_candidates (int, optional): Số vùng ứng viên mỗi template. Mặc định 20.
+        bins (int, optional): Số ngăn histogram mỗi kênh màu. Mặc định 32.
+        margin (float, optional): Lề của vùng tìm kiếm, tương đối với cạnh lớn nhất
+                                  của template ở tỉ lệ lớn nhất. Mặc định 0.25.
+
+    Returns:
+        numpy.ndarray: Mảng `DETECTION_DTYPE`, 'xyxy' là vùng tìm kiếm (x1, y1, x2, y2).
+    """
+    scales = np.linspace(scale_range[0], scale_range[1], scale_steps)
+    bank = templates if isinstance(templates, TemplateBank) else None
+    if bank is not None:
+        templates = bank.templates
+    image_for_matching = prepare_image_for_matching(image, templates)
+    template_indices = [idx for idx, template in enumerate(templates) if template is not None]
+    prepared_templates = _prepared_templates(templates, bank, template_indices, image_for_matching, threshold_value)
+
+    image_histogram = _color_histogram(image_for_matching, None, bins)
+    windows = [
+        _prefilter_windows(image_for_matching, image_histogram, template_for_matching, template_mask, scales,
+                           template_idx, n_candidates, bins, margin)
+        for template_idx, (template_for_matching, template_mask) in zip(template_indices, prepared_templates)
+    ]
+    return np.concatenate(windows) if windows else empty_detections()
+
+
+@traced()
 def linear_multiscale_template_matching(image, templates, scale_range=(0.5, 1.0), scale_steps=10, 
-                                       threshold_value=200, match_method=cv2.TM_CCOEFF_NORMED):
+                                       threshold_value=200, match_method=cv2.TM_CCOEFF_NORMED,
+                                       pyramid_levels=0, pyramid_candidates=3, pyramid_margin=4,
+                                       executor=None, n_workers=None, backend='opencv', fft_batch_size=4,
+                                       scale_search='linear', adaptive_coarse_steps=5, scale_tolerance=0.01,
+                                       early_exit_correlation=None, angles=None, angle_coarse_stride=2,
+                                       angle_candidates=40, angle_levels=1, prefilter=False,
+                                       prefilter_candidates=20, prefilter_bins=32, prefilter_margin=0.25,
+                                       draw=True, workspace=None, return_details=False):
     """
     Thực hiện template matching với nhiều tỉ lệ khác nhau để tìm đối tượng trong ảnh.
     
     Hàm này tìm kiếm các đối tượng trong ảnh dựa trên một tập các template, bằng cách 
     thử nhiều tỉ lệ khác nhau cho mỗi template. Mặt nạ nhị phân được tạo ra để loại bỏ 
     nền của các template, cải thiện độ chính xác khi so khớp.
+
+    Khi `pyramid_levels > 0`, hàm dùng chế độ kim tự tháp (thô-đến-tinh): matching
+    toàn ảnh chỉ được thực hiện trên ảnh thu nhỏ 2^pyramid_levels lần, sau đó các
+    ứng viên tốt nhất được tinh chỉnh trong vùng ROI nhỏ ở từng tầng cao hơn.
+    Nếu đỉnh tương quan thật nằm trong số ứng viên ở tầng thô, kết quả (vị trí,
+    tỉ lệ, độ tương đồng) trùng với chế độ quét tuyến tính; sai lệch vị trí khi
+    đó bị giới hạn bởi `pyramid_margin` pixel ở mỗi tầng.
+
+    Khi `executor` được chọn ('thread' hoặc 'process'), các job (template, tỉ lệ)
+    được phân phối lên `n_workers` worker; số luồng nội bộ của OpenCV được giới
+    hạn ở cpu_count // n_workers để tránh tranh chấp CPU. Kết quả giống hệt
+    đường thực thi tuần tự.
+
+    Khi `backend='fft'`, độ tương quan chuẩn hóa có mặt nạ được tính trong miền
+    tần số bằng NumPy (xem `FFTCorrelationEngine`): phổ của ảnh chỉ tính một lần
+    và dùng lại cho mọi template, mọi tỉ lệ. Chỉ hỗ trợ cv2.TM_CCOEFF_NORMED và
+    cv2.TM_CCORR_NORMED ở chế độ quét tuyến tính tuần tự; có lợi nhất khi
+    template lớn.
+
+    Khi `scale_search='adaptive'`, thay vì quét đều `scale_steps` tỉ lệ, hàm quét
+    thô `adaptive_coarse_steps` tỉ lệ rồi tinh chỉnh cục bộ quanh đỉnh tương quan
+    (nội suy parabol / golden-section) tới độ chính xác `scale_tolerance`, với ít
+    lần gọi matchTemplate hơn. Tỉ lệ làm template lớn hơn ảnh bị bỏ qua và tìm
+    kiếm dừng sớm khi độ tương đồng đạt `early_exit_correlation`.
+
+    Khi `angles` được đặt (ví dụ np.arange(0, 360, 10)), đối tượng được tìm ở mọi
+    góc xoay trong `angles` và mọi tỉ lệ. Template xoay được lấy từ TemplateBank
+    nếu bank đã tiền xử lý đúng các góc (`TemplateBank(..., angles=angles)`), ngược
+    lại được xoay khi cần. Lưới (góc, tỉ lệ) được tìm thô-đến-tinh: chỉ mỗi
+    `angle_coarse_stride` góc một được quét toàn ảnh, trên ảnh thu nhỏ
+    2^angle_levels lần; tại `angle_candidates` vị trí tốt nhất, mọi góc với tỉ
+    lệ lân cận được thử trong ROI ở độ phân giải gốc. Chi phí vì thế chỉ bằng vài
+    lần quét không xoay thay vì len(angles) lần.
+
+    Khi `prefilter=True`, một bộ lọc sơ bộ rẻ tiền (chiếu ngược histogram màu của
+    các pixel thuộc mặt nạ, điểm theo cửa sổ bằng ảnh tích phân, xem
+    `prefilter_candidate_windows`) chọn `prefilter_candidates` vùng ứng viên cho
+    mỗi template; matchTemplate có mặt nạ chỉ chạy trong các vùng đó thay vì
+    trên toàn ảnh. Đối tượng nằm ngoài mọi vùng ứng viên sẽ bị bỏ sót, nên cần
+    đo recall của bộ lọc khi chỉnh tham số: trên ảnh mẫu có ground truth, 10
+    vùng bỏ sót đối tượng còn 15 trở lên thì không (mặc định 20 để có dư).
+
+    Khi `workspace` là một `MatchWorkspace`, ảnh xám, template/mặt nạ đã scale và
+    bản đồ tương quan được ghi vào các bộ đệm dùng lại qua tham số `dst`/`result`
+    của OpenCV thay vì cấp phát mới cho mỗi (template, tỉ lệ); truyền cùng một
+    workspace qua nhiều lần gọi để không cấp phát cả giữa các ảnh. Kết hợp với
+    `draw=False` (không sao chép ảnh để vẽ), vòng lặp tỉ lệ không cấp phát mảng
+    lớn nào. Chỉ hỗ trợ quét tuyến tính tuần tự bằng OpenCV.
     
     Args:
         image (numpy.ndarray): Ảnh đích để tìm kiếm các đối tượng.
-        templates (list): Danh sách các ảnh template dùng để tìm kiếm.
+        templates (list hoặc TemplateBank): Danh sách các ảnh template dùng để tìm kiếm,
+                                            hoặc một TemplateBank đã tiền xử lý sẵn
+                                            (được dùng trực tiếp nếu cùng dãy tỉ lệ
+                                            và ngưỡng mặt nạ).
         scale_range (tuple, optional): Khoảng tỉ lệ (min, max) để thay đổi kích thước template.
                                        Mặc định là (0.5, 1.0) - từ 50% đến 100% kích thước gốc.
         scale_steps (int, optional): Số bước tỉ lệ sẽ được thử. Mặc định là 10.
         threshold_value (int, optional): Giá trị ngưỡng để tạo mặt nạ. Mặc định là 200.
         match_method (int, optional): Phương pháp so khớp template của OpenCV.
                                       Mặc định là cv2.TM_CCOEFF_NORMED.
+        pyramid_levels (int, optional): Số tầng kim tự tháp. 0 là quét tuyến tính
+                                        toàn phân giải như cũ. Mặc định là 0.
+        pyramid_candidates (int, optional): Số ứng viên giữ lại ở tầng thô cho mỗi
+                                            tỉ lệ của template. Mặc định là 3.
+        pyramid_margin (int, optional): Lề (pixel) của vùng ROI quanh mỗi ứng viên
+                                        khi tinh chỉnh ở tầng cao hơn. Mặc định là 4.
+        executor (str, optional): 'thread', 'process' hoặc None (tuần tự). Mặc định là None.
+        n_workers (int, optional): Số worker của executor. Mặc định là os.cpu_count().
+        backend (str, optional): 'opencv' (cv2.matchTemplate) hoặc 'fft'. Mặc định là 'opencv'.
+        fft_batch_size (int, optional): Số (template, tỉ lệ) mỗi lô của FFT backend.
+                                        Mặc định là 4.
+        scale_search (str, optional): 'linear' (quét đều) hoặc 'adaptive'. Mặc định là 'linear'.
+        adaptive_coarse_steps (int, optional): Số tỉ lệ quét thô ở chế độ thích nghi.
+                                               Mặc định là 5.
+        scale_tolerance (float, optional): Độ chính xác tỉ lệ (độ rộng khoảng kẹp)
+                                           để dừng tinh chỉnh. Mặc định là 0.01.
+        early_exit_correlation (float, optional): Ngưỡng độ tương đồng để dừng sớm.
+                                                  Mặc định là None (không dừng sớm).
+        angles (iterable, optional): Các góc xoay (độ, tăng dần) cần tìm. Mặc định
+                                     là None (không xoay).
+        angle_coarse_stride (int, optional): Bước góc của lần quét thô. Mặc định là 2.
+        angle_candidates (int, optional): Số vị trí ứng viên được tinh chỉnh. Mặc định là 40.
+        angle_levels (int, optional): Số tầng kim tự tháp của lần quét thô. Mặc định là 1.
+        prefilter (bool, optional): Bật bộ lọc sơ bộ. Mặc định là False.
+        prefilter_candidates (int, optional): Số vùng ứng viên mỗi template. Mặc định là 20.
+        prefilter_bins (int, optional): Số ngăn histogram mỗi kênh màu. Mặc định là 32.
+        prefilter_margin (float, optional): Lề của vùng ứng viên, tương đối với cạnh
+                                            lớn nhất của template. Mặc định là 0.25.
+        draw (bool, optional): Vẽ kết quả lên một bản sao của ảnh. Nếu False, không
+                               sao chép ảnh và result_image là None. Mặc định là True.
+        workspace (MatchWorkspace, optional): Bộ đệm dùng lại. Mặc định là None.
+        return_details (bool, optional): Nếu True, trả thêm danh sách chi tiết kết
+                                         quả cho từng template. Mặc định là False.
     
+    Raises:
+        ValueError: Nếu `executor` không phải 'thread', 'process' hoặc None, nếu
+                    `backend`/`scale_search` không hợp lệ, hoặc kết hợp các chế độ
+                    không được hỗ trợ (FFT backend với executor, kim tự tháp hay
+                    phương pháp so khớp khác; tìm tỉ lệ thích nghi với kim tự tháp
+                    hay FFT backend; tìm có xoay với chế độ khác quét tuyến tính
+                    tuần tự bằng OpenCV hoặc với cv2.TM_SQDIFF/cv2.TM_SQDIFF_NORMED;
+                    bộ lọc sơ bộ hoặc workspace với chế độ khác quét tuyến tính tuần
+                    tự bằng OpenCV).
+
     Returns:
         tuple: Gồm hai phần tử:
                - result_image (numpy.ndarray): Ảnh gốc được vẽ thêm các hình chữ nhật 
-                                              xung quanh các đối tượng tìm thấy.
+                                              xung quanh các đối tượng tìm thấy
+                                              (None khi `draw=False`).
                - match_locations (list): Danh sách các vị trí (góc trên bên trái) của 
                                         các đối tượng đã tìm thấy.
+               Khi `return_details=True` có thêm phần tử thứ ba:
+               - match_details (list): Danh sách các dict gồm 'template_idx',
+                 'location', 'dimensions', 'scale', 'correlation' (và 'angle'
+                 khi tìm có xoay).
     
     Example:
         templates = get_template("template_folder/")
@@ -63,71 +1074,446 @@ def linear_multiscale_template_matching(image, templates, scale_range=(0.5, 1.0)
         plt.imshow(cv2.cvtColor(result_image, cv2.COLOR_BGR2RGB))
         plt.show()
     """
-    result_image = image.copy()
+    if backend not in ('opencv', 'fft'):
+        raise ValueError(f"backend không hợp lệ: {backend!r}. Chỉ hỗ trợ 'opencv' hoặc 'fft'.")
+    if backend == 'fft' and (executor is not None or pyramid_levels > 0):
+        raise ValueError("FFT backend chỉ hỗ trợ quét tuyến tính tuần tự (executor=None, pyramid_levels=0).")
+    if backend == 'fft' and match_method not in SUPPORTED_FFT_METHODS:
+        raise ValueError("FFT backend chỉ hỗ trợ cv2.TM_CCOEFF_NORMED và cv2.TM_CCORR_NORMED.")
+    if scale_search not in ('linear', 'adaptive'):
+        raise ValueError(f"scale_search không hợp lệ: {scale_search!r}. Chỉ hỗ trợ 'linear' hoặc 'adaptive'.")
+    if scale_search == 'adaptive' and (backend == 'fft' or pyramid_levels > 0):
+        raise ValueError("Tìm tỉ lệ thích nghi không hỗ trợ FFT backend hoặc chế độ kim tự tháp.")
+    if angles is not None and (backend == 'fft' or pyramid_levels > 0 or scale_search != 'linear'
+                               or executor is not None):
+        raise ValueError("Tìm có xoay chỉ hỗ trợ quét tuyến tính tuần tự bằng OpenCV "
+                         "(backend='opencv', pyramid_levels=0, scale_search='linear', executor=None).")
+    if angles is not None and match_method in (cv2.TM_SQDIFF, cv2.TM_SQDIFF_NORMED):
+        raise ValueError("Tìm có xoay chỉ hỗ trợ các phương pháp có giá trị lớn là tốt.")
+    if prefilter and (backend == 'fft' or pyramid_levels > 0 or scale_search != 'linear' or executor is not None
+                      or angles is not None):
+        raise ValueError("Bộ lọc sơ bộ chỉ hỗ trợ quét tuyến tính tuần tự bằng OpenCV "
+                         "(backend='opencv', pyramid_levels=0, scale_search='linear', executor=None, angles=None).")
+    if workspace is not None and (backend == 'fft' or pyramid_levels > 0 or scale_search != 'linear'
+                                  or executor is not None or angles is not None or prefilter):
+        raise ValueError("Workspace chỉ hỗ trợ quét tuyến tính tuần tự bằng OpenCV "
+                         "(backend='opencv', pyramid_levels=0, scale_search='linear', executor=None, angles=None, "
+                         "prefilter=False).")
+    
+    result_image = image.copy() if draw else None
     
     scales = np.linspace(scale_range[0], scale_range[1], scale_steps)
     
     match_locations = []
+    match_details = []
     
-   
-    if len(image.shape) == 3 and templates and len(templates[0].shape) == 2:
-        image_for_matching = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        image_for_matching = image
+    bank = templates if isinstance(templates, TemplateBank) else None
+    if bank is not None:
+        templates = bank.templates
     
-    for template in templates:
-        if template is None:
-            continue
-            
-        # Chuẩn bị template cho matching
-        # Nếu template là ảnh màu (3 kênh), cần tạo mặt nạ từ ảnh xám
-        if len(template.shape) == 3:
-            # Tạo mặt nạ nhị phân từ template
-            gray_template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
-            _, template_mask = cv2.threshold(gray_template, threshold_value, 255, cv2.THRESH_BINARY_INV)
-            
-            if len(image_for_matching.shape) == 2:
-                template_for_matching = gray_template
+    with span('prepare_image', pyramid_levels=pyramid_levels):
+        image_for_matching = prepare_image_for_matching(image, templates, workspace)
+        image_pyramid = _build_image_pyramid(image_for_matching, pyramid_levels) if pyramid_levels > 0 else None
+    record_allocation('image_for_matching', image_for_matching)
+    
+    # Chuẩn bị template cho matching: dùng bản tiền xử lý sẵn trong bank nếu khớp tham số
+    grayscale = len(image_for_matching.shape) == 2
+    template_indices = [idx for idx, template in enumerate(templates) if template is not None]
+    if workspace is not None:
+        # Bộ đệm đủ cho bản đồ và template lớn nhất, cấp phát một lần trước vòng lặp
+        workspace.reserve('correlation', image_for_matching.shape[0] * image_for_matching.shape[1], np.float32)
+        largest = max((int(np.prod(_scaled_shape(templates[idx].shape[:2], max(scales))))
+                       for idx in template_indices), default=0)
+        channels = 1 if len(image_for_matching.shape) == 2 else image_for_matching.shape[2]
+        workspace.reserve('template', largest * channels, np.uint8)
+        workspace.reserve('mask', largest, np.uint8)
+    
+    if angles is not None:
+        angles = [float(angle) for angle in angles]
+        rotation_pyramid = _build_image_pyramid(image_for_matching, angle_levels)
+        use_bank = (bank is not None and bank.threshold_value == threshold_value and bank.has_scales(scales)
+                    and bank.has_angles(angles))
+        best_matches = []
+        for idx in template_indices:
+            if use_bank:
+                rotated_cells = bank.rotated_templates(idx, grayscale=grayscale)
             else:
-                template_for_matching = template
+                rotated_cells = _RotatedCells(*_prepare_template_for_matching(templates[idx], image_for_matching,
+                                                                              threshold_value), scales, angles)
+            with span('template', template_idx=idx):
+                best_matches.append(_rotation_scale_search(rotation_pyramid, rotated_cells, angles, scales,
+                                                           match_method, angle_coarse_stride, angle_candidates,
+                                                           pyramid_margin))
+    elif scale_search == 'adaptive':
+        prepared_templates = _prepared_templates(templates, bank, template_indices, image_for_matching,
+                                                 threshold_value)
+        adaptive_args = (scale_range, match_method, adaptive_coarse_steps, scale_tolerance, early_exit_correlation)
+        if executor is not None:
+            template_jobs = [[(_adaptive_job, (template_for_matching, template_mask) + adaptive_args)]
+                             for template_for_matching, template_mask in prepared_templates]
+            best_matches = _parallel_search(template_jobs, image_for_matching, None, executor, n_workers)
         else:
-            template_mask = template.copy()
-            template_for_matching = template.copy()
-        
-        best_correlation = -1
-        best_location = None
-        best_dimensions = None
-        best_scale = None
+            best_matches = [
+                _adaptive_scale_search(image_for_matching, template_for_matching, template_mask, *adaptive_args)
+                for template_for_matching, template_mask in prepared_templates
+            ]
+    else:
+        scaled_template_sets = _build_scaled_template_sets(templates, bank, template_indices, image_for_matching,
+                                                           scales, threshold_value, workspace)
         
-        for scale in scales:
-            scaled_template = cv2.resize(template_for_matching, (0, 0), fx=scale, fy=scale)
-            scaled_mask = cv2.resize(template_mask, (scaled_template.shape[1], scaled_template.shape[0]))
-            
-            template_width, template_height = scaled_template.shape[1], scaled_template.shape[0]
-            
+        if prefilter:
+            image_histogram = _color_histogram(image_for_matching, None, prefilter_bins)
+            prepared_templates = _prepared_templates(templates, bank, template_indices, image_for_matching,
+                                                     threshold_value)
+            best_matches = []
+            for template_idx, (template_for_matching, template_mask), scaled_templates in zip(
+                    template_indices, prepared_templates, scaled_template_sets):
+                with span('template', template_idx=template_idx):
+                    with span('prefilter'):
+                        windows = _prefilter_windows(image_for_matching, image_histogram, template_for_matching,
+                                                     template_mask, scales, template_idx, prefilter_candidates,
+                                                     prefilter_bins, prefilter_margin)
+                    count('prefilter_windows', len(windows))
+                    best_matches.append(_windowed_scale_search(image_for_matching, scaled_templates, windows,
+                                                               match_method))
+        elif backend == 'fft':
+            best_matches = _fft_search(image_for_matching, scaled_template_sets, match_method, fft_batch_size)
+        elif executor is not None:
+            if image_pyramid is not None:
+                template_jobs = [[(_pyramid_job, (list(scaled_templates), match_method, pyramid_candidates,
+                                                  pyramid_margin))]
+                                 for scaled_templates in scaled_template_sets]
+            else:
+                template_jobs = [[(_scale_job, (scaled_template, scaled_mask, scale, match_method))
+                                  for scale, scaled_template, scaled_mask in scaled_templates]
+                                 for scaled_templates in scaled_template_sets]
+            best_matches = _parallel_search(template_jobs, image_for_matching, image_pyramid, executor, n_workers)
+        elif image_pyramid is not None:
+            best_matches = []
+            for template_idx, scaled_templates in zip(template_indices, scaled_template_sets):
+                with span('template', template_idx=template_idx):
+                    best_matches.append(_pyramid_scale_search(image_pyramid, scaled_templates, match_method,
+                                                              pyramid_candidates, pyramid_margin))
+        else:
+            best_matches = []
+            for template_idx, scaled_templates in zip(template_indices, scaled_template_sets):
+                with span('template', template_idx=template_idx):
+                    best_matches.append(_linear_scale_search(image_for_matching, scaled_templates, match_method,
+                                                             workspace))
+    
+    with span('draw'):
+        for template_idx, best_match in zip(template_indices, best_matches):
+            if best_match is not None:
+                top_left = best_match['location']
+                best_dimensions = best_match['dimensions']
+                bottom_right = (top_left[0] + best_dimensions[0], top_left[1] + best_dimensions[1])
+                if draw:
+                    cv2.rectangle(result_image, top_left, bottom_right, (0, 0, 255), 5)
+                match_locations.append(top_left)
+                match_details.append({'template_idx': template_idx, **best_match})
+    count('matches', len(match_details))
+    
+    if return_details:
+        return result_image, match_locations, match_details
+    return result_image, match_locations
+
+
+def _peak_neighborhood(scaled_template, peak_neighborhood):
+    """
+    Cạnh cửa sổ cực đại địa phương dùng cho một template đã scale.
+    """
+    template_height, template_width = scaled_template.shape[:2]
+    return peak_neighborhood or max(3, (min(template_height, template_width) // 2) | 1)
+
+
+def _peak_detections(template_idx, scale, scaled_template, correlation_map, negate, top_k, score_threshold,
+                     peak_neighborhood, offset=(0, 0), interior=None):
+    """
+    Lấy các đỉnh của một bản đồ tương quan và chuyển thành mảng `DETECTION_DTYPE`.
+
+    Args:
+        negate (bool): Đổi dấu bản đồ (phương pháp SQDIFF, giá trị nhỏ là tốt).
+        offset (tuple, optional): (x, y) cộng vào tọa độ, dùng khi bản đồ được
+                                  tính trên một vùng cắt (tile) của ảnh.
+        interior (tuple, optional): (x_min, y_min, x_max, y_max) trên bản đồ: chỉ
+                                    giữ các đỉnh nằm trong vùng này, trước khi lấy `top_k`.
+    """
+    if negate:
+        correlation_map = -correlation_map
+    template_height, template_width = scaled_template.shape[:2]
+    neighborhood = _peak_neighborhood(scaled_template, peak_neighborhood)
+    if interior is None:
+        xs, ys, scores = find_peaks(correlation_map, top_k, score_threshold, neighborhood)
+    else:
+        xs, ys, scores = find_peaks(correlation_map, None, score_threshold, neighborhood)
+        x_min, y_min, x_max, y_max = interior
+        keep = (xs >= x_min) & (xs <= x_max) & (ys >= y_min) & (ys <= y_max)
+        xs, ys, scores = xs[keep][:top_k], ys[keep][:top_k], scores[keep][:top_k]
+    return detections_from_peaks(template_idx, scale, (template_width, template_height),
+                                 xs + offset[0], ys + offset[1], scores)
+
+
+def multiscale_template_detection(image, templates, scale_range=(0.5, 1.0), scale_steps=10,
+                                  threshold_value=200, match_method=cv2.TM_CCOEFF_NORMED,
+                                  score_threshold=0.5, top_k=10, iou_threshold=0.3,
+                                  peak_neighborhood=None, backend='opencv', fft_batch_size=4):
+    """
+    Phát hiện nhiều thể hiện của mỗi template trong ảnh.
+
+    Khác với `linear_multiscale_template_matching` (chỉ giữ cực đại toàn cục của
+    mỗi template), hàm này lấy tối đa `top_k` đỉnh vượt `score_threshold` từ bản
+    đồ tương quan của mỗi (template, tỉ lệ) bằng phép toán vector NumPy, sau đó
+    gộp ứng viên trên mọi tỉ lệ bằng non-maximum suppression theo từng template.
+
+    Với cv2.TM_SQDIFF và cv2.TM_SQDIFF_NORMED (giá trị nhỏ là tốt), bản đồ được
+    đổi dấu nên điểm luôn theo quy ước "càng lớn càng tốt".
+
+    Args:
+        image (numpy.ndarray): Ảnh đích để tìm kiếm các đối tượng.
+        templates (list hoặc TemplateBank): Danh sách template hoặc TemplateBank.
+        scale_range (tuple, optional): Khoảng tỉ lệ (min, max). Mặc định là (0.5, 1.0).
+        scale_steps (int, optional): Số bước tỉ lệ. Mặc định là 10.
+        threshold_value (int, optional): Giá trị ngưỡng để tạo mặt nạ. Mặc định là 200.
+        match_method (int, optional): Phương pháp so khớp. Mặc định là cv2.TM_CCOEFF_NORMED.
+        score_threshold (float, optional): Điểm tối thiểu của một đỉnh. Mặc định là 0.5.
+        top_k (int, optional): Số đỉnh tối đa lấy từ mỗi bản đồ tương quan. Mặc định là 10.
+        iou_threshold (float, optional): Ngưỡng IoU của NMS. Mặc định là 0.3.
+        peak_neighborhood (int, optional): Cửa sổ cực đại địa phương (pixel). Mặc định là
+                                           nửa cạnh ngắn của template đã scale (số lẻ, ≥ 3).
+        backend (str, optional): 'opencv' hoặc 'fft'. Mặc định là 'opencv'.
+        fft_batch_size (int, optional): Kích thước lô của FFT backend. Mặc định là 4.
+
+    Returns:
+        numpy.ndarray: Mảng có cấu trúc kiểu `DETECTION_DTYPE` với các trường
+                       'template_idx', 'scale', 'score', 'xyxy' (x1, y1, x2, y2),
+                       sắp xếp giảm dần theo điểm.
+
+    Raises:
+        ValueError: Nếu `backend` không hợp lệ hoặc FFT backend không hỗ trợ `match_method`.
+
+    Example:
+        detections = multiscale_template_detection(input_image, templates, score_threshold=0.6)
+        for template_idx, scale, score, (x1, y1, x2, y2) in detections:
+            cv2.rectangle(input_image, (x1, y1), (x2, y2), (0, 0, 255), 2)
+    """
+    if backend not in ('opencv', 'fft'):
+        raise ValueError(f"backend không hợp lệ: {backend!r}. Chỉ hỗ trợ 'opencv' hoặc 'fft'.")
+    if backend == 'fft' and match_method not in SUPPORTED_FFT_METHODS:
+        raise ValueError("FFT backend chỉ hỗ trợ cv2.TM_CCOEFF_NORMED và cv2.TM_CCORR_NORMED.")
+
+    bank = templates if isinstance(templates, TemplateBank) else None
+    if bank is not None:
+        templates = bank.templates
+
+    scales = np.linspace(scale_range[0], scale_range[1], scale_steps)
+    image_for_matching = prepare_image_for_matching(image, templates)
+    template_indices = [idx for idx, template in enumerate(templates) if template is not None]
+    scaled_template_sets = _build_scaled_template_sets(templates, bank, template_indices, image_for_matching,
+                                                       scales, threshold_value)
+    negate = match_method in (cv2.TM_SQDIFF, cv2.TM_SQDIFF_NORMED)
+    engine = FFTCorrelationEngine(image_for_matching) if backend == 'fft' else None
+
+    def correlation_maps(scaled_templates):
+        if engine is not None:
+            scaled_templates = list(scaled_templates)
+            maps = engine.match([(scaled_template, scaled_mask) for _, scaled_template, scaled_mask in scaled_templates],
+                                match_method, batch_size=fft_batch_size)
+            yield from zip(scaled_templates, maps)
+            return
+        for scale, scaled_template, scaled_mask in scaled_templates:
             try:
-                correlation_map = cv2.matchTemplate(
-                    image_for_matching, 
-                    scaled_template, 
-                    match_method, 
-                    mask=scaled_mask
-                )
-                
-                _, max_correlation, _, max_location = cv2.minMaxLoc(correlation_map)
-                
-                if max_correlation > best_correlation:
-                    best_correlation = max_correlation
-                    best_location = max_location
-                    best_dimensions = (template_width, template_height)
-                    best_scale = scale
+                yield (scale, scaled_template, scaled_mask), cv2.matchTemplate(
+                    image_for_matching, scaled_template, match_method, mask=scaled_mask)
             except cv2.error as e:
-                print(f"Lỗi khi thực hiện template matching với scale {scale}: {e}")
+                logger.warning("Lỗi khi thực hiện template matching với scale %s: %s", scale, e)
+
+    raw_detections = []
+    for template_idx, scaled_templates in zip(template_indices, scaled_template_sets):
+        for (scale, scaled_template, _), correlation_map in correlation_maps(scaled_templates):
+            if correlation_map is None:
                 continue
-        
-        if best_location is not None:
-            top_left = best_location
-            bottom_right = (top_left[0] + best_dimensions[0], top_left[1] + best_dimensions[1])            
-            cv2.rectangle(result_image, top_left, bottom_right, (0, 0, 255), 5)            
-            match_locations.append(top_left)
-    
-    return result_image, match_locations
\ No newline at end of file
+            detections = _peak_detections(template_idx, scale, scaled_template, correlation_map, negate,
+                                          top_k, score_threshold, peak_neighborhood)
+            if len(detections):
+                raw_detections.append(detections)
+
+    if not raw_detections:
+        return empty_detections()
+    return non_max_suppression(np.concatenate(raw_detections), iou_threshold, per_template=True)
+
+
+# Ước lượng bộ nhớ đỉnh của một tile theo pixel (đo với cv2.matchTemplate có mặt nạ):
+# ~33 byte/kênh bộ đệm nội bộ của OpenCV, cộng bản sao tile, bản đồ tương quan
+# float32 và các mảng tạm của `find_peaks`.
+_TILE_BYTES_PER_CHANNEL = 36
+_TILE_BYTES_PER_PIXEL = 16
+
+
+def _tile_size_for_budget(memory_budget, channels, overlap):
+    """
+    Cạnh tile lớn nhất sao cho bộ nhớ xử lý một tile không vượt `memory_budget`.
+
+    Raises:
+        ValueError: Nếu ngân sách không đủ cho tile lớn hơn vùng chồng lấn.
+    """
+    bytes_per_pixel = channels * _TILE_BYTES_PER_CHANNEL + _TILE_BYTES_PER_PIXEL
+    tile_size = int(np.sqrt(memory_budget / bytes_per_pixel))
+    if tile_size <= overlap:
+        raise ValueError(f"memory_budget quá nhỏ: tile {tile_size}px không lớn hơn vùng chồng lấn {overlap}px.")
+    return tile_size
+
+
+def _iter_tiles(height, width, tile_size, overlap):
+    """
+    Sinh các tile (y0, x0, y1, x1) phủ ảnh, hai tile kề nhau chồng lên nhau
+    `overlap` pixel để mọi vị trí của template (cạnh cộng cửa sổ cực đại địa
+    phương ≤ overlap) nằm trọn trong ít nhất một tile.
+    """
+    step = tile_size - overlap
+    for y0 in range(0, max(height - overlap, 1), step):
+        for x0 in range(0, max(width - overlap, 1), step):
+            yield y0, x0, min(y0 + tile_size, height), min(x0 + tile_size, width)
+
+
+def _unique_detections(detections):
+    """
+    Gộp các phát hiện trùng (template, tỉ lệ, hộp), giữ bản có điểm cao nhất.
+
+    Hai tile chồng lấn tính lại cùng một vị trí trên hai vùng cắt khác nhau nên
+    điểm có thể lệch nhau ở vài chữ số cuối: `np.unique` trên cả bản ghi không
+    loại được chúng.
+    """
+    if len(detections) == 0:
+        return detections
+    xyxy = detections['xyxy']
+    order = np.lexsort((-detections['score'], xyxy[:, 3], xyxy[:, 2], xyxy[:, 1], xyxy[:, 0],
+                        detections['scale'], detections['template_idx']))
+    detections = detections[order]
+    first = np.ones(len(detections), dtype=bool)
+    first[1:] = ((detections['template_idx'][1:] != detections['template_idx'][:-1])
+                 | (detections['scale'][1:] != detections['scale'][:-1])
+                 | np.any(detections['xyxy'][1:] != detections['xyxy'][:-1], axis=1))
+    return detections[first]
+
+
+def _top_k_per_map(detections, top_k):
+    """
+    Giữ tối đa `top_k` phát hiện điểm cao nhất cho mỗi (template, tỉ lệ), như khi
+    lấy đỉnh trên bản đồ tương quan của toàn ảnh.
+    """
+    if top_k is None or len(detections) == 0:
+        return detections
+    detections = detections[np.lexsort((-detections['score'], detections['scale'], detections['template_idx']))]
+    new_map = np.ones(len(detections), dtype=bool)
+    new_map[1:] = ((detections['template_idx'][1:] != detections['template_idx'][:-1])
+                   | (detections['scale'][1:] != detections['scale'][:-1]))
+    map_start = np.maximum.accumulate(np.where(new_map, np.arange(len(detections)), 0))
+    return detections[np.arange(len(detections)) - map_start < top_k]
+
+
+def tiled_template_detection(scene, templates, scale_range=(0.5, 1.0), scale_steps=10, threshold_value=200,
+                             match_method=cv2.TM_CCOEFF_NORMED, score_threshold=0.5, top_k=10, iou_threshold=0.3,
+                             peak_neighborhood=None, memory_budget=256 * 2 ** 20, tile_size=None, draw=False):
+    """
+    Phát hiện template trên ảnh rất lớn theo từng tile, với bộ nhớ bị chặn.
+
+    Ảnh đích có thể là mảng memory-map (xem `src.utils.scene_io.open_scene`):
+    mỗi lần chỉ một tile được đọc vào RAM. Hai tile kề nhau chồng lên nhau một
+    khoảng bằng cạnh lớn nhất của template đã scale cộng cửa sổ cực đại địa
+    phương, nên mọi vị trí của template cùng cửa sổ quanh nó đều nằm trọn trong
+    ít nhất một tile. Mỗi tile chỉ giữ các đỉnh có cả cửa sổ nằm trong tile; các
+    phát hiện trùng ở vùng chồng lấn (cùng template, tỉ lệ và hộp; giữ bản có
+    điểm cao nhất) được gộp trước khi áp dụng `top_k` cho mỗi (template, tỉ lệ)
+    và non-maximum suppression, nên kết quả như `multiscale_template_detection`.
+
+    Args:
+        scene (numpy.ndarray): Ảnh đích (ndarray hoặc numpy.memmap), BGR hoặc xám.
+        templates (list hoặc TemplateBank): Danh sách template hoặc TemplateBank.
+        scale_range, scale_steps, threshold_value, match_method, score_threshold,
+        top_k, iou_threshold, peak_neighborhood: Như `multiscale_template_detection`.
+        memory_budget (int, optional): Ngân sách bộ nhớ (bytes) cho việc xử lý một
+                                       tile, dùng để chọn kích thước tile. Mặc định 256 MiB.
+        tile_size (int, optional): Cạnh tile (pixel), ghi đè `memory_budget`.
+        draw (bool, optional): Vẽ kết quả lên một bản sao của toàn bộ ảnh (cần bộ
+                               nhớ bằng kích thước ảnh). Mặc định False.
+
+    Returns:
+        numpy.ndarray: Mảng `DETECTION_DTYPE` theo tọa độ của toàn ảnh, sắp xếp
+                       giảm dần theo điểm. Khi `draw=True`, trả về tuple
+                       (detections, result_image).
+
+    Raises:
+        ValueError: Nếu tile không lớn hơn vùng chồng lấn.
+
+    Example:
+        scene = open_scene("scan.npy")
+        detections = tiled_template_detection(scene, bank, memory_budget=512 * 2 ** 20)
+    """
+    bank = templates if isinstance(templates, TemplateBank) else None
+    if bank is not None:
+        templates = bank.templates
+
+    scales = np.linspace(scale_range[0], scale_range[1], scale_steps)
+    # Chỉ cần số kênh của ảnh để chuẩn bị template: dùng một pixel thay cho cả ảnh
+    probe = prepare_image_for_matching(np.asarray(scene[:1, :1]), templates)
+    template_indices = [idx for idx, template in enumerate(templates) if template is not None]
+    scaled_template_sets = [
+        list(scaled_templates)
+        for scaled_templates in _build_scaled_template_sets(templates, bank, template_indices, probe, scales,
+                                                            threshold_value)
+    ]
+    # Vùng chồng lấn chứa được template lớn nhất cùng cửa sổ cực đại địa phương của nó
+    overlap = max(
+        (max(scaled_template.shape[:2]) + _peak_neighborhood(scaled_template, peak_neighborhood) - 1
+         for scaled_templates in scaled_template_sets for _, scaled_template, _ in scaled_templates),
+        default=0,
+    )
+    channels = scene.shape[2] if scene.ndim == 3 else 1
+    if tile_size is None:
+        tile_size = _tile_size_for_budget(memory_budget, channels, overlap)
+    elif tile_size <= overlap:
+        raise ValueError(f"tile_size ({tile_size}) phải lớn hơn vùng chồng lấn ({overlap}px: cạnh template "
+                         f"lớn nhất cộng cửa sổ cực đại địa phương).")
+
+    negate = match_method in (cv2.TM_SQDIFF, cv2.TM_SQDIFF_NORMED)
+    scene_height, scene_width = scene.shape[:2]
+    raw_detections = []
+    for y0, x0, y1, x1 in _iter_tiles(scene_height, scene_width, tile_size, overlap):
+        tile = prepare_image_for_matching(np.ascontiguousarray(scene[y0:y1, x0:x1]), templates)
+        for template_idx, scaled_templates in zip(template_indices, scaled_template_sets):
+            for scale, scaled_template, scaled_mask in scaled_templates:
+                if scaled_template.shape[0] > tile.shape[0] or scaled_template.shape[1] > tile.shape[1]:
+                    continue
+                try:
+                    correlation_map = cv2.matchTemplate(tile, scaled_template, match_method, mask=scaled_mask)
+                except cv2.error as e:
+                    logger.warning("Lỗi khi thực hiện template matching với scale %s: %s", scale, e)
+                    continue
+                # Ở mép tile (không phải mép ảnh), cửa sổ cực đại địa phương bị cắt nên
+                # cv2.dilate cho ra đỉnh giả: chỉ giữ đỉnh có cả cửa sổ nằm trong tile
+                radius = _peak_neighborhood(scaled_template, peak_neighborhood) // 2
+                map_height, map_width = correlation_map.shape[:2]
+                interior = (radius if x0 > 0 else 0, radius if y0 > 0 else 0,
+                            map_width - 1 - (radius if x1 < scene_width else 0),
+                            map_height - 1 - (radius if y1 < scene_height else 0))
+                detections = _peak_detections(template_idx, scale, scaled_template, correlation_map, negate,
+                                              top_k, score_threshold, peak_neighborhood, offset=(x0, y0),
+                                              interior=interior)
+                if len(detections):
+                    raw_detections.append(detections)
+        del tile
+
+    if raw_detections:
+        # Vùng chồng lấn cho ra cùng một hộp ở cả hai tile (điểm lệch nhau rất ít):
+        # gộp trước khi lấy top_k, nếu không bản trùng chiếm chỗ của đỉnh khác
+        detections = _top_k_per_map(_unique_detections(np.concatenate(raw_detections)), top_k)
+        detections = non_max_suppression(detections, iou_threshold, per_template=True)
+    else:
+        detections = empty_detections()
+    if not draw:
+        return detections
+
+    result_image = np.array(scene)
+    for x1, y1, x2, y2 in detections['xyxy']:
+        cv2.rectangle(result_image, (int(x1), int(y1)), (int(x2), int(y2)), (0, 0, 255), 5)
+    return detections, result_image
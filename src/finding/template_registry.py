@@ -0,0 +1,147 @@
+import logging
+import os
+import threading
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+
+# Cờ giải mã của OpenCV theo (grayscale, reduction). Giải mã giảm độ phân giải
+# nhanh nhất với JPEG (bỏ bớt hệ số DCT); định dạng khác được giải mã rồi thu nhỏ.
+_IMREAD_FLAGS = {
+    (False, 1): cv2.IMREAD_COLOR,
+    (False, 2): cv2.IMREAD_REDUCED_COLOR_2,
+    (False, 4): cv2.IMREAD_REDUCED_COLOR_4,
+    (False, 8): cv2.IMREAD_REDUCED_COLOR_8,
+    (True, 1): cv2.IMREAD_GRAYSCALE,
+    (True, 2): cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    (True, 4): cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    (True, 8): cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+
+class TemplateRegistry(Mapping):
+    """
+    Bộ template của một thư mục, truy cập theo tên (tên file bỏ đuôi).
+
+    Khi khởi tạo chỉ liệt kê thư mục; ảnh được giải mã khi truy cập lần đầu.
+    Truy cập một template chỉ giải mã file đó, còn `templates()`, `values()` và
+    `items()` giải mã mọi file còn thiếu bằng một thread pool (cv2.imread nhả
+    GIL). Các file không phải ảnh bị bỏ qua; file có đuôi ảnh nhưng không giải
+    mã được bị loại khỏi registry thay vì trả về None.
+
+    Example:
+        registry = TemplateRegistry("data/templates/finding_01", grayscale=True)
+        balloon = registry['balloon']
+        result_image, locations = linear_multiscale_template_matching(image, registry.templates())
+    """
+
+    def __init__(self, folder_path, grayscale=False, reduction=1, max_workers=None):
+        """
+        Args:
+            folder_path (str): Thư mục chứa các file ảnh template.
+            grayscale (bool, optional): Giải mã thẳng thành ảnh xám. Mặc định False.
+            reduction (int, optional): Hệ số giảm độ phân giải khi giải mã: 1, 2, 4
+                                       hoặc 8. Mặc định 1 (độ phân giải gốc).
+            max_workers (int, optional): Số luồng giải mã. Mặc định theo ThreadPoolExecutor.
+
+        Raises:
+            FileNotFoundError: Nếu thư mục không tồn tại.
+            ValueError: Nếu `reduction` không hợp lệ hoặc hai file trùng tên bỏ đuôi.
+        """
+        if (grayscale, reduction) not in _IMREAD_FLAGS:
+            raise ValueError(f"reduction không hợp lệ: {reduction!r}. Chỉ hỗ trợ 1, 2, 4 hoặc 8.")
+        self.folder_path = folder_path
+        self.grayscale = grayscale
+        self.reduction = reduction
+        self.max_workers = max_workers
+        self._flags = _IMREAD_FLAGS[(grayscale, reduction)]
+
+        self._paths = {}
+        for file in sorted(entry.name for entry in os.scandir(folder_path) if entry.is_file()):
+            if not file.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            name = os.path.splitext(file)[0]
+            if name in self._paths:
+                raise ValueError(f"Hai template trùng tên '{name}' trong {folder_path}.")
+            self._paths[name] = os.path.join(folder_path, file)
+        self._images = {}
+        self._lock = threading.Lock()
+
+    def _decode(self, name):
+        return name, cv2.imread(self._paths[name], self._flags)
+
+    def _store(self, name, image):
+        with self._lock:
+            if image is None:
+                logger.warning("Không giải mã được template %s. Bỏ qua.", self._paths[name])
+                self._paths.pop(name, None)
+            else:
+                self._images[name] = image
+
+    def load(self):
+        """
+        Giải mã song song mọi template chưa được nạp.
+
+        Returns:
+            TemplateRegistry: Chính registry, để có thể viết `TemplateRegistry(path).load()`.
+        """
+        missing = [name for name in self._paths if name not in self._images]
+        if len(missing) > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                for name, image in pool.map(self._decode, missing):
+                    self._store(name, image)
+        elif missing:
+            self._store(*self._decode(missing[0]))
+        return self
+
+    def __getitem__(self, name):
+        if name not in self._images:
+            if name not in self._paths:
+                raise KeyError(name)
+            self._store(*self._decode(name))
+            if name not in self._images:
+                raise KeyError(name)
+        return self._images[name]
+
+    def __iter__(self):
+        return iter(list(self._paths))
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __contains__(self, name):
+        return name in self._paths
+
+    @property
+    def names(self):
+        """
+        Tên các template (sắp xếp theo tên file). Có thể giảm sau khi nạp nếu có
+        file không giải mã được.
+        """
+        return list(self._paths)
+
+    def values(self):
+        self.load()
+        return super().values()
+
+    def items(self):
+        self.load()
+        return super().items()
+
+    def templates(self):
+        """
+        Danh sách template theo thứ tự của `names` (sau khi nạp).
+        """
+        self.load()
+        return [self._images[name] for name in self._paths]
+
+    def path(self, name):
+        """
+        Đường dẫn file của một template.
+        """
+        return self._paths[name]
@@ -0,0 +1,155 @@
+import time
+
+import cv2
+import numpy as np
+
+from src.finding.template_bank import TemplateBank
+from src.finding.template_matching import prepare_image_for_matching, search_template_window
+
+
+class TemplateTracker:
+    """
+    So khớp template trên chuỗi khung hình (video, camera) theo kiểu tăng dần.
+
+    Khung hình đầu tiên được tìm kiếm toàn ảnh ở mọi tỉ lệ (giống
+    `linear_multiscale_template_matching`). Ở các khung hình sau, mỗi template
+    chỉ được tìm trong một vùng ROI quanh vị trí lần trước và trong một khoảng
+    tỉ lệ hẹp quanh tỉ lệ lần trước. Tìm kiếm toàn ảnh chỉ chạy lại cho template
+    có độ tương đồng giảm dưới ngưỡng (mất dấu).
+
+    Example:
+        tracker = TemplateTracker(get_template("data/templates/finding_01"))
+        for frame in frames:
+            result = tracker.update(frame)
+            print(result['latency'], [m['location'] for m in result['matches']])
+    """
+
+    def __init__(self, templates, scale_range=(0.5, 1.0), scale_steps=10, threshold_value=200,
+                 match_method=cv2.TM_CCOEFF_NORMED, min_correlation=0.5, confidence_drop=0.15,
+                 search_margin=0.5, local_scale_window=0.1, local_scale_steps=5, lost_search_interval=30):
+        """
+        Args:
+            templates (list hoặc TemplateBank): Danh sách template hoặc TemplateBank.
+            scale_range (tuple, optional): Khoảng tỉ lệ của tìm kiếm toàn ảnh. Mặc định (0.5, 1.0).
+            scale_steps (int, optional): Số tỉ lệ của tìm kiếm toàn ảnh. Mặc định 10.
+            threshold_value (int, optional): Ngưỡng tạo mặt nạ. Mặc định 200.
+            match_method (int, optional): Phương pháp so khớp. Chỉ hỗ trợ các phương
+                                          pháp "càng lớn càng tốt". Mặc định cv2.TM_CCOEFF_NORMED.
+            min_correlation (float, optional): Độ tương đồng tối thiểu để coi là tìm thấy.
+                                               Mặc định 0.5.
+            confidence_drop (float, optional): Mức giảm tương đối so với lần tìm toàn
+                                               ảnh gần nhất để kích hoạt tìm lại. Mặc định 0.15.
+            search_margin (float, optional): Lề của ROI, tính theo cạnh lớn nhất của
+                                             hộp lần trước. Mặc định 0.5.
+            local_scale_window (float, optional): Nửa độ rộng khoảng tỉ lệ cục bộ, tương
+                                                  đối với tỉ lệ lần trước. Mặc định 0.1.
+            local_scale_steps (int, optional): Số tỉ lệ cục bộ. Mặc định 5.
+            lost_search_interval (int, optional): Template bị mất dấu được tìm lại toàn
+                                                  ảnh sau mỗi N khung hình. Mặc định 30.
+
+        Raises:
+            ValueError: Nếu `match_method` là cv2.TM_SQDIFF hoặc cv2.TM_SQDIFF_NORMED.
+        """
+        if match_method in (cv2.TM_SQDIFF, cv2.TM_SQDIFF_NORMED):
+            raise ValueError("TemplateTracker chỉ hỗ trợ các phương pháp có giá trị lớn là tốt.")
+        scales = np.linspace(scale_range[0], scale_range[1], scale_steps)
+        if not (isinstance(templates, TemplateBank) and templates.threshold_value == threshold_value
+                and templates.has_scales(scales)):
+            templates = TemplateBank(templates if not isinstance(templates, TemplateBank) else templates.templates,
+                                     scales=scales, threshold_value=threshold_value)
+        self.bank = templates
+        self.scale_range = scale_range
+        self.match_method = match_method
+        self.min_correlation = min_correlation
+        self.confidence_drop = confidence_drop
+        self.search_margin = search_margin
+        self.local_scale_window = local_scale_window
+        self.local_scale_steps = local_scale_steps
+        self.lost_search_interval = lost_search_interval
+        self.template_indices = [idx for idx, template in enumerate(self.bank.templates) if template is not None]
+        self.reset()
+
+    def reset(self):
+        """
+        Xóa trạng thái theo dõi; khung hình tiếp theo sẽ được tìm kiếm toàn ảnh.
+        """
+        self.frame_idx = 0
+        self.tracks = {idx: None for idx in self.template_indices}
+        self._lost_since = dict.fromkeys(self.template_indices, 0)
+
+    def _full_search(self, image_for_matching, template_idx):
+        return search_template_window(image_for_matching, self.bank, template_idx, match_method=self.match_method)
+
+    def _local_search(self, image_for_matching, template_idx, track):
+        """
+        Tìm trong ROI quanh hộp lần trước, với các tỉ lệ quanh tỉ lệ lần trước.
+        """
+        image_height, image_width = image_for_matching.shape[:2]
+        (x, y), (width, height) = track['location'], track['dimensions']
+        margin = int(np.ceil(self.search_margin * max(width, height) * (1 + self.local_scale_window)))
+        window = (max(0, x - margin), max(0, y - margin),
+                  min(image_width, x + width + margin), min(image_height, y + height + margin))
+
+        scales = track['scale'] * np.linspace(1 - self.local_scale_window, 1 + self.local_scale_window,
+                                              self.local_scale_steps)
+        scales = np.unique(np.clip(scales, self.scale_range[0], self.scale_range[1]))
+        # Tỉ lệ làm template lớn hơn ROI (ví dụ khi đối tượng sát mép ảnh) bị bỏ qua
+        return search_template_window(image_for_matching, self.bank, template_idx, window=window, scales=scales,
+                                      match_method=self.match_method)
+
+    def update(self, frame):
+        """
+        Xử lý một khung hình.
+
+        Args:
+            frame (numpy.ndarray): Khung hình BGR hoặc ảnh xám.
+
+        Returns:
+            dict: Gồm 'frame_idx', 'latency' (giây), 'full_searches' (số template
+                  phải tìm toàn ảnh) và 'matches' — danh sách dict 'template_idx',
+                  'location', 'dimensions', 'scale', 'correlation', 'mode'
+                  ('full' hoặc 'local') của các template đang được theo dõi.
+        """
+        start = time.perf_counter()
+        image_for_matching = prepare_image_for_matching(frame, self.bank.templates)
+        matches = []
+        full_searches = 0
+
+        for template_idx in self.template_indices:
+            track = self.tracks[template_idx]
+            match = None
+            if track is not None:
+                match = self._local_search(image_for_matching, template_idx, track)
+                threshold = max(self.min_correlation, track['reference_correlation'] * (1 - self.confidence_drop))
+                if match is not None and match['correlation'] >= threshold:
+                    match['mode'] = 'local'
+                    match['reference_correlation'] = track['reference_correlation']
+                else:
+                    match = None
+
+            if match is None:
+                self._lost_since[template_idx] += 1
+                due = track is not None or self._lost_since[template_idx] >= self.lost_search_interval
+                if self.frame_idx == 0 or due:
+                    full_searches += 1
+                    self._lost_since[template_idx] = 0
+                    match = self._full_search(image_for_matching, template_idx)
+                    if match is not None and match['correlation'] >= self.min_correlation:
+                        match['mode'] = 'full'
+                        match['reference_correlation'] = match['correlation']
+                    else:
+                        match = None
+
+            self.tracks[template_idx] = match
+            if match is not None:
+                matches.append({'template_idx': template_idx,
+                                **{key: value for key, value in match.items() if key != 'reference_correlation'}})
+
+        result = {
+            'frame_idx': self.frame_idx,
+            'latency': time.perf_counter() - start,
+            'full_searches': full_searches,
+            'matches': matches,
+        }
+        self.frame_idx += 1
+        return result
@@ -0,0 +1,272 @@
+"""
+Chạy template matching trên cả một bộ dữ liệu, theo dạng pipeline luồng.
+
+Bộ dữ liệu có cấu trúc giống thư mục `data/`:
+    data/images/<tên>.jpg          ảnh đích
+    data/templates/<tên>/          template của ảnh (hoặc một thư mục dùng chung)
+    data/ground_truth/<tên>.xml    nhãn (không bắt buộc)
+
+Ảnh được giải mã trên các luồng nền, đi qua hàng đợi có giới hạn tới các luồng
+phát hiện, và kết quả được ghi ra JSONL ngay khi từng ảnh xử lý xong. Bộ nhớ
+chỉ phụ thuộc vào kích thước hàng đợi, không phụ thuộc số lượng ảnh.
+
+Chạy từ thư mục gốc của repository:
+    python -m src.pipeline.batch data --output results.jsonl
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from src.finding.template_registry import IMAGE_EXTENSIONS
+from src.pipeline.common import DETECTORS, TemplateCache, detect
+
+_DONE = object()
+
+
+def iter_dataset(data_dir, template_name=None):
+    """
+    Duyệt các ảnh trong `data_dir/images/` theo thứ tự tên file.
+
+    Args:
+        data_dir (str): Thư mục gốc của bộ dữ liệu.
+        template_name (str, optional): Tên thư mục template dùng chung cho mọi ảnh.
+                                       Mặc định mỗi ảnh dùng `templates/<tên ảnh>/`.
+
+    Yields:
+        dict: Gồm 'index', 'name', 'image_path', 'template_dir' và
+              'ground_truth_path' (None nếu không có file nhãn).
+    """
+    images_dir = os.path.join(data_dir, 'images')
+    file_names = sorted(file for file in os.listdir(images_dir) if file.lower().endswith(IMAGE_EXTENSIONS))
+    for index, file in enumerate(file_names):
+        name = os.path.splitext(file)[0]
+        ground_truth_path = os.path.join(data_dir, 'ground_truth', f"{name}.xml")
+        yield {
+            'index': index,
+            'name': name,
+            'image_path': os.path.join(images_dir, file),
+            'template_dir': os.path.join(data_dir, 'templates', template_name or name),
+            'ground_truth_path': ground_truth_path if os.path.exists(ground_truth_path) else None,
+        }
+
+
+def _put(target_queue, item, stop_event):
+    """
+    Đưa phần tử vào hàng đợi có giới hạn; bỏ cuộc nếu pipeline đã bị dừng.
+    """
+    while not stop_event.is_set():
+        try:
+            target_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(source_queue, stop_event):
+    """
+    Lấy phần tử từ hàng đợi; trả về `_DONE` nếu pipeline đã bị dừng.
+    """
+    while not stop_event.is_set():
+        try:
+            return source_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def iter_batch_results(data_dir, template_name=None, detector='best', decode_threads=2, detect_threads=1,
+                       prefetch=4, cache_dir=None, scale_range=(0.5, 1.0), scale_steps=10, threshold_value=200,
+                       **match_kwargs):
+    """
+    Xử lý lần lượt mọi ảnh của bộ dữ liệu bằng pipeline giải mã/phát hiện song song.
+
+    `decode_threads` luồng đọc và giải mã ảnh (cv2.imread nhả GIL) vào một hàng
+    đợi tối đa `prefetch` ảnh; `detect_threads` luồng lấy ảnh ra và chạy phát
+    hiện. Kết quả được trả về theo thứ tự hoàn thành, nên tại mọi thời điểm chỉ
+    có khoảng `prefetch + 2 * detect_threads` ảnh nằm trong bộ nhớ.
+
+    Args:
+        data_dir (str): Thư mục gốc của bộ dữ liệu (xem `iter_dataset`).
+        template_name (str, optional): Thư mục template dùng chung cho mọi ảnh.
+        detector (str, optional): 'best' (`linear_multiscale_template_matching`, một
+                                  kết quả mỗi template) hoặc 'detection'
+                                  (`multiscale_template_detection`). Mặc định 'best'.
+        decode_threads (int, optional): Số luồng giải mã ảnh. Mặc định 2.
+        detect_threads (int, optional): Số luồng phát hiện. Mặc định 1.
+        prefetch (int, optional): Số ảnh đã giải mã tối đa chờ xử lý. Mặc định 4.
+        cache_dir (str, optional): Thư mục cache của TemplateBank. Mặc định None.
+        scale_range, scale_steps, threshold_value: Tham số matching, dùng cả khi
+                                                   tiền xử lý TemplateBank.
+        **match_kwargs: Tham số khác truyền cho hàm phát hiện.
+
+    Yields:
+        dict: Kết quả của từng ảnh gồm 'index', 'name', 'image_path',
+              'ground_truth_path', 'width', 'height', 'detections',
+              'decode_time', 'detect_time'; ảnh lỗi có thêm khóa 'error'.
+
+    Raises:
+        ValueError: Nếu `detector` không hợp lệ, hoặc `decode_threads`, `detect_threads`,
+                    `prefetch` nhỏ hơn 1.
+    """
+    if detector not in DETECTORS:
+        raise ValueError(f"detector không hợp lệ: {detector!r}. Chỉ hỗ trợ 'best' hoặc 'detection'.")
+    # 0 luồng làm pipeline treo (không ai gửi/nhận _DONE); prefetch=0 làm hàng đợi không giới hạn
+    for name, value in (('decode_threads', decode_threads), ('detect_threads', detect_threads),
+                        ('prefetch', prefetch)):
+        if value < 1:
+            raise ValueError(f"{name} phải lớn hơn hoặc bằng 1, nhận {value}.")
+    match_kwargs = dict(match_kwargs, scale_range=scale_range, scale_steps=scale_steps,
+                        threshold_value=threshold_value)
+    template_cache = TemplateCache(np.linspace(scale_range[0], scale_range[1], scale_steps), threshold_value,
+                                    cache_dir)
+
+    records = iter_dataset(data_dir, template_name)
+    records_lock = threading.Lock()
+    decoders_left = [decode_threads]
+    image_queue = queue.Queue(maxsize=prefetch)
+    result_queue = queue.Queue(maxsize=prefetch)
+    stop_event = threading.Event()
+
+    def decode_worker():
+        while not stop_event.is_set():
+            with records_lock:
+                record = next(records, None)
+            if record is None:
+                break
+            start = time.perf_counter()
+            image = cv2.imread(record['image_path'])
+            record['decode_time'] = time.perf_counter() - start
+            if not _put(image_queue, (record, image), stop_event):
+                return
+        with records_lock:
+            decoders_left[0] -= 1
+            last_decoder = decoders_left[0] == 0
+        if last_decoder:
+            for _ in range(detect_threads):
+                _put(image_queue, _DONE, stop_event)
+
+    def detect_worker():
+        while True:
+            item = _get(image_queue, stop_event)
+            if item is _DONE:
+                break
+            record, image = item
+            start = time.perf_counter()
+            if image is None:
+                record['error'] = f"Không đọc được ảnh: {record['image_path']}"
+            else:
+                record['height'], record['width'] = image.shape[:2]
+                try:
+                    bank = template_cache.get(record['template_dir'])
+                    record['detections'] = detect(image, bank, detector, match_kwargs)
+                except Exception as e:
+                    record['error'] = f"{type(e).__name__}: {e}"
+            record['detect_time'] = time.perf_counter() - start
+            del image, item
+            if not _put(result_queue, record, stop_event):
+                return
+        _put(result_queue, _DONE, stop_event)
+
+    threads = [threading.Thread(target=decode_worker, daemon=True) for _ in range(decode_threads)]
+    threads += [threading.Thread(target=detect_worker, daemon=True) for _ in range(detect_threads)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        detectors_left = detect_threads
+        while detectors_left:
+            record = result_queue.get()
+            if record is _DONE:
+                detectors_left -= 1
+                continue
+            yield record
+    finally:
+        # Người dùng có thể dừng generator giữa chừng: báo các luồng thoát
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+
+
+def run_batch(data_dir, output_path, progress_every=0, **kwargs):
+    """
+    Chạy `iter_batch_results` và ghi từng kết quả thành một dòng JSON.
+
+    Args:
+        data_dir (str): Thư mục gốc của bộ dữ liệu.
+        output_path (str): File JSONL đầu ra, '-' để ghi ra stdout.
+        progress_every (int, optional): In tiến độ ra stderr sau mỗi N ảnh. 0 để tắt.
+        **kwargs: Tham số truyền cho `iter_batch_results`.
+
+    Returns:
+        dict: Thống kê 'n_images', 'n_errors', 'n_detections', 'elapsed',
+              'images_per_second'.
+    """
+    stats = {'n_images': 0, 'n_errors': 0, 'n_detections': 0}
+    output = sys.stdout if output_path == '-' else open(output_path, 'w', encoding='utf-8')
+    start = time.perf_counter()
+    try:
+        for record in iter_batch_results(data_dir, **kwargs):
+            output.write(json.dumps(record, ensure_ascii=False) + '\n')
+            output.flush()
+            stats['n_images'] += 1
+            stats['n_errors'] += 'error' in record
+            stats['n_detections'] += len(record.get('detections', ()))
+            if progress_every and stats['n_images'] % progress_every == 0:
+                elapsed = time.perf_counter() - start
+                print(f"{stats['n_images']} ảnh, {stats['n_images'] / elapsed:.2f} ảnh/s", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    stats['elapsed'] = time.perf_counter() - start
+    stats['images_per_second'] = stats['n_images'] / stats['elapsed'] if stats['elapsed'] > 0 else 0.0
+    return stats
+
+
+def _positive_int(value):
+    """
+    Kiểu argparse cho số nguyên ≥ 1.
+    """
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"phải lớn hơn hoặc bằng 1, nhận {value}")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('data_dir')
+    parser.add_argument('--output', default='-', help="File JSONL đầu ra ('-' là stdout)")
+    parser.add_argument('--templates', dest='template_name', default=None,
+                        help="Thư mục template dùng chung trong data_dir/templates/")
+    parser.add_argument('--detector', choices=DETECTORS, default='best')
+    parser.add_argument('--decode-threads', type=_positive_int, default=2)
+    parser.add_argument('--detect-threads', type=_positive_int, default=1)
+    parser.add_argument('--prefetch', type=_positive_int, default=4)
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--scale-range', type=float, nargs=2, default=(0.5, 1.0))
+    parser.add_argument('--scale-steps', type=int, default=10)
+    parser.add_argument('--threshold-value', type=int, default=200)
+    parser.add_argument('--progress-every', type=int, default=0)
+    args = parser.parse_args()
+
+    stats = run_batch(
+        args.data_dir, args.output, progress_every=args.progress_every,
+        template_name=args.template_name, detector=args.detector, decode_threads=args.decode_threads,
+        detect_threads=args.detect_threads, prefetch=args.prefetch, cache_dir=args.cache_dir,
+        scale_range=tuple(args.scale_range), scale_steps=args.scale_steps, threshold_value=args.threshold_value,
+    )
+    print(f"Đã xử lý {stats['n_images']} ảnh ({stats['n_errors']} lỗi, {stats['n_detections']} kết quả) "
+          f"trong {stats['elapsed']:.2f} s: {stats['images_per_second']:.2f} ảnh/s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
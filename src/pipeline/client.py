@@ -0,0 +1,139 @@
+"""
+Client đồng bộ cho detection daemon (`src.pipeline.server`).
+
+Chạy từ thư mục gốc của repository:
+    python -m src.pipeline.client data/images/finding_01.jpg --template finding_01 --socket /tmp/finding.sock
+    python -m src.pipeline.client --stats --socket /tmp/finding.sock
+"""
+import argparse
+import itertools
+import json
+import socket
+
+import cv2
+import numpy as np
+
+
+class DetectionClient:
+    """
+    Kết nối tới detection daemon qua Unix socket hoặc TCP localhost. Một client
+    gửi tuần tự từng yêu cầu; dùng nhiều client (mỗi luồng một client) để gửi
+    đồng thời, server sẽ gom chúng thành lô.
+
+    Example:
+        with DetectionClient(path="/tmp/finding.sock") as client:
+            result = client.detect(path="data/images/finding_01.jpg", template="finding_01")
+            print(result['detections'], client.stats()['latency'])
+    """
+
+    def __init__(self, path=None, host='127.0.0.1', port=None, timeout=None):
+        """
+        Args:
+            path (str, optional): Đường dẫn Unix socket.
+            host (str, optional): Địa chỉ TCP. Mặc định '127.0.0.1'.
+            port (int, optional): Cổng TCP (dùng khi không có `path`).
+            timeout (float, optional): Thời gian chờ mỗi thao tác socket (giây).
+
+        Raises:
+            ValueError: Nếu không có `path` lẫn `port`.
+        """
+        if path is None and port is None:
+            raise ValueError("Cần chỉ định Unix socket (path) hoặc cổng TCP (port).")
+        if path is not None:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            address = path
+        else:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            address = (host, port)
+        self._socket.settimeout(timeout)
+        self._socket.connect(address)
+        self._reader = self._socket.makefile('rb')
+        self._ids = itertools.count()
+
+    def _call(self, request, payload=b''):
+        request['id'] = next(self._ids)
+        if payload:
+            request['payload_size'] = len(payload)
+        self._socket.sendall(json.dumps(request, ensure_ascii=False).encode() + b'\n' + payload)
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Server đã đóng kết nối.")
+        return json.loads(line)
+
+    def detect(self, image=None, path=None, template=None, matcher='best', **params):
+        """
+        Gửi một yêu cầu phát hiện.
+
+        Args:
+            image (bytes hoặc numpy.ndarray, optional): Ảnh đã mã hóa (jpg/png...) hoặc
+                                                        mảng ảnh (được mã hóa PNG trước khi gửi).
+            path (str, optional): Đường dẫn ảnh mà server đọc được (bỏ qua việc gửi dữ liệu).
+            template (str): Tên bộ template trong thư mục template của server.
+            matcher (str, optional): 'best', 'detection' hoặc 'orb'. Mặc định 'best'.
+            **params: Tham số matching bổ sung (JSON được), ví dụ prefilter=True; chỉ các
+                      tham số trong `src.pipeline.server.REQUEST_PARAMS` của `matcher`.
+
+        Returns:
+            dict: Phản hồi của server gồm 'ok', 'detections', 'width', 'height',
+                  'timing'; khi lỗi có 'ok' False và 'error'.
+        """
+        if isinstance(image, np.ndarray):
+            ok, encoded = cv2.imencode('.png', image)
+            if not ok:
+                raise ValueError("Không mã hóa được ảnh.")
+            image = encoded.tobytes()
+        request = {'op': 'detect', 'template': template, 'matcher': matcher}
+        if path is not None:
+            request['path'] = path
+        if params:
+            request['params'] = params
+        return self._call(request, image or b'')
+
+    def stats(self):
+        """
+        Bộ đếm độ trễ/thông lượng của server (xem `DetectionServer.stats`).
+        """
+        return self._call({'op': 'stats'})['stats']
+
+    def ping(self):
+        return self._call({'op': 'ping'}).get('ok', False)
+
+    def close(self):
+        self._reader.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('images', nargs='*', help="Các file ảnh cần phát hiện")
+    parser.add_argument('--template', default=None, help="Tên bộ template")
+    parser.add_argument('--matcher', choices=('best', 'detection', 'orb'), default='best')
+    parser.add_argument('--socket', default=None)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--send-bytes', action='store_true', help="Gửi dữ liệu ảnh thay vì đường dẫn")
+    parser.add_argument('--stats', action='store_true', help="In bộ đếm của server")
+    args = parser.parse_args()
+    if args.socket is None and args.port is None:
+        parser.error("cần --socket hoặc --port")
+
+    with DetectionClient(path=args.socket, host=args.host, port=args.port) as client:
+        for image_path in args.images:
+            if args.send_bytes:
+                with open(image_path, 'rb') as file:
+                    result = client.detect(file.read(), template=args.template, matcher=args.matcher)
+            else:
+                result = client.detect(path=image_path, template=args.template, matcher=args.matcher)
+            print(json.dumps(result, ensure_ascii=False))
+        if args.stats:
+            print(json.dumps(client.stats(), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Thành phần dùng chung của các pipeline phát hiện (`src.pipeline.batch`,
+`src.pipeline.server`): bộ nhớ đệm TemplateBank theo thư mục và bộ phát hiện
+trả kết quả dạng JSON được.
+"""
+import threading
+
+from src.finding.template_bank import TemplateBank
+from src.finding.template_matching import linear_multiscale_template_matching, multiscale_template_detection
+
+DETECTORS = ('best', 'detection')
+
+
+class TemplateCache:
+    """
+    Bộ nhớ đệm TemplateBank theo thư mục template, dùng chung giữa các luồng.
+    Mỗi thư mục chỉ được tiền xử lý (hoặc nạp từ `cache_dir`) một lần.
+    """
+
+    def __init__(self, scales, threshold_value, cache_dir=None):
+        self.scales = scales
+        self.threshold_value = threshold_value
+        self.cache_dir = cache_dir
+        self._banks = {}
+        self._lock = threading.Lock()
+
+    def get(self, template_dir):
+        with self._lock:
+            if template_dir not in self._banks:
+                self._banks[template_dir] = TemplateBank.from_folder(
+                    template_dir, cache_dir=self.cache_dir, scales=self.scales, threshold_value=self.threshold_value)
+            return self._banks[template_dir]
+
+
+def detect(image, bank, detector, match_kwargs):
+    """
+    Chạy bộ phát hiện trên một ảnh và chuyển kết quả thành danh sách dict JSON được.
+
+    Args:
+        image (numpy.ndarray): Ảnh đích BGR.
+        bank (TemplateBank): Bộ template đã tiền xử lý (xem `TemplateCache`).
+        detector (str): 'best' (`linear_multiscale_template_matching`, một kết quả
+                        mỗi template) hoặc 'detection' (`multiscale_template_detection`).
+        match_kwargs (dict): Tham số truyền cho hàm phát hiện.
+
+    Returns:
+        list: Mỗi phần tử gồm 'template', 'template_idx', 'score', 'scale' và
+              'bbox' [x1, y1, x2, y2].
+    """
+    if detector == 'detection':
+        detections = multiscale_template_detection(image, bank, **match_kwargs)
+        return [
+            {
+                'template': bank.names[template_idx],
+                'template_idx': int(template_idx),
+                'score': float(score),
+                'scale': float(scale),
+                'bbox': [int(value) for value in xyxy],
+            }
+            for template_idx, scale, score, xyxy in detections
+        ]
+
+    # Chỉ cần chi tiết kết quả: không sao chép ảnh để vẽ
+    _, _, match_details = linear_multiscale_template_matching(image, bank, draw=False, return_details=True,
+                                                              **match_kwargs)
+    return [
+        {
+            'template': bank.names[detail['template_idx']],
+            'template_idx': int(detail['template_idx']),
+            'score': float(detail['correlation']),
+            'scale': float(detail['scale']),
+            'bbox': [int(detail['location'][0]), int(detail['location'][1]),
+                     int(detail['location'][0] + detail['dimensions'][0]),
+                     int(detail['location'][1] + detail['dimensions'][1])],
+        }
+        for detail in match_details
+    ]
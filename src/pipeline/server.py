@@ -0,0 +1,450 @@
+"""
+Detection daemon thường trú: giữ TemplateBank và chỉ mục ORB "nóng" trong bộ
+nhớ, nhận yêu cầu qua Unix socket hoặc TCP localhost và trả kết quả JSON.
+
+Mỗi script/notebook không còn phải trả chi phí khởi động Python, import,
+nạp template và trích xuất đặc trưng ORB cho mỗi lần chạy. Các yêu cầu đồng
+thời được gom thành lô (tối đa `batch_size` yêu cầu hoặc chờ `batch_window`
+giây) và chạy trên một thread pool; yêu cầu cùng bộ template và matcher trong
+một lô dùng chung tài nguyên đã nạp.
+
+Giao thức (xem `src.pipeline.client`): mỗi yêu cầu là một dòng JSON, theo sau
+là `payload_size` byte dữ liệu ảnh đã mã hóa (jpg/png...) nếu có. Mỗi phản hồi
+là một dòng JSON có cùng 'id'. Các thao tác:
+    {"op": "detect", "template": "finding_01", "matcher": "best", "path": "..."}
+    {"op": "detect", "template": "finding_01", "matcher": "orb", "payload_size": 12345}
+    {"op": "detect", "template": "finding_01", "matcher": "detection", "path": "...", "params": {"top_k": 5}}
+    {"op": "stats"}
+    {"op": "ping"}
+
+Chạy từ thư mục gốc của repository:
+    python -m src.pipeline.server --templates data/templates --socket /tmp/finding.sock --preload finding_01
+    python -m src.pipeline.server --templates data/templates --port 8765
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from src.finding.ORB import orb_detect
+from src.finding.orb_index import ORBDescriptorIndex
+from src.pipeline.common import TemplateCache, detect
+
+MATCHERS = ('best', 'detection', 'orb')
+# Tham số matching mà client được phép ghi đè qua 'params' của mỗi yêu cầu.
+# Các tham số điều khiển tài nguyên của server (executor, n_workers, workspace...)
+# hoặc dạng kết quả (draw, return_details) không nằm trong danh sách.
+REQUEST_PARAMS = {
+    'best': ('scale_range', 'scale_steps', 'threshold_value', 'match_method', 'pyramid_levels',
+             'pyramid_candidates', 'pyramid_margin', 'scale_search', 'adaptive_coarse_steps', 'scale_tolerance',
+             'early_exit_correlation', 'prefilter', 'prefilter_candidates'),
+    'detection': ('scale_range', 'scale_steps', 'threshold_value', 'match_method', 'score_threshold', 'top_k',
+                  'iou_threshold', 'peak_neighborhood'),
+    'orb': (),
+}
+MAX_PAYLOAD_BYTES = 64 * 2 ** 20
+_LATENCY_WINDOW = 1024
+
+
+class DetectionServer:
+    """
+    Server phát hiện bất đồng bộ (asyncio) với hàng đợi gom lô và thread pool.
+
+    Example:
+        server = DetectionServer("data/templates", preload=["finding_01"])
+        asyncio.run(server.serve(path="/tmp/finding.sock"))
+    """
+
+    def __init__(self, template_root, scale_range=(0.5, 1.0), scale_steps=10, threshold_value=200, cache_dir=None,
+                 max_workers=None, batch_size=8, batch_window=0.0, preload=()):
+        """
+        Args:
+            template_root (str): Thư mục chứa các bộ template (mỗi bộ một thư mục con).
+            scale_range, scale_steps, threshold_value: Tham số matching, dùng cả khi
+                                                       tiền xử lý TemplateBank.
+            cache_dir (str, optional): Thư mục cache của TemplateBank. Mặc định None.
+            max_workers (int, optional): Số luồng xử lý lô. Mặc định os.cpu_count().
+            batch_size (int, optional): Số yêu cầu tối đa mỗi lô. Mặc định 8.
+            batch_window (float, optional): Thời gian chờ gom thêm yêu cầu khi đã có worker
+                                            rảnh (giây). Mặc định 0 (chỉ gom các yêu cầu đang chờ).
+            preload (iterable, optional): Các bộ template nạp sẵn khi khởi động.
+        """
+        self.template_root = template_root
+        self.match_kwargs = dict(scale_range=tuple(scale_range), scale_steps=scale_steps,
+                                 threshold_value=threshold_value)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.preload = list(preload)
+
+        self._templates = TemplateCache(np.linspace(scale_range[0], scale_range[1], scale_steps), threshold_value,
+                                        cache_dir)
+        self._orb_indices = {}
+        self._warm = set()
+        self._orb_lock = threading.Lock()
+        self._pool = None
+        self._queue = None
+        self._slots = None
+        self._servers = []
+        self._tasks = set()
+
+        self._started = time.monotonic()
+        self._counters = collections.Counter()
+        self._latencies = collections.deque(maxlen=_LATENCY_WINDOW)
+        self._completions = collections.deque(maxlen=_LATENCY_WINDOW)
+        self._batch_sizes = collections.deque(maxlen=_LATENCY_WINDOW)
+
+    def _template_dir(self, name):
+        """
+        Đường dẫn bộ template, không cho phép thoát khỏi `template_root`.
+        """
+        if not name or os.path.basename(name) != name or name in ('.', '..'):
+            raise ValueError(f"Tên bộ template không hợp lệ: {name!r}")
+        template_dir = os.path.join(self.template_root, name)
+        if not os.path.isdir(template_dir):
+            raise FileNotFoundError(f"Không tìm thấy bộ template: {name}")
+        return template_dir
+
+    def _bank(self, name):
+        """
+        TemplateBank của một bộ template; bộ chỉ được ghi nhận là đã nạp (xem
+        'template_sets' của `stats`) khi nạp thành công.
+        """
+        template_dir = self._template_dir(name)
+        bank = self._templates.get(template_dir)
+        self._warm.add(name)
+        return template_dir, bank
+
+    def _orb_index(self, template_dir, bank):
+        with self._orb_lock:
+            if template_dir not in self._orb_indices:
+                self._orb_indices[template_dir] = ORBDescriptorIndex(bank.templates, backend='bruteforce',
+                                                                     names=bank.names)
+            return self._orb_indices[template_dir]
+
+    def warm(self, name, matchers=MATCHERS):
+        """
+        Nạp trước TemplateBank (và chỉ mục ORB nếu cần) của một bộ template.
+        """
+        template_dir, bank = self._bank(name)
+        if 'orb' in matchers:
+            self._orb_index(template_dir, bank)
+        return bank
+
+    def _decode(self, request, payload):
+        if payload:
+            image = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+            source = 'payload'
+        elif request.get('path'):
+            image = cv2.imread(request['path'])
+            source = request['path']
+        else:
+            raise ValueError("Yêu cầu detect cần 'path' hoặc dữ liệu ảnh.")
+        if image is None:
+            raise ValueError(f"Không giải mã được ảnh: {source}")
+        return image
+
+    def _match_kwargs(self, matcher, params):
+        """
+        Gộp tham số mặc định của server với 'params' của yêu cầu.
+
+        Raises:
+            ValueError: Nếu 'params' không phải object JSON hoặc có tham số không
+                        được phép với `matcher`.
+        """
+        if not isinstance(params, dict):
+            raise ValueError(f"'params' phải là object JSON, nhận {type(params).__name__}.")
+        unsupported = sorted(set(params) - set(REQUEST_PARAMS[matcher]))
+        if unsupported:
+            raise ValueError(f"Tham số không được hỗ trợ với matcher {matcher!r}: {', '.join(unsupported)}. "
+                             f"Chỉ hỗ trợ: {', '.join(REQUEST_PARAMS[matcher]) or '(không có)'}.")
+        return dict(self.match_kwargs, **params)
+
+    def _detect_one(self, request, payload):
+        matcher = request.get('matcher', 'best')
+        if matcher not in MATCHERS:
+            raise ValueError(f"matcher không hợp lệ: {matcher!r}. Chỉ hỗ trợ {', '.join(MATCHERS)}.")
+        match_kwargs = self._match_kwargs(matcher, request.get('params', {}))
+        template_dir, bank = self._bank(request.get('template'))
+        image = self._decode(request, payload)
+
+        if matcher == 'orb':
+            detections = orb_detect(image, bank.templates, descriptor_index=self._orb_index(template_dir, bank))
+            results = [
+                {
+                    'template': bank.names[detection['template_idx']],
+                    'template_idx': int(detection['template_idx']),
+                    'score': float(detection['num_inliers']),
+                    'bbox': [int(value) for value in detection['xyxy']],
+                }
+                for detection in detections
+            ]
+        else:
+            results = detect(image, bank, matcher, match_kwargs)
+        return {'width': image.shape[1], 'height': image.shape[0], 'detections': results}
+
+    def _run_batch(self, batch):
+        """
+        Xử lý một lô trên thread pool. Yêu cầu được sắp theo (bộ template, matcher)
+        để các yêu cầu dùng chung tài nguyên chạy liền nhau.
+        """
+        order = sorted(range(len(batch)),
+                       key=lambda idx: (str(batch[idx][0].get('template')), str(batch[idx][0].get('matcher'))))
+        responses = [None] * len(batch)
+        for idx in order:
+            request, payload, enqueued = batch[idx]
+            start = time.perf_counter()
+            try:
+                response = self._detect_one(request, payload)
+                response['ok'] = True
+            except Exception as e:
+                response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+            finished = time.perf_counter()
+            response['timing'] = {'queue': start - enqueued, 'detect': finished - start}
+            responses[idx] = response
+        return responses
+
+    async def _batcher(self):
+        """
+        Gom yêu cầu thành lô và gửi lên thread pool; số lô chạy đồng thời bị giới
+        hạn bởi số worker nên khi tải cao các lô tự lớn dần tới `batch_size`.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            # Chờ worker rảnh trước rồi mới lấy yêu cầu: trong lúc chờ, hàng đợi
+            # tích lũy và lô tiếp theo lấy hết một lần
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                try:
+                    if timeout <= 0:
+                        batch.append(self._queue.get_nowait())
+                    else:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+            task = asyncio.ensure_future(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            self._batch_sizes.append(len(batch))
+            self._counters['batches'] += 1
+            try:
+                responses = await loop.run_in_executor(self._pool, self._run_batch,
+                                                       [(request, payload, enqueued)
+                                                        for request, payload, enqueued, _ in batch])
+            except Exception as e:
+                responses = [{'ok': False, 'error': f"{type(e).__name__}: {e}"}] * len(batch)
+            for (_, _, _, future), response in zip(batch, responses):
+                if not future.done():
+                    future.set_result(response)
+        finally:
+            self._slots.release()
+
+    async def _submit(self, request, payload):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((request, payload, time.perf_counter(), future))
+        return await future
+
+    def stats(self):
+        """
+        Bộ đếm độ trễ và thông lượng.
+
+        Returns:
+            dict: Gồm 'uptime', các bộ đếm ('requests', 'detect_requests', 'errors',
+                  'batches', 'bytes_received'), 'queue_depth', 'mean_batch_size',
+                  'latency' (p50/p95/p99/mean của `_LATENCY_WINDOW` yêu cầu detect
+                  gần nhất, giây), 'throughput' (yêu cầu detect/giây trên cửa sổ đó)
+                  và 'template_sets' đã nạp.
+        """
+        latencies = np.array(self._latencies, dtype=np.float64)
+        latency = {}
+        if len(latencies):
+            latency = {
+                'mean': float(latencies.mean()),
+                'p50': float(np.percentile(latencies, 50)),
+                'p95': float(np.percentile(latencies, 95)),
+                'p99': float(np.percentile(latencies, 99)),
+            }
+        throughput = 0.0
+        if len(self._completions) > 1 and self._completions[-1] > self._completions[0]:
+            throughput = (len(self._completions) - 1) / (self._completions[-1] - self._completions[0])
+        return {
+            'uptime': time.monotonic() - self._started,
+            **{key: self._counters[key] for key in ('requests', 'detect_requests', 'errors', 'batches',
+                                                     'bytes_received')},
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'mean_batch_size': float(np.mean(self._batch_sizes)) if self._batch_sizes else 0.0,
+            'latency': latency,
+            'throughput': throughput,
+            'template_sets': sorted(self._warm),
+            'orb_indices': sorted(os.path.basename(path) for path in self._orb_indices),
+        }
+
+    async def _handle_request(self, request, payload):
+        op = request.get('op', 'detect')
+        if op == 'ping':
+            return {'ok': True}
+        if op == 'stats':
+            return {'ok': True, 'stats': self.stats()}
+        if op != 'detect':
+            return {'ok': False, 'error': f"op không hợp lệ: {op!r}"}
+
+        start = time.perf_counter()
+        self._counters['detect_requests'] += 1
+        response = await self._submit(request, payload)
+        latency = time.perf_counter() - start
+        response.setdefault('timing', {})['total'] = latency
+        self._latencies.append(latency)
+        self._completions.append(time.monotonic())
+        return response
+
+    async def _respond(self, writer, write_lock, request, payload):
+        try:
+            response = await self._handle_request(request, payload)
+        except Exception as e:
+            response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        if not response.get('ok'):
+            self._counters['errors'] += 1
+        response['id'] = request.get('id')
+        async with write_lock:
+            writer.write(json.dumps(response, ensure_ascii=False).encode() + b'\n')
+            await writer.drain()
+
+    async def _handle_connection(self, reader, writer):
+        """
+        Đọc lần lượt các yêu cầu của một kết nối; mỗi yêu cầu được xử lý trong
+        một task riêng nên client có thể gửi nối tiếp nhiều yêu cầu (phản hồi có
+        thể về không theo thứ tự, ghép bằng 'id').
+        """
+        write_lock = asyncio.Lock()
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self._counters['requests'] += 1
+                try:
+                    request = json.loads(line)
+                    payload_size = int(request.get('payload_size', 0))
+                    if not 0 <= payload_size <= MAX_PAYLOAD_BYTES:
+                        raise ValueError(f"payload_size vượt quá giới hạn {MAX_PAYLOAD_BYTES} byte")
+                except (ValueError, AttributeError) as e:
+                    self._counters['errors'] += 1
+                    async with write_lock:
+                        writer.write(json.dumps({'ok': False, 'error': f"Yêu cầu không hợp lệ: {e}"},
+                                                ensure_ascii=False).encode() + b'\n')
+                        await writer.drain()
+                    break
+                payload = await reader.readexactly(payload_size) if payload_size else b''
+                self._counters['bytes_received'] += len(line) + payload_size
+                task = asyncio.ensure_future(self._respond(writer, write_lock, request, payload))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, path=None, host='127.0.0.1', port=None):
+        """
+        Nạp trước các bộ template trong `preload` và bắt đầu lắng nghe trên Unix
+        socket `path` hoặc TCP `host:port`.
+
+        Raises:
+            ValueError: Nếu không có `path` lẫn `port`.
+        """
+        if path is None and port is None:
+            raise ValueError("Cần chỉ định Unix socket (path) hoặc cổng TCP (port).")
+        loop = asyncio.get_running_loop()
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_workers)
+        for name in self.preload:
+            await loop.run_in_executor(self._pool, self.warm, name)
+
+        if path is not None:
+            if os.path.exists(path):
+                os.unlink(path)
+            self._servers.append(await asyncio.start_unix_server(self._handle_connection, path=path,
+                                                                 limit=2 ** 20))
+        if port is not None:
+            self._servers.append(await asyncio.start_server(self._handle_connection, host=host, port=port,
+                                                            limit=2 ** 20))
+        batcher = asyncio.ensure_future(self._batcher())
+        self._tasks.add(batcher)
+        self._started = time.monotonic()
+
+    async def close(self):
+        """
+        Ngừng nhận kết nối, hủy bộ gom lô và tắt thread pool.
+        """
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+    async def serve(self, path=None, host='127.0.0.1', port=None):
+        """
+        Khởi động server và phục vụ cho tới khi bị hủy (Ctrl+C).
+        """
+        await self.start(path=path, host=host, port=port)
+        try:
+            await asyncio.gather(*(server.serve_forever() for server in self._servers))
+        finally:
+            await self.close()
+            if path is not None and os.path.exists(path):
+                os.unlink(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--templates', required=True, help="Thư mục chứa các bộ template")
+    parser.add_argument('--socket', default=None, help="Đường dẫn Unix socket")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--preload', nargs='*', default=(), help="Các bộ template nạp sẵn")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--batch-window', type=float, default=0.0)
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--scale-range', type=float, nargs=2, default=(0.5, 1.0))
+    parser.add_argument('--scale-steps', type=int, default=10)
+    parser.add_argument('--threshold-value', type=int, default=200)
+    args = parser.parse_args()
+    if args.socket is None and args.port is None:
+        parser.error("cần --socket hoặc --port")
+
+    server = DetectionServer(args.templates, scale_range=args.scale_range, scale_steps=args.scale_steps,
+                             threshold_value=args.threshold_value, cache_dir=args.cache_dir,
+                             max_workers=args.workers, batch_size=args.batch_size,
+                             batch_window=args.batch_window, preload=args.preload)
+    print(f"Đang lắng nghe trên {args.socket or f'{args.host}:{args.port}'}", file=sys.stderr, flush=True)
+    try:
+        asyncio.run(server.serve(path=args.socket, host=args.host, port=args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Chạy `TemplateTracker` trên luồng khung hình (file video hoặc camera).
+
+Khung hình được giải mã trên một luồng nền, song song với việc so khớp, qua
+một hàng đợi có giới hạn. Mỗi khung hình cho ra một dòng JSON gồm kết quả và
+độ trễ xử lý.
+
+Chạy từ thư mục gốc của repository:
+    python -m src.pipeline.stream video.mp4 --templates data/templates/finding_01
+"""
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from src.finding.template_bank import TemplateBank
+from src.finding.tracking import TemplateTracker
+
+_DONE = object()
+
+
+def prefetch(iterable, maxsize=4):
+    """
+    Lấy trước các phần tử của `iterable` trên một luồng nền vào hàng đợi tối đa
+    `maxsize` phần tử. Ngoại lệ của luồng nền được ném lại ở luồng gọi.
+
+    Yields:
+        Các phần tử của `iterable` theo đúng thứ tự.
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    stop_event = threading.Event()
+
+    def offer(item):
+        while not stop_event.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for item in iterable:
+                if not offer(item):
+                    return
+        except Exception as e:
+            offer(e)
+            return
+        offer(_DONE)
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop_event.set()
+        thread.join()
+
+
+def read_video_frames(source):
+    """
+    Đọc lần lượt các khung hình từ cv2.VideoCapture (đường dẫn file hoặc chỉ số camera).
+
+    Raises:
+        FileNotFoundError: Nếu không mở được nguồn video.
+    """
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise FileNotFoundError(f"Không mở được nguồn video: {source}")
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                return
+            yield frame
+    finally:
+        capture.release()
+
+
+def track_stream(frames, templates, prefetch_frames=4, **tracker_kwargs):
+    """
+    Theo dõi template trên một chuỗi khung hình, giải mã song song với so khớp.
+
+    Args:
+        frames (iterable): Các khung hình (ví dụ `read_video_frames(path)`).
+        templates (list hoặc TemplateBank): Danh sách template hoặc TemplateBank.
+        prefetch_frames (int, optional): Số khung hình giải mã trước. Mặc định 4.
+        **tracker_kwargs: Tham số cho `TemplateTracker`.
+
+    Yields:
+        dict: Kết quả của `TemplateTracker.update`, thêm 'wait_time' (thời gian chờ
+              khung hình được giải mã).
+    """
+    tracker = TemplateTracker(templates, **tracker_kwargs)
+    frame_iterator = prefetch(frames, prefetch_frames)
+    while True:
+        start = time.perf_counter()
+        frame = next(frame_iterator, None)
+        if frame is None:
+            return
+        wait_time = time.perf_counter() - start
+        result = tracker.update(frame)
+        result['wait_time'] = wait_time
+        yield result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help="File video hoặc chỉ số camera")
+    parser.add_argument('--templates', required=True, help="Thư mục template")
+    parser.add_argument('--scale-range', type=float, nargs=2, default=(0.5, 1.0))
+    parser.add_argument('--scale-steps', type=int, default=10)
+    parser.add_argument('--min-correlation', type=float, default=0.5)
+    parser.add_argument('--prefetch', type=int, default=4)
+    args = parser.parse_args()
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    bank = TemplateBank.from_folder(args.templates, scales=np.linspace(*args.scale_range, args.scale_steps))
+    latencies = []
+    for result in track_stream(read_video_frames(source), bank, prefetch_frames=args.prefetch,
+                               scale_range=tuple(args.scale_range), scale_steps=args.scale_steps,
+                               min_correlation=args.min_correlation):
+        latencies.append(result['latency'])
+        for match in result['matches']:
+            match['template'] = bank.names[match['template_idx']]
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+
+    if latencies:
+        print(f"{len(latencies)} khung hình, độ trễ trung vị {np.median(latencies) * 1000:.1f} ms, "
+              f"p95 {np.percentile(latencies, 95) * 1000:.1f} ms, khung đầu {latencies[0] * 1000:.1f} ms",
+              file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+"""
+Lớp đo đạc có cấu trúc dùng chung cho các bộ so khớp: bộ đếm thời gian theo
+giai đoạn (span), bộ đếm (counter) và kích thước cấp phát, gửi tới các sink
+cắm được (bộ nhớ, JSONL, Chrome trace-event).
+
+Khi không có sink nào được bật, `span` trả về một context manager rỗng dùng
+chung và `count`/`record_allocation` chỉ kiểm tra một danh sách rỗng, nên chi
+phí gần như bằng không.
+
+Example:
+    from src.utils.instrumentation import ChromeTraceSink, MemorySink, instrument
+
+    memory = MemorySink()
+    with instrument(memory, ChromeTraceSink("trace.json")):
+        linear_multiscale_template_matching(image, templates)
+    print(memory.summary()['spans']['matchTemplate'])
+    # Mở trace.json bằng chrome://tracing hoặc https://ui.perfetto.dev
+"""
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_sinks = []
+_sinks_lock = threading.Lock()
+_context = threading.local()
+
+
+def enabled():
+    """
+    True nếu có ít nhất một sink đang được bật.
+    """
+    return bool(_sinks)
+
+
+def add_sink(sink):
+    with _sinks_lock:
+        _sinks.append(sink)
+
+
+def remove_sink(sink):
+    with _sinks_lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+
+@contextmanager
+def instrument(*sinks, close=True):
+    """
+    Bật các sink trong phạm vi khối `with`; mặc định đóng chúng khi thoát (ghi
+    file của `ChromeTraceSink`).
+    """
+    for sink in sinks:
+        add_sink(sink)
+    try:
+        yield sinks
+    finally:
+        for sink in sinks:
+            remove_sink(sink)
+            if close:
+                sink.close()
+
+
+def _emit(event):
+    for sink in list(_sinks):
+        sink.emit(event)
+
+
+def _fields(fields):
+    """
+    Gộp các trường của các span đang mở trên luồng hiện tại (ví dụ template_idx)
+    với trường của sự kiện.
+    """
+    stack = getattr(_context, 'stack', None)
+    if not stack:
+        return fields
+    merged = {}
+    for parent_fields in stack:
+        merged.update(parent_fields)
+    merged.update(fields)
+    return merged
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'fields', 'start')
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        if not hasattr(_context, 'stack'):
+            _context.stack = []
+        self.fields = _fields(self.fields)
+        _context.stack.append(self.fields)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self.start
+        _context.stack.pop()
+        _emit({'type': 'span', 'name': self.name, 'ts': self.start, 'duration': duration,
+               'thread': threading.get_ident(), 'fields': self.fields})
+        return False
+
+    def set(self, **fields):
+        """
+        Thêm trường cho span (ví dụ kết quả chỉ biết sau khi chạy xong).
+        """
+        self.fields.update(fields)
+
+
+def span(name, **fields):
+    """
+    Đo thời gian một giai đoạn. Các span lồng nhau; span con và counter bên
+    trong thừa hưởng các trường của span cha.
+
+    Example:
+        with span('matchTemplate', scale=0.5):
+            correlation_map = cv2.matchTemplate(...)
+    """
+    if not _sinks:
+        return _NULL_SPAN
+    return _Span(name, fields)
+
+
+def traced(name=None):
+    """
+    Decorator bọc toàn bộ lời gọi hàm trong một span (mặc định mang tên hàm).
+    Khi không có sink, hàm được gọi thẳng.
+    """
+    def decorator(function):
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _sinks:
+                return function(*args, **kwargs)
+            with _Span(span_name, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1, **fields):
+    """
+    Ghi một bộ đếm (ví dụ số keypoint, số lần gọi matchTemplate).
+    """
+    if not _sinks:
+        return
+    _emit({'type': 'counter', 'name': name, 'ts': time.perf_counter(), 'value': value,
+           'thread': threading.get_ident(), 'fields': _fields(fields)})
+
+
+def record_allocation(name, array, **fields):
+    """
+    Ghi kích thước (bytes) của một mảng vừa được cấp phát, dưới dạng bộ đếm
+    `alloc.<name>`.
+    """
+    if not _sinks or array is None:
+        return
+    count(f"alloc.{name}", int(array.nbytes), **fields)
+
+
+class MemorySink:
+    """
+    Giữ mọi sự kiện trong bộ nhớ và tổng hợp theo tên.
+    """
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def close(self):
+        pass
+
+    def summary(self, group_by=()):
+        """
+        Args:
+            group_by (tuple, optional): Tên các trường dùng để tách nhóm, ví dụ
+                                        ('template_idx', 'scale'). Mặc định chỉ theo tên.
+
+        Returns:
+            dict: 'spans' (khóa -> 'count', 'total_time', 'mean_time', 'max_time')
+                  và 'counters' (khóa -> 'count', 'total'); khóa là tên sự kiện,
+                  hoặc tuple (tên, giá trị các trường `group_by`...) khi có `group_by`.
+        """
+        spans, counters = {}, {}
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            key = event['name']
+            if group_by:
+                key = (key,) + tuple(event['fields'].get(field) for field in group_by)
+            if event['type'] == 'span':
+                entry = spans.setdefault(key, {'count': 0, 'total_time': 0.0, 'max_time': 0.0})
+                entry['count'] += 1
+                entry['total_time'] += event['duration']
+                entry['max_time'] = max(entry['max_time'], event['duration'])
+            else:
+                entry = counters.setdefault(key, {'count': 0, 'total': 0})
+                entry['count'] += 1
+                entry['total'] += event['value']
+        for entry in spans.values():
+            entry['mean_time'] = entry['total_time'] / entry['count']
+        return {'spans': spans, 'counters': counters}
+
+
+class JSONLSink:
+    """
+    Ghi mỗi sự kiện thành một dòng JSON ngay khi xảy ra.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'w', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class ChromeTraceSink:
+    """
+    Ghi sự kiện theo định dạng Chrome trace-event (mở bằng chrome://tracing hoặc
+    Perfetto): span là sự kiện 'X', counter là sự kiện 'C'. File được ghi khi đóng.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._events = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        trace_event = {
+            'name': event['name'],
+            'ts': (event['ts'] - self._origin) * 1e6,
+            'pid': os.getpid(),
+            'tid': event['thread'],
+        }
+        if event['type'] == 'span':
+            trace_event.update(ph='X', dur=event['duration'] * 1e6, args=event['fields'])
+        else:
+            trace_event.update(ph='C', args={event['name']: event['value']})
+        with self._lock:
+            self._events.append(trace_event)
+
+    def close(self):
+        with self._lock:
+            events, self._events = self._events, []
+        if events:
+            with open(self.path, 'w', encoding='utf-8') as file:
+                json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file, default=str)
@@ -1,4 +1,15 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
 
 
 def extract_objects_from_xml(xml_path: str): # Thêm type hint cho rõ ràng
@@ -27,7 +38,7 @@ def extract_objects_from_xml(xml_path: str): # Thêm type hint cho rõ ràng
         name_tag = obj.find('name')
 
         if name_tag is None or name_tag.text is None or not name_tag.text.strip():
-            print(f"Cảnh báo: Tìm thấy đối tượng không có tên hợp lệ trong {xml_path}. Bỏ qua.")
+            logger.warning("Tìm thấy đối tượng không có tên hợp lệ trong %s. Bỏ qua.", xml_path)
             continue # Bỏ qua nếu tên rỗng hoặc thiếu
 
         obj_info['name'] = name_tag.text.strip() 
@@ -49,4 +60,239 @@ def extract_objects_from_xml(xml_path: str): # Thêm type hint cho rõ ràng
                 }
                 objects_data.append(obj_info)
 
-    return image_filename, objects_data
\ No newline at end of file
+    return image_filename, objects_data
+
+
+def extract_image_size_from_xml(xml_path: str):
+    """
+    Đọc kích thước ảnh được khai báo trong thẻ <size> của file label XML (PASCAL VOC).
+
+    Ảnh đi kèm có thể đã được lưu lại ở độ phân giải khác với ảnh dùng để gán
+    nhãn; kích thước này cho phép quy đổi bounding box về ảnh thực tế.
+
+    Args:
+        xml_path (str): Đường dẫn đến file label XML.
+
+    Returns:
+        tuple: (width, height) dạng float, hoặc None nếu thiếu thông tin.
+    """
+    size_tag = ET.parse(xml_path).getroot().find('size')
+    if size_tag is None:
+        return None
+    width_tag = size_tag.find('width')
+    height_tag = size_tag.find('height')
+    if any(tag is None or not (tag.text or '').strip() for tag in (width_tag, height_tag)):
+        return None
+    return float(width_tag.text), float(height_tag.text)
+
+
+ANNOTATION_CACHE_VERSION = 1
+
+# Một dòng cho mỗi đối tượng; image_id là chỉ số file trong `files`, class_id là
+# chỉ số tên lớp trong `class_names`, rotation là NaN nếu file không khai báo.
+GROUND_TRUTH_DTYPE = np.dtype([
+    ('image_id', np.int32),
+    ('class_id', np.int32),
+    ('xyxy', np.float64, (4,)),
+    ('rotation', np.float32),
+])
+
+_BOX_KEYS = ('xmin', 'ymin', 'xmax', 'ymax')
+
+
+def _rotation_attribute(object_tag):
+    attributes_tag = object_tag.find('attributes')
+    if attributes_tag is not None:
+        for attribute in attributes_tag:
+            if attribute.findtext('name') == 'rotation':
+                value = (attribute.findtext('value') or '').strip()
+                return float(value) if value else np.nan
+    return np.nan
+
+
+def _parse_voc_file(xml_path):
+    """
+    Đọc một file VOC thành các bộ giá trị thay vì dict lồng nhau. Bỏ qua đối
+    tượng không có tên hoặc thiếu tọa độ, giống `extract_objects_from_xml`.
+
+    Cây được dựng bằng ET.parse (toàn bộ trong C) và chỉ tra cứu bằng tên thẻ
+    đơn: với file VOC vài KB, `iterparse` chậm hơn khoảng 1.7 lần vì mỗi sự
+    kiện phải đi qua vòng lặp Python.
+
+    Returns:
+        tuple: (filename, (width, height) hoặc None, danh sách (name, xmin, ymin,
+               xmax, ymax, rotation)).
+    """
+    root = ET.parse(xml_path).getroot()
+    objects = []
+    for object_tag in root.iterfind('object'):
+        name = object_tag.findtext('name')
+        if name is None or not name.strip():
+            logger.warning("Tìm thấy đối tượng không có tên hợp lệ trong %s. Bỏ qua.", xml_path)
+            continue
+        bbox_tag = object_tag.find('bndbox')
+        if bbox_tag is None:
+            continue
+        box = [bbox_tag.findtext(key) for key in _BOX_KEYS]
+        if None not in box:
+            objects.append((name.strip(), *map(float, box), _rotation_attribute(object_tag)))
+
+    image_size = None
+    size_tag = root.find('size')
+    if size_tag is not None:
+        width, height = (size_tag.findtext(key) or '' for key in ('width', 'height'))
+        if width.strip() and height.strip():
+            image_size = (float(width), float(height))
+    return root.findtext('filename'), image_size, objects
+
+
+def _parse_voc_chunk(xml_paths):
+    return [_parse_voc_file(xml_path) for xml_path in xml_paths]
+
+
+def _list_annotation_files(annotation_dir):
+    """
+    Danh sách file XML (sắp theo tên) cùng (mtime_ns, size) để kiểm tra cache.
+    """
+    entries = []
+    with os.scandir(annotation_dir) as iterator:
+        for entry in iterator:
+            if entry.name.lower().endswith('.xml') and entry.is_file():
+                stat = entry.stat()
+                entries.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    entries.sort()
+    return entries
+
+
+def _annotation_cache_dir(cache_dir, annotation_dir):
+    key = hashlib.sha256(f"v{ANNOTATION_CACHE_VERSION}:{os.path.abspath(annotation_dir)}".encode()).hexdigest()
+    return os.path.join(cache_dir, key)
+
+
+def _load_annotation_cache(table_dir, entries):
+    """
+    Nạp bảng đã lưu nếu danh sách file và (mtime_ns, size) của mọi file khớp
+    với lúc lưu; ngược lại (hoặc cache hỏng, thiếu file) trả về None để dựng lại.
+    """
+    try:
+        with open(os.path.join(table_dir, 'index.json'), encoding='utf-8') as f:
+            metadata = json.load(f)
+        if metadata.get('version') != ANNOTATION_CACHE_VERSION or metadata['entries'] != [list(e) for e in entries]:
+            return None
+        arrays = {name: np.load(os.path.join(table_dir, f"{name}.npy"), mmap_mode='r')
+                  for name in ('objects', 'offsets', 'image_sizes')}
+        return {
+            'files': [entry[0] for entry in entries],
+            'filenames': metadata['filenames'],
+            'class_names': metadata['class_names'],
+            **arrays,
+        }
+    except (KeyError, OSError, ValueError):
+        return None
+
+
+def _save_annotation_cache(table_dir, table, entries):
+    parent_dir = os.path.dirname(table_dir)
+    os.makedirs(parent_dir, exist_ok=True)
+    # Ghi cả bảng vào thư mục tạm rồi đổi tên thư mục, để tiến trình khác không
+    # bao giờ ghép index.json cũ với các mảng mới (hoặc ngược lại)
+    tmp_dir = tempfile.mkdtemp(prefix=f"{os.path.basename(table_dir)}.", suffix='.tmp', dir=parent_dir)
+    old_dir = f"{tmp_dir}.old"
+    try:
+        for name in ('objects', 'offsets', 'image_sizes'):
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), table[name])
+        metadata = {
+            'version': ANNOTATION_CACHE_VERSION,
+            'entries': [list(entry) for entry in entries],
+            'filenames': table['filenames'],
+            'class_names': table['class_names'],
+        }
+        with open(os.path.join(tmp_dir, 'index.json'), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f)
+        if os.path.isdir(table_dir):
+            os.replace(table_dir, old_dir)
+        os.replace(tmp_dir, table_dir)
+    except OSError as e:
+        # Ví dụ tiến trình khác vừa đổi tên cùng thư mục: vẫn dùng bảng vừa đọc
+        logger.warning("Không thể lưu cache nhãn vào %s: %s", table_dir, e)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def load_voc_annotations(annotation_dir, cache_dir=None, n_workers=None, chunk_size=256):
+    """
+    Đọc mọi file label XML (PASCAL VOC) trong một thư mục thành bảng dạng cột.
+
+    Các file được phân tích theo từng khối `chunk_size` file trên một process
+    pool, kết quả ghép thành các mảng NumPy thay vì dict cho từng đối tượng.
+    Khi có `cache_dir`, bảng được lưu thành các file .npy và nạp lại bằng
+    memory-map ở lần sau; cache bị bỏ nếu danh sách file hoặc mtime/kích thước
+    của bất kỳ file nào thay đổi.
+
+    Args:
+        annotation_dir (str): Thư mục chứa các file .xml (ví dụ data/ground_truth).
+        cache_dir (str, optional): Thư mục cache. None để không lưu.
+        n_workers (int, optional): Số tiến trình. Mặc định os.cpu_count(); 1 để
+                                   đọc tuần tự trong tiến trình hiện tại.
+        chunk_size (int, optional): Số file mỗi job của pool. Mặc định 256.
+
+    Returns:
+        dict: Gồm
+              - 'files': tên file XML (sắp theo tên), chỉ số là image_id.
+              - 'filenames': tên file ảnh khai báo trong thẻ <filename> (hoặc None).
+              - 'class_names': tên các lớp, chỉ số là class_id.
+              - 'objects': mảng `GROUND_TRUTH_DTYPE`, sắp theo image_id.
+              - 'offsets': mảng int64 độ dài len(files) + 1; đối tượng của ảnh i
+                là objects[offsets[i]:offsets[i + 1]].
+              - 'image_sizes': mảng float64 (len(files), 2) gồm (width, height)
+                khai báo trong <size>, NaN nếu thiếu.
+
+    Example:
+        table = load_voc_annotations("data/ground_truth", cache_dir=".annotation_cache")
+        image_id = table['files'].index("finding_01.xml")
+        objects = table['objects'][table['offsets'][image_id]:table['offsets'][image_id + 1]]
+        labels = [table['class_names'][class_id] for class_id in objects['class_id']]
+    """
+    entries = _list_annotation_files(annotation_dir)
+    if cache_dir is not None:
+        table = _load_annotation_cache(_annotation_cache_dir(cache_dir, annotation_dir), entries)
+        if table is not None:
+            return table
+
+    xml_paths = [os.path.join(annotation_dir, entry[0]) for entry in entries]
+    chunks = [xml_paths[start:start + chunk_size] for start in range(0, len(xml_paths), chunk_size)]
+    n_workers = min(n_workers or os.cpu_count() or 1, len(chunks))
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            parsed = [result for chunk in pool.map(_parse_voc_chunk, chunks) for result in chunk]
+    else:
+        parsed = [result for chunk in chunks for result in _parse_voc_chunk(chunk)]
+
+    class_ids = {}
+    offsets = np.zeros(len(parsed) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(objects) for _, _, objects in parsed])
+    objects = np.empty(int(offsets[-1]), dtype=GROUND_TRUTH_DTYPE)
+    image_sizes = np.full((len(parsed), 2), np.nan)
+    for image_id, (_, image_size, image_objects) in enumerate(parsed):
+        if image_size is not None:
+            image_sizes[image_id] = image_size
+        if not image_objects:
+            continue
+        rows = objects[offsets[image_id]:offsets[image_id + 1]]
+        rows['image_id'] = image_id
+        rows['class_id'] = [class_ids.setdefault(obj[0], len(class_ids)) for obj in image_objects]
+        rows['xyxy'] = [obj[1:5] for obj in image_objects]
+        rows['rotation'] = [obj[5] for obj in image_objects]
+
+    table = {
+        'files': [entry[0] for entry in entries],
+        'filenames': [filename for filename, _, _ in parsed],
+        'class_names': list(class_ids),
+        'objects': objects,
+        'offsets': offsets,
+        'image_sizes': image_sizes,
+    }
+    if cache_dir is not None:
+        _save_annotation_cache(_annotation_cache_dir(cache_dir, annotation_dir), table, entries)
+    return table
@@ -1,5 +1,6 @@
 import cv2
-import matplotlib.pyplot as plt
+from src.utils.instrumentation import record_allocation, span
+from src.utils.visualization import render_mosaic
 
 def binary_mask(template, threshold_value=200, max_value=255, threshold_type=cv2.THRESH_BINARY_INV):
     """
@@ -28,12 +29,14 @@ def binary_mask(template, threshold_value=200, max_value=255, threshold_type=cv2
                       trong đó vùng đối tượng thường là trắng (255) và nền là đen (0)
                       khi sử dụng THRESH_BINARY_INV.
     """
-    if len(template.shape) == 3 and template.shape[2] == 3:
-        gray_template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
-    else:
-        gray_template = template.copy()
+    with span('binary_mask', threshold_value=threshold_value):
+        if len(template.shape) == 3 and template.shape[2] == 3:
+            gray_template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+        else:
+            gray_template = template.copy()
 
-    _, mask = cv2.threshold(gray_template, threshold_value, max_value, threshold_type)
+        _, mask = cv2.threshold(gray_template, threshold_value, max_value, threshold_type)
+    record_allocation('binary_mask', mask)
     
     return mask
 
@@ -79,6 +82,9 @@ def convert_templates_to_binary(templates, threshold_value=200, max_value=255, t
 def visualize_binary_templates(original_templates, binary_templates, max_display=5):
     """
     Hiển thị các template gốc và các mặt nạ nhị phân tương ứng.
+
+    Dùng matplotlib (một subplot mỗi ảnh); để xem/ghi nhiều template, dùng
+    `render_binary_templates`.
     
     Args:
         original_templates (list): Danh sách các template gốc.
@@ -86,6 +92,9 @@ def visualize_binary_templates(original_templates, binary_templates, max_display
         max_display (int, optional): Số lượng template tối đa để hiển thị.
                                     Mặc định là 5.
     """
+    # Nạp matplotlib khi cần: binary_mask được dùng ở chế độ headless
+    import matplotlib.pyplot as plt
+
     display_count = min(len(original_templates), max_display)
     
     plt.figure(figsize=(15, 4 * display_count))
@@ -111,3 +120,33 @@ def visualize_binary_templates(original_templates, binary_templates, max_display
     
     plt.tight_layout()
     plt.show()
+
+
+def render_binary_templates(original_templates, binary_templates, max_display=None, **mosaic_kwargs):
+    """
+    Ghép các template gốc và mặt nạ nhị phân tương ứng thành một ảnh mosaic
+    (hai cột: template, mặt nạ) bằng `render_mosaic`, không dùng matplotlib.
+
+    Args:
+        original_templates (list): Danh sách các template gốc.
+        binary_templates (list): Danh sách các mặt nạ nhị phân.
+        max_display (int, optional): Số template tối đa. Mặc định là tất cả.
+        **mosaic_kwargs: Tham số truyền cho `render_mosaic` (cell_size, padding...).
+
+    Returns:
+        numpy.ndarray: Ảnh mosaic BGR.
+
+    Example:
+        canvas = render_binary_templates(templates, convert_templates_to_binary(templates),
+                                         cell_size=(128, 128))
+        cv2.imwrite("masks.png", canvas)
+    """
+    images, titles = [], []
+    for i, (template, mask) in enumerate(zip(original_templates, binary_templates)):
+        if max_display is not None and i >= max_display:
+            break
+        if template is None or mask is None:
+            continue
+        images.extend((template, mask))
+        titles.extend((f'Template gốc #{i+1}', f'Binary Mask #{i+1}'))
+    return render_mosaic(images, titles=titles, cols=2, **mosaic_kwargs)
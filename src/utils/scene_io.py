@@ -0,0 +1,33 @@
+import os
+
+import numpy as np
+
+
+def open_scene(path, shape=None, dtype=np.uint8, offset=0):
+    """
+    Mở ảnh rất lớn ở chế độ memory-map (chỉ đọc), không nạp toàn bộ vào RAM.
+
+    File `.npy` được mở bằng np.load(mmap_mode='r'). Các file khác được coi là
+    dữ liệu thô (raw) không có header, xếp theo thứ tự (height, width[, channels])
+    như một mảng C liên tục, nên cần truyền `shape`.
+
+    Args:
+        path (str): Đường dẫn file `.npy` hoặc file raw.
+        shape (tuple, optional): (height, width) hoặc (height, width, channels) của file raw.
+        dtype (numpy.dtype, optional): Kiểu dữ liệu của file raw. Mặc định uint8.
+        offset (int, optional): Số byte bỏ qua ở đầu file raw. Mặc định 0.
+
+    Returns:
+        numpy.memmap: Mảng chỉ đọc ánh xạ tới file.
+
+    Raises:
+        ValueError: Nếu file raw không có `shape` hoặc kích thước file không khớp.
+    """
+    if path.lower().endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    if shape is None:
+        raise ValueError("Cần truyền shape khi mở file raw.")
+    expected_bytes = offset + int(np.prod(shape)) * np.dtype(dtype).itemsize
+    if os.path.getsize(path) < expected_bytes:
+        raise ValueError(f"File {path} nhỏ hơn kích thước khai báo {tuple(shape)}.")
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=tuple(shape))
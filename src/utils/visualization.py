@@ -1,7 +1,9 @@
+import os
+import unicodedata
+from typing import Tuple
+
 import cv2
 import numpy as np
-from typing import Tuple
-import matplotlib.pyplot as plt
 
 def draw_bounding_box(
     image: np.ndarray,
@@ -30,6 +32,9 @@ def plot_image_grid(images, titles=None, main_title=None, figsize=None,
                     wspace=0.3, hspace=0.3, title_pad=10):
     """
     Hiển thị nhiều ảnh theo dạng lưới với các tùy chọn định dạng.
+
+    Mỗi ảnh là một subplot matplotlib; với hàng trăm ảnh hoặc khi chỉ cần ghi
+    báo cáo ra file, dùng `render_mosaic`/`write_mosaic` nhanh hơn nhiều.
     
     Args:
         images (list): Danh sách các ảnh cần hiển thị (numpy.ndarray).
@@ -62,6 +67,9 @@ def plot_image_grid(images, titles=None, main_title=None, figsize=None,
     if figsize is None:
         figsize = (cols * 3, rows * 3) 
     
+    # Nạp matplotlib khi cần: đa số nơi dùng module này chỉ vẽ bằng OpenCV
+    import matplotlib.pyplot as plt
+
     fig, axes = plt.subplots(rows, cols, figsize=figsize)
     
     if rows == 1 and cols == 1:
@@ -104,3 +112,163 @@ def plot_image_grid(images, titles=None, main_title=None, figsize=None,
     return fig, axes
 
 
+_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+def _ascii_title(text):
+    """
+    Font Hershey của cv2.putText chỉ có ký tự ASCII: bỏ dấu tiếng Việt
+    ("Template gốc" -> "Template goc") thay vì in ra '?'.
+    """
+    text = unicodedata.normalize('NFKD', str(text).replace('đ', 'd').replace('Đ', 'D'))
+    return text.encode('ascii', 'ignore').decode('ascii')
+
+
+def _fit_title(text, max_width, font_scale, thickness):
+    """
+    Cắt bớt tiêu đề (thêm '..') để vừa `max_width` pixel.
+    """
+    text = _ascii_title(text)
+    width = cv2.getTextSize(text, _FONT, font_scale, thickness)[0][0]
+    if width <= max_width:
+        return text
+    n_chars = max(0, int(len(text) * max_width / width) - 2)
+    while n_chars > 0 and cv2.getTextSize(text[:n_chars] + '..', _FONT, font_scale, thickness)[0][0] > max_width:
+        n_chars -= 1
+    return text[:n_chars] + '..'
+
+
+def render_mosaic(images, titles=None, boxes=None, main_title=None, cols=None, cell_size=(256, 256), padding=8,
+                  background=(255, 255, 255), text_color=(0, 0, 0), box_color=(0, 0, 255), box_thickness=2,
+                  font_scale=0.5):
+    """
+    Ghép nhiều ảnh thành một ảnh lưới (mosaic) BGR bằng NumPy/OpenCV, không dùng
+    matplotlib.
+
+    Canvas được cấp phát một lần; mỗi ảnh được thu/phóng giữ tỉ lệ để vừa một ô
+    `cell_size` rồi chép vào giữa ô (ảnh xám được nhân kênh khi chép). Tiêu đề
+    được vẽ bằng cv2.putText (bỏ dấu vì font Hershey chỉ có ASCII). Mọi bounding
+    box của mọi ảnh được quy đổi sang tọa độ canvas và vẽ bằng một lần gọi
+    cv2.polylines.
+
+    Args:
+        images (list): Các ảnh (BGR hoặc xám, uint8); phần tử None để lại ô trống.
+        titles (list, optional): Tiêu đề của từng ảnh.
+        boxes (list, optional): Với mỗi ảnh, mảng (N, 4) các hộp xyxy theo tọa độ
+                                ảnh gốc (hoặc None).
+        main_title (str, optional): Tiêu đề chung ở đầu ảnh.
+        cols (int, optional): Số cột. Mặc định ceil(sqrt(số ảnh)).
+        cell_size (tuple, optional): (width, height) vùng ảnh của mỗi ô. Mặc định (256, 256).
+        padding (int, optional): Khoảng cách giữa các ô (pixel). Mặc định 8.
+        background (tuple, optional): Màu nền BGR. Mặc định trắng.
+        text_color (tuple, optional): Màu chữ BGR. Mặc định đen.
+        box_color (tuple, optional): Màu bounding box BGR. Mặc định đỏ.
+        box_thickness (int, optional): Độ dày bounding box. Mặc định 2.
+        font_scale (float, optional): Cỡ chữ tiêu đề. Mặc định 0.5.
+
+    Returns:
+        numpy.ndarray: Ảnh mosaic BGR uint8.
+
+    Example:
+        canvas = render_mosaic(match_visualization_images, titles=[f"#{i}" for i in range(n)])
+        cv2.imwrite("orb_matches.png", canvas)
+    """
+    n_images = len(images)
+    cols = max(1, min(cols or int(np.ceil(np.sqrt(n_images))), max(n_images, 1)))
+    rows = max(1, int(np.ceil(n_images / cols)))
+    cell_width, cell_height = cell_size
+    text_thickness = 1
+    (_, text_height), baseline = cv2.getTextSize('Ag', _FONT, font_scale, text_thickness)
+    title_height = text_height + baseline + 4 if titles is not None else 0
+    header_height = 0
+    if main_title:
+        (_, header_text_height), header_baseline = cv2.getTextSize('Ag', _FONT, font_scale * 1.5, text_thickness + 1)
+        header_height = header_text_height + header_baseline + padding
+
+    width = cols * cell_width + (cols + 1) * padding
+    height = header_height + rows * (title_height + cell_height) + (rows + 1) * padding
+    canvas = np.empty((height, width, 3), dtype=np.uint8)
+    canvas[:] = background
+
+    if main_title:
+        cv2.putText(canvas, _fit_title(main_title, width - 2 * padding, font_scale * 1.5, text_thickness + 1),
+                    (padding, header_height - header_baseline), _FONT, font_scale * 1.5, text_color,
+                    text_thickness + 1, cv2.LINE_AA)
+
+    polygons = []
+    for idx, image in enumerate(images):
+        row, col = divmod(idx, cols)
+        cell_x = padding + col * (cell_width + padding)
+        cell_y = header_height + padding + row * (title_height + cell_height + padding)
+        if titles is not None and idx < len(titles) and titles[idx] is not None:
+            cv2.putText(canvas, _fit_title(titles[idx], cell_width, font_scale, text_thickness),
+                        (cell_x, cell_y + text_height + 2), _FONT, font_scale, text_color, text_thickness,
+                        cv2.LINE_AA)
+        if image is None or image.size == 0:
+            continue
+
+        image_height, image_width = image.shape[:2]
+        scale = min(cell_width / image_width, cell_height / image_height)
+        resized_width = max(1, min(cell_width, int(round(image_width * scale))))
+        resized_height = max(1, min(cell_height, int(round(image_height * scale))))
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        resized = cv2.resize(image, (resized_width, resized_height), interpolation=interpolation)
+        x0 = cell_x + (cell_width - resized_width) // 2
+        y0 = cell_y + title_height + (cell_height - resized_height) // 2
+        target = canvas[y0:y0 + resized_height, x0:x0 + resized_width]
+        target[:] = resized[..., None] if resized.ndim == 2 else resized[..., :3]
+
+        if boxes is not None and idx < len(boxes) and boxes[idx] is not None and len(boxes[idx]):
+            xyxy = np.asarray(boxes[idx], dtype=np.float64).reshape(-1, 4)
+            # Hộp vượt ra ngoài ảnh bị cắt để không tràn sang ô bên cạnh
+            xyxy = np.clip(xyxy, 0, [image_width, image_height, image_width, image_height])
+            xyxy = xyxy * np.array([resized_width / image_width, resized_height / image_height] * 2)
+            xyxy += np.array([x0, y0, x0, y0])
+            polygons.append(xyxy[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 4, 2))
+
+    if polygons:
+        cv2.polylines(canvas, np.round(np.concatenate(polygons)).astype(np.int32), True, box_color, box_thickness)
+    return canvas
+
+
+def write_mosaic(path, images, params=None, **mosaic_kwargs):
+    """
+    Ghi mosaic (`render_mosaic`) thẳng ra file ảnh; định dạng theo đuôi file.
+
+    Args:
+        path (str): File đích, ví dụ "report/orb_matches.jpg".
+        images (list): Xem `render_mosaic`.
+        params (list, optional): Tham số mã hóa của cv2.imwrite, ví dụ
+                                 [cv2.IMWRITE_JPEG_QUALITY, 90].
+        **mosaic_kwargs: Tham số truyền cho `render_mosaic`.
+
+    Returns:
+        numpy.ndarray: Ảnh mosaic đã ghi.
+
+    Raises:
+        OSError: Nếu OpenCV không ghi được file.
+    """
+    canvas = render_mosaic(images, **mosaic_kwargs)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if not cv2.imwrite(path, canvas, params or []):
+        raise OSError(f"Không ghi được ảnh: {path}")
+    return canvas
+
+
+def encode_mosaic(images, ext='.png', params=None, **mosaic_kwargs):
+    """
+    Mã hóa mosaic (`render_mosaic`) thành bytes (ví dụ để nhúng vào báo cáo HTML
+    hoặc trả qua mạng) mà không ghi file.
+
+    Returns:
+        bytes: Dữ liệu ảnh đã mã hóa theo `ext` ('.png', '.jpg', ...).
+
+    Raises:
+        ValueError: Nếu OpenCV không mã hóa được ảnh.
+    """
+    ok, encoded = cv2.imencode(ext, render_mosaic(images, **mosaic_kwargs), params or [])
+    if not ok:
+        raise ValueError(f"Không mã hóa được ảnh sang {ext}.")
+    return encoded.tobytes()